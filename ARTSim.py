@@ -1,41 +1,10 @@
 # Author: Adam Corbier (@Ad2Am2)
 
 import time
-from src import globalVar
-from src import nub_ctm as ctm
 # Use name of model file instead of example_model
 from models.example_model import model
 from src.runSimulations import *
 
-def prepareModel(model):
-
-    model = ctm.flatten_model(model)
-    print("Making nodes...")
-    stepStart = time.time()
-    globalVar.nodes = ctm.make_nodes(model)
-    nodes = globalVar.nodes
-    stepEnd = time.time()
-    print("Step time: " + str(stepEnd-stepStart))
-    print("Initializing matrices...")
-    stepStart = time.time()
-    globalVar.GMatrix = ctm.initialize_GC_matrix(nodes)   # Initilize the C matrix as a global variable so that any function can access it and modify it
-    globalVar.CMatrix = ctm.initialize_GC_matrix(nodes)   # Initilize the C matrix as a global variable so that any function can access it and modify it
-    globalVar.IVector = ctm.initialize_I_vector(nodes)
-    stepEnd = time.time()
-    print("Step time: " + str(stepEnd-stepStart))
-    print("Making center resistances...")
-    stepStart = time.time()
-    ctm.populate_G_matrix(nodes, model)    
-    ctm.populate_C_matrix(nodes, model)
-    ctm.populate_I_vector(nodes, model)
-
-    stepEnd = time.time()
-    print("Model prepared! Step time: " + str(stepEnd-stepStart))
-
-    globalVar.model = model
-
-    globalVar.modelPrepared = True
-
 # NOTE: make sure to call prepareModel before running the simulation
 
 simStart = time.time()
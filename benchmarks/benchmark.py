@@ -0,0 +1,267 @@
+"""Stage-level benchmark suite.
+
+Times and memory-profiles each stage of a simulation (flatten_model, node and G/C assembly with chiplet stamps, I vector, solve_steady_state, doBeuler, saveTransientInfo)
+on generated models of increasing size, writes the results as JSON, and flags regressions against a stored baseline.
+Stage times are also stored relative to a fixed calibration workload run between the repeats of every size (interpreted loops and a sparse LU), and regressions are
+checked on these relative times, so that a baseline recorded on one machine can be compared with results of another one.
+
+python -m benchmarks.benchmark                                   # run all sizes and compare with benchmarks/baseline.json
+python -m benchmarks.benchmark --sizes small medium --output results.json
+python -m benchmarks.benchmark --save-baseline                   # store the results as the new baseline
+python -m benchmarks.benchmark --mixed-precision                 # also run in mixed precision and report its error against double precision
+python -m benchmarks.benchmark --parareal 4                      # also measure the speedup of Parareal on 4 workers over the serial transient"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from src import globalVar
+from src import instancing
+from src import instrument
+from src import nub_ctm as ctm
+from src import parareal
+from src.generator import count_subblocks, generate_model
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+
+# Generated model of each benchmark size (arguments of generate_model)
+SIZES = {
+    "small": {"layers": 2, "chipletsPerLayer": 2, "blocksPerChiplet": 4, "resolution": [2, 2]},
+    "medium": {"layers": 2, "chipletsPerLayer": 4, "blocksPerChiplet": 9, "resolution": [2, 2]},
+    "large": {"layers": 3, "chipletsPerLayer": 4, "blocksPerChiplet": 16, "resolution": [2, 2]},
+    "xlarge": {"layers": 4, "chipletsPerLayer": 16, "blocksPerChiplet": 16, "resolution": [4, 4]}
+}
+
+# Transient run of every benchmark: 4 phases of 5 substeps
+STEP_DEFINITION = [{"duration": 0.001, "steps": 5}, {"duration": 0.01, "steps": 5}, {"duration": 0.1, "steps": 5}, {"duration": 1, "steps": 5}]
+
+# Longer transient of the Parareal measurement: 4 phases of 100 substeps
+PARAREAL_STEP_DEFINITION = [{"duration": 0.001, "steps": 100}, {"duration": 0.01, "steps": 100}, {"duration": 0.1, "steps": 100}, {"duration": 1, "steps": 100}]
+
+STAGES = ("flatten_model", "assemble_GC", "assemble_I", "solve_steady_state", "doBeuler", "saveTransientInfo")
+
+"""Function that runs the calibration workload once: interpreted loops over dictionaries (as in the model flattening and the logs) and the sparse LU factorization
+and solve of a 2D Laplacian of 40000 unknowns (as in the solvers). Returns its duration (s)."""
+def run_calibration():
+    start = time.perf_counter()
+    units = [{"x": i * 1e-6, "width": 1e-6, "power": float(i % 7)} for i in range(200000)]
+    total = 0.0
+    for unit in units:
+        total += unit["power"] * unit["width"] / (unit["x"] + unit["width"])
+    size = 200
+    line = scipy.sparse.diags([-np.ones(size - 1), 2 * np.ones(size), -np.ones(size - 1)], [-1, 0, 1])
+    laplacian = (scipy.sparse.kron(scipy.sparse.identity(size), line) + scipy.sparse.kron(line, scipy.sparse.identity(size))).tocsc()
+    scipy.sparse.linalg.splu(laplacian).solve(np.ones(size * size))
+    return time.perf_counter() - start
+
+"""Function that runs all the stages of a simulation of the block model once, in the precision of globalVar.precision. Returns the duration of each stage (s),
+and the number of nodes, steady state and last transient temperature vectors.
+If measureMemory is True, the peak memory allocated by each stage (bytes) is measured with tracemalloc instead (durations then include the tracing overhead)."""
+def run_stages(blockModel, stepDefinition, outputDir, measureMemory=False):
+    results = {}
+    state = {}
+
+    def flatten():
+        state["model"] = ctm.flatten_model(blockModel)
+
+    def assemble():     # Nodes, G and C as in prepareModel (see src/instancing.py)
+        state["nodes"], globalVar.GMatrix, globalVar.CMatrix = instancing.assemble_model(state["model"])
+        globalVar.factorCache = {}
+
+    def power():
+        ctm.populate_I_vector(state["nodes"], state["model"])
+
+    def steady():
+        state["steady"] = ctm.solve_steady_state()
+
+    def transient():
+        IVectorVector = ctm.populate_I_vector_vector_transient(state["nodes"], state["model"], len(stepDefinition))
+        state["ttemp"] = ctm.doBeuler(globalVar.GMatrix, globalVar.CMatrix, IVectorVector, [0]*len(state["nodes"]), stepDefinition)
+
+    def save():
+        ctm.saveTransientInfo(state["ttemp"], stepDefinition, state["nodes"], state["model"], os.path.join(outputDir, "transient.log"))
+
+    for name, stage in zip(STAGES, (flatten, assemble, power, steady, transient, save)):
+        with contextlib.redirect_stdout(io.StringIO()):   # Keep progress messages out of the benchmark output
+            if measureMemory:
+                tracemalloc.start()
+                stage()
+                results[name] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                stageStart = time.perf_counter()
+                stage()
+                results[name] = time.perf_counter() - stageStart
+    return results, {"nodes": len(state["nodes"]), "steady": state["steady"], "transient": np.asarray(state["ttemp"][-1], dtype=float)}
+
+"""Function that runs the stages of a block model `repeats` times, each after a run of the calibration workload, and once more to measure memory, in the given precision
+(see globalVar.precision). Returns the best stage times, the best calibration time, the peak memory of every stage and the outputs of the last run (see run_stages)."""
+def measure_stages(blockModel, outputDir, repeats, precision):
+    previous = globalVar.precision
+    globalVar.precision = precision
+    try:
+        times = None
+        calibration = np.inf
+        for _ in range(repeats):
+            calibration = min(calibration, run_calibration())     # Interleaved with the stages, so that both see the same load of the machine
+            runTimes, outputs = run_stages(blockModel, STEP_DEFINITION, outputDir)
+            times = runTimes if times is None else {stage: min(times[stage], runTimes[stage]) for stage in STAGES}
+        memory, _ = run_stages(blockModel, STEP_DEFINITION, outputDir, measureMemory=True)
+    finally:
+        globalVar.precision = previous
+    return times, calibration, memory, outputs
+
+"""Function that benchmarks one size. Stage times are the best of `repeats` runs, also given relative to the duration of the calibration workload (see run_calibration);
+memory is measured in one extra run.
+If mixedPrecision is True, the stages are also run in mixed precision, with the largest difference (K) of its steady state and last transient temperatures from double precision."""
+def benchmark_size(name, repeats=3, mixedPrecision=False):
+    blockModel = generate_model(**SIZES[name])
+    with tempfile.TemporaryDirectory() as outputDir:
+        times, calibration, memory, outputs = measure_stages(blockModel, outputDir, repeats, "double")
+        result = {
+            "model": SIZES[name],
+            "subblocks": count_subblocks(blockModel),
+            "nodes": outputs["nodes"],
+            "calibration": calibration,
+            "time": times,
+            "relativeTime": {stage: times[stage] / calibration for stage in STAGES},
+            "peakMemory": memory
+        }
+        if mixedPrecision:
+            mixedTimes, _, mixedMemory, mixedOutputs = measure_stages(blockModel, outputDir, repeats, "mixed")
+            result["mixedPrecision"] = {
+                "time": mixedTimes,
+                "peakMemory": mixedMemory,
+                "error": {output: float(np.max(np.abs(mixedOutputs[output] - outputs[output]))) for output in ("steady", "transient")}
+            }
+    return result
+
+"""Function that measures the speedup of Parareal (see src/parareal.py) on `workers` processes over the serial transient (iterBeuler), on PARAREAL_STEP_DEFINITION.
+Both runs go through all the substeps without keeping them; times are the best of `repeats` runs. Returns the times (s), speedup, Parareal iterations and the largest difference (K)
+of the last temperatures."""
+def benchmark_parareal(name, workers, repeats=3):
+    blockModel = generate_model(**SIZES[name])
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = ctm.flatten_model(blockModel)
+        nodes, globalVar.GMatrix, globalVar.CMatrix = instancing.assemble_model(model)
+        globalVar.factorCache = {}
+        IVectorVector = ctm.populate_I_vector_vector_transient(nodes, model, len(PARAREAL_STEP_DEFINITION))
+        runs = {"serial": lambda: ctm.iterBeuler(globalVar.GMatrix, globalVar.CMatrix, IVectorVector, [0]*len(nodes), PARAREAL_STEP_DEFINITION),
+                "parareal": lambda: parareal.iter_parareal(globalVar.GMatrix, globalVar.CMatrix, IVectorVector, [0]*len(nodes), PARAREAL_STEP_DEFINITION, workers=workers)}
+        times = {}
+        last = {}
+        for run, iterate in runs.items():
+            for _ in range(repeats):
+                instrument.start_report()
+                runStart = time.perf_counter()
+                for _, _, _, tempVector in iterate():
+                    pass
+                times[run] = min(times.get(run, np.inf), time.perf_counter() - runStart)
+                last[run] = np.array(tempVector)
+        iterations = instrument.get_report()["counters"]["pararealIterations"]
+    return {
+        "workers": workers,
+        "cpus": os.cpu_count(),
+        "substeps": sum(phase["steps"] for phase in PARAREAL_STEP_DEFINITION),
+        "time": times,
+        "speedup": times["serial"] / times["parareal"],
+        "iterations": iterations,
+        "error": float(np.max(np.abs(last["parareal"] - last["serial"])))
+    }
+
+"""Function that compares benchmark results with a baseline. A stage regresses when its time relative to the calibration workload is larger than in the baseline
+by more than `tolerance` (relative) and its time by more than `minTime` seconds (to ignore noise on very short stages), or when its peak memory grows by more than `tolerance`.
+Returns the list of regression messages."""
+def find_regressions(results, baseline, tolerance=0.5, minTime=0.005):
+    regressions = []
+    for size, result in results["sizes"].items():
+        if size not in baseline["sizes"]:
+            continue
+        reference = baseline["sizes"][size]
+        for stage in STAGES:
+            newTime = result["relativeTime"][stage]
+            oldTime = reference.get("relativeTime", {}).get(stage)
+            if oldTime is not None and newTime > oldTime*(1+tolerance) and (newTime - oldTime) * result["calibration"] > minTime:
+                regressions.append(size + "/" + stage + ": relative time " + format(oldTime, ".4g") + " -> " + format(newTime, ".4g") + " (" + format(newTime * result["calibration"], ".4g") + " s)")
+            newMemory = result["peakMemory"][stage]
+            oldMemory = reference["peakMemory"].get(stage)
+            if oldMemory is not None and newMemory > oldMemory*(1+tolerance) and newMemory - oldMemory > 1024*1024:
+                regressions.append(size + "/" + stage + ": peak memory " + str(oldMemory) + " B -> " + str(newMemory) + " B")
+    return regressions
+
+"""Function that prints a table of the results of every size and stage."""
+def print_results(results):
+    print("size".ljust(8) + "nodes".rjust(8) + "calibration".rjust(13) + "".join(stage.rjust(20) for stage in STAGES))
+    for size, result in results["sizes"].items():
+        print(size.ljust(8) + str(result["nodes"]).rjust(8) + (format(result["calibration"], ".4f") + "s").rjust(13) + "".join((format(result["time"][stage], ".4f") + "s/" + format(result["peakMemory"][stage]/2**20, ".1f") + "MB").rjust(20) for stage in STAGES))
+        if "mixedPrecision" in result:
+            mixed = result["mixedPrecision"]
+            print("  mixed".ljust(29) + "".join((format(mixed["time"][stage], ".4f") + "s/" + format(mixed["peakMemory"][stage]/2**20, ".1f") + "MB").rjust(20) for stage in STAGES)
+                  + "   error: steady " + format(mixed["error"]["steady"], ".2g") + " K, transient " + format(mixed["error"]["transient"], ".2g") + " K")
+        if "parareal" in result:
+            run = result["parareal"]
+            print("  parareal: " + str(run["workers"]) + " workers on " + str(run["cpus"]) + " CPUs, " + str(run["substeps"]) + " substeps, serial " + format(run["time"]["serial"], ".4f")
+                  + " s, parareal " + format(run["time"]["parareal"], ".4f") + " s, speedup " + format(run["speedup"], ".2f") + "x in " + str(run["iterations"]) + " iterations, error "
+                  + format(run["error"], ".2g") + " K")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ARTSim stage-level benchmark suite")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE), help="baseline JSON file to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="slowdown of the relative stage times flagged as a regression")
+    parser.add_argument("--mixed-precision", action="store_true", help="also run every size in mixed precision and report its error against double precision")
+    parser.add_argument("--parareal", type=int, metavar="WORKERS", help="also measure the speedup of Parareal on this many workers over the serial transient, for every size")
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "stepDefinition": STEP_DEFINITION,
+        "sizes": {}
+    }
+    for size in args.sizes:
+        print("Benchmarking " + size + "...")
+        results["sizes"][size] = benchmark_size(size, args.repeats, args.mixed_precision)
+        if args.parareal:
+            results["sizes"][size]["parareal"] = benchmark_parareal(size, args.parareal, args.repeats)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(results, outfile, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as outfile:
+            json.dump(results, outfile, indent=1)
+        print("Baseline saved to " + args.baseline)
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with (" + args.baseline + ")")
+        return 0
+    with open(args.baseline) as infile:
+        baseline = json.load(infile)
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for regression in regressions:
+        print("REGRESSION: " + regression)
+    if not regressions:
+        print("No regressions against " + args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
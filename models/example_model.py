@@ -84,7 +84,7 @@ bk12_height = 0.000133
 bk13_leftX = 0
 bk13_bottomY = 0.000322078
 bk13_width = 0.000374091
-bk13_height = 9.35227e-05
+bk13_height = 9.35220e-05
 
 
 bk14_leftX = 0.000374091
@@ -209,7 +209,7 @@ def makeDeviceLayer1(resolution):
     bk5 = make_unit_dict(chipVHC, chipConductivity, chipThickness, resolution, bk5_leftX, bk5_bottomY, bk5_width, bk5_height, l0_b5_p)
     bk6 = make_unit_dict(chipVHC, chipConductivity, chipThickness, resolution, bk6_leftX, bk6_bottomY, bk6_width, bk6_height, l0_b6_p)
     bk7 = make_unit_dict(chipVHC, chipConductivity, chipThickness, resolution, bk7_leftX, bk7_bottomY, bk7_width, bk7_height, l0_b7_p)
-    bk8 = make_unit_dict(chipVHC, chipConductivity, chipThickness, resolution, bk4_leftX, bk4_bottomY, bk4_width, bk4_height, l0_b8_p)
+    bk8 = make_unit_dict(chipVHC, chipConductivity, chipThickness, resolution, bk8_leftX, bk8_bottomY, bk8_width, bk8_height, l0_b8_p)
 
 
 
@@ -0,0 +1,134 @@
+"""Automatic adaptive resolution.
+
+Instead of a fixed resolution per block, the model is meshed adaptively: every block starts at a coarse resolution (initialResolution, default [1,1]) and the steady state is solved.
+The blocks whose power density (W/m^3) or unresolved temperature variation (K) exceeds a threshold are refined (resolution doubled in X and Y, up to maxResolution) and the
+steady state is solved again, until the block temperatures (mean and max of every block) change by less than tolerance (K) between two iterations, or no block can be refined anymore.
+The temperature variation of a subblock is the largest of its temperature differences with its lateral neighbours (the lateral gradient times the subblock size) and of the
+temperature range of the subblocks it is coupled to in the layers above and below (so that a coarse layer under a hot spot is refined too, even if it is a single block).
+The thresholds default to refineFraction (one half) of the largest power density and variation of the current iteration, so that only the hot spots and their surroundings are refined.
+The steady state uses the steady power of the model (first value of power traces); power densities use the largest value of power traces.
+Iterations are assembled with chiplet stamps (see src/instancing.py), without touching the prepared model."""
+
+from copy import deepcopy
+
+import numpy as np
+import scipy.sparse.linalg
+
+from src import blockStats
+from src import instancing
+from src import instrument
+from src import nub_ctm as ctm
+
+"""Function that returns a copy of the block model with the given resolutions ({(layer, chiplet, block): [X, Y]}). Blocks that are not given keep their resolution."""
+def set_block_resolutions(blockModel, resolutions):
+    blockModel = deepcopy(blockModel)
+    for iLayer, layer in enumerate(blockModel):
+        for iChiplet, chiplet in enumerate(layer):
+            for iUnit, unit in enumerate(chiplet):
+                if (iLayer, iChiplet, iUnit) in resolutions:
+                    unit["resolution"] = list(resolutions[(iLayer, iChiplet, iUnit)])
+    return blockModel
+
+"""Function that returns the keys (layer, chiplet, block) of the blocks of a block model and their power density (W/m^3, largest value of power traces)."""
+def get_power_densities(blockModel):
+    keys = []
+    densities = []
+    for iLayer, layer in enumerate(blockModel):
+        for iChiplet, chiplet in enumerate(layer):
+            for iUnit, unit in enumerate(chiplet):
+                power = unit["powerDissipation"]
+                if ctm.is_power_trace(power):
+                    power = np.max(np.abs(power)) if len(power) else 0
+                keys.append((iLayer, iChiplet, iUnit))
+                densities.append(abs(power) / (unit["width"] * unit["height"] * unit["thickness"]))
+    return keys, np.array(densities, dtype=float)
+
+"""Function that returns the temperature variation (K) that the subblocks of every block do not resolve, for an assembled geometry (see assemble_geometry) and a temperature vector.
+For a subblock, it is the largest of the temperature differences with its lateral neighbours (lateral gradient times the subblock size) and of the temperature range of
+the subblocks it is coupled to in the layers above and below (lateral variation of the neighbouring layers over the subblock). The variation of a block is the largest of its subblocks."""
+def get_temperature_variations(geometry, tempVector):
+    centerMap = geometry["centerMap"]
+    centerNodes = centerMap["centerNodes"]
+    counts = np.diff(centerMap["segmentOffsets"])
+    layerOfCenter = np.repeat(centerMap["segmentKeys"][:, 0], counts)
+    position = np.full(geometry["G"].shape[0], -1, dtype=np.int64)    # Position of every center node in the center map (-1 for other nodes)
+    position[centerNodes] = np.arange(len(centerNodes))
+    G = geometry["G"].tocoo()
+    coupled = (position[G.row] >= 0) & (position[G.col] >= 0) & (G.row != G.col) & (G.data != 0)
+    i = position[G.row[coupled]]
+    j = position[G.col[coupled]]
+    centerTemps = tempVector[centerNodes]
+    variation = np.zeros(len(centerNodes))
+    lateral = layerOfCenter[i] == layerOfCenter[j]
+    np.maximum.at(variation, i[lateral], np.abs(centerTemps[i[lateral]] - centerTemps[j[lateral]]))
+    for direction in (1, -1):   # Layer above, layer below
+        vertical = layerOfCenter[j] == layerOfCenter[i] + direction
+        highest = np.full(len(centerNodes), -np.inf)
+        lowest = np.full(len(centerNodes), np.inf)
+        np.maximum.at(highest, i[vertical], centerTemps[j[vertical]])
+        np.minimum.at(lowest, i[vertical], centerTemps[j[vertical]])
+        hasNeighbours = np.isfinite(highest)
+        variation[hasNeighbours] = np.maximum(variation[hasNeighbours], highest[hasNeighbours] - lowest[hasNeighbours])
+    return np.maximum.reduceat(variation, centerMap["segmentOffsets"][:-1])
+
+"""Function that flattens and assembles a block model with stamps (see src/instancing.py), without touching the prepared model.
+stampCache is passed to assemble_model, to reuse the chiplet stamps of previous assemblies.
+Returns a dictionary with the sparse G matrix, the steady state I vector and the center node index map."""
+def assemble_geometry(blockModel, stampCache=None):
+    model = ctm.flatten_model(blockModel)
+    nodes, GMatrix, CMatrix = instancing.assemble_model(model, stampCache=stampCache)
+    IVector = np.zeros(len(nodes))
+    centerMap = ctm.make_center_map(nodes, model)
+    for i in centerMap["centerNodes"]:
+        power = model[nodes[i]["layerIndex"]][nodes[i]["chipletIndex"]][nodes[i]["unitIndex"]]["powerDissipation"]
+        IVector[i] = power[0] if ctm.is_power_trace(power) else power   # Steady power, as in populate_I_vector
+    return {"G": GMatrix, "I": IVector, "centerMap": centerMap}
+
+"""Function that refines the resolution of the blocks of a block model adaptively (see the description of this module).
+tolerance: largest change (K) of the block temperatures (mean and max of every block) between two iterations at convergence
+powerDensityThreshold (W/m^3), variationThreshold (K): blocks above either threshold are refined; default is refineFraction of the largest value of the iteration
+Every iteration is printed (number of nodes, change of the block temperatures, number of refined blocks), with a warning if the refinement stops before converging
+(maxIterations reached, or no block left to refine). Returns the refined block model."""
+def adapt_resolution(blockModel, tolerance=0.1, initialResolution=(1, 1), maxResolution=16, powerDensityThreshold=None, variationThreshold=None, refineFraction=0.5, maxIterations=10):
+    keys, densities = get_power_densities(blockModel)
+    blockIndex = {key: i for i, key in enumerate(keys)}
+    if initialResolution is None:
+        resolutions = {key: list(blockModel[key[0]][key[1]][key[2]]["resolution"]) for key in keys}
+    else:
+        resolutions = {key: list(initialResolution) for key in keys}
+    if powerDensityThreshold is None:
+        powerDensityThreshold = refineFraction * np.max(densities) if np.max(densities) > 0 else np.inf
+    previous = None
+    change = np.inf
+    for iteration in range(maxIterations):
+        model = set_block_resolutions(blockModel, resolutions)
+        with instrument.span("adaptive_iteration"):
+            geometry = assemble_geometry(model)
+            tempVector = scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(geometry["G"])).solve(geometry["I"])
+        statistics = blockStats.compute_statistics(tempVector, ("mean", "max"), ("block",), geometry["centerMap"])["block"]
+        order = np.array([blockIndex[tuple(int(index) for index in key)] for key in statistics["keys"]])
+        blockTemps = np.zeros((2, len(keys)))
+        blockTemps[:, order] = statistics["mean"], statistics["max"]
+        change = np.inf if previous is None else float(np.max(np.abs(blockTemps - previous)))
+        previous = blockTemps
+        if change < tolerance:
+            print("Adaptive resolution: iteration " + str(iteration + 1) + ", " + str(geometry["G"].shape[0]) + " nodes, change " + format(change, ".4g") + " K: converged")
+            break
+
+        variations = np.zeros(len(keys))
+        variations[order] = get_temperature_variations(geometry, tempVector)
+        threshold = variationThreshold
+        if threshold is None:
+            threshold = refineFraction * np.max(variations) if np.max(variations) > 0 else np.inf
+        refinable = np.array([min(resolutions[key]) < maxResolution for key in keys], dtype=bool)
+        refine = np.flatnonzero(refinable & ((densities >= powerDensityThreshold) | (variations >= threshold)))
+        print("Adaptive resolution: iteration " + str(iteration + 1) + ", " + str(geometry["G"].shape[0]) + " nodes, change " + format(change, ".4g") + " K, refining " + str(len(refine)) + " blocks")
+        if len(refine) == 0:
+            print("WARNING: adaptive resolution did not converge: no block left to refine after " + str(iteration + 1) + " iterations (last change " + format(change, ".4g") + " K)")
+            break
+        for i in refine:
+            resolutions[keys[i]] = [min(2 * r, maxResolution) for r in resolutions[keys[i]]]
+    else:
+        print("WARNING: adaptive resolution did not converge in " + str(maxIterations) + " iterations (last change " + format(change, ".4g") + " K)")
+    instrument.set_counter("adaptiveIterations", iteration + 1)
+    return set_block_resolutions(blockModel, resolutions)
@@ -0,0 +1,94 @@
+"""Per-block, per-chiplet and per-layer temperature statistics.
+
+Statistics are segmented reductions (np.ufunc.reduceat) over the center node temperatures, extracted once with the center node index map of the model (see make_center_map in nub_ctm.py).
+They work on a single temperature vector (nodes,) or on the whole transient at once (steps, nodes), and only the requested statistics and levels are computed.
+
+mean: average temperature, weighted by the area of the subblocks (for a block, all the subblocks have the same area, so this is the plain average)
+max, min: highest and lowest subblock temperature
+center: temperature at the center of the block (average of the subblock(s) closest to the center of the block). Only available at the block level."""
+
+import numpy as np
+
+from src import globalVar
+from src import nub_ctm as ctm
+
+STATISTICS = ("mean", "max", "min", "center")
+LEVELS = ("block", "chiplet", "layer")
+
+"""Function that returns the segments of the center node array for a level: the offsets of the segments and the keys identifying them
+((layer, chiplet, unit) for blocks, (layer, chiplet) for chiplets, (layer,) for layers). Segments are computed once and kept in the center map."""
+def get_level_segments(centerMap, level):
+    cache = centerMap.setdefault("levelSegments", {})
+    if level not in cache:
+        offsets = centerMap["segmentOffsets"]
+        keys = centerMap["segmentKeys"]
+        if level == "block":
+            cache[level] = (offsets, keys)
+        else:
+            width = 2 if level == "chiplet" else 1
+            levelKeys = keys[:, :width]
+            firstBlocks = np.concatenate(([0], np.flatnonzero(np.any(levelKeys[1:] != levelKeys[:-1], axis=1)) + 1))   # Blocks where a new chiplet (or layer) starts
+            cache[level] = (np.concatenate((offsets[firstBlocks], offsets[-1:])), levelKeys[firstBlocks])
+    return cache[level]
+
+"""Function that returns, for each block, the positions (in the center node array) of the subblock(s) closest to the center of the block, with their offsets per block.
+Square resolutions give the same result as get_unit_center_temps: the middle subblock for odd resolutions, the average of the 4 middle ones for even resolutions."""
+def get_center_picks(centerMap):
+    if "centerPicks" not in centerMap:
+        starts = centerMap["segmentOffsets"][:-1]
+        counts = np.diff(centerMap["segmentOffsets"])
+        rightX = centerMap["leftX"] + centerMap["width"]
+        topY = centerMap["bottomY"] + centerMap["height"]
+        blockCenterX = np.repeat((np.minimum.reduceat(centerMap["leftX"], starts) + np.maximum.reduceat(rightX, starts)) / 2, counts)
+        blockCenterY = np.repeat((np.minimum.reduceat(centerMap["bottomY"], starts) + np.maximum.reduceat(topY, starts)) / 2, counts)
+        distance = np.hypot((centerMap["leftX"] + rightX)/2 - blockCenterX, (centerMap["bottomY"] + topY)/2 - blockCenterY)
+        closest = np.repeat(np.minimum.reduceat(distance, starts), counts)
+        picked = distance <= closest + 1e-9*np.repeat(np.maximum.reduceat(np.hypot(centerMap["width"], centerMap["height"]), starts), counts)  # Ties (e.g. 4 middle subblocks) within a small fraction of the subblock size
+        picks = np.flatnonzero(picked)
+        pickCounts = np.add.reduceat(picked.astype(np.int64), starts)
+        centerMap["centerPicks"] = (picks, np.concatenate(([0], np.cumsum(pickCounts)[:-1])), pickCounts)
+    return centerMap["centerPicks"]
+
+"""Function that computes temperature statistics over a temperature vector (nodes,) or a stack of temperature vectors (steps, nodes).
+statistics: statistics to compute, among STATISTICS
+levels: levels to compute them at, among LEVELS ("center" is only computed at the block level)
+centerMap: center node index map of the model, default is the map of the prepared model
+Returns a dictionary {level: {"keys": keys of the segments, statistic: array of shape (..., segments)}}."""
+def compute_statistics(tempVectors, statistics=("mean", "max", "min"), levels=("block",), centerMap=None):
+    for statistic in statistics:
+        if statistic not in STATISTICS:
+            raise ValueError("Unknown statistic: " + str(statistic) + ". Valid statistics are: " + ", ".join(STATISTICS))
+    for level in levels:
+        if level not in LEVELS:
+            raise ValueError("Unknown level: " + str(level) + ". Valid levels are: " + ", ".join(LEVELS))
+    if centerMap is None:
+        centerMap = globalVar.centerMap
+    centerTemps = ctm.extract_center_temperatures(tempVectors, centerMap)  # One extraction for all statistics and levels
+    weightedTemps = None
+
+    results = {}
+    for level in levels:
+        offsets, keys = get_level_segments(centerMap, level)
+        starts = offsets[:-1]
+        results[level] = {"keys": keys}
+        for statistic in statistics:
+            if statistic == "max":
+                results[level][statistic] = np.maximum.reduceat(centerTemps, starts, axis=-1)
+            elif statistic == "min":
+                results[level][statistic] = np.minimum.reduceat(centerTemps, starts, axis=-1)
+            elif statistic == "mean":
+                areas = centerMap["width"] * centerMap["height"]
+                if weightedTemps is None:
+                    weightedTemps = centerTemps * areas
+                results[level][statistic] = np.add.reduceat(weightedTemps, starts, axis=-1) / np.add.reduceat(areas, starts)
+            elif statistic == "center" and level == "block":
+                picks, pickOffsets, pickCounts = get_center_picks(centerMap)
+                results[level][statistic] = np.add.reduceat(centerTemps[..., picks], pickOffsets, axis=-1) / pickCounts
+    return results
+
+"""Function that returns the hottest and coldest subblock temperatures over a temperature vector or a stack of vectors (one value per step), only looking at center nodes."""
+def get_extreme_temperatures(tempVectors, centerMap=None):
+    if centerMap is None:
+        centerMap = globalVar.centerMap
+    centerTemps = ctm.extract_center_temperatures(tempVectors, centerMap)
+    return centerTemps.max(axis=-1), centerTemps.min(axis=-1)
@@ -0,0 +1,88 @@
+"""Checkpoints of simulation states, to resume long transient simulations and to start a transient from a saved state.
+
+A state file (.npz) holds the temperature vector (relative to the ambient) and JSON metadata:
+kind: "steady" or "transient"
+fingerprint: fingerprint of the thermal network (see model_fingerprint), a state is only loaded on the same network
+baseTemp: ambient temperature of the run (K)
+position: [phase, substep] of the next substep to compute, time: simulated time (s), stepDefinition: step definition of the run (transient states only)
+logSize: size of the log when the state was saved, so the steps written after the checkpoint can be discarded on resume
+solver: method, factorization (the solver of the run: "direct" or "domain-decomposition"), precision ("double" or "mixed") and timestep of the run
+States are written to a temporary file that replaces the previous one, so a crash while saving never leaves a corrupted checkpoint."""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import scipy
+
+from src import globalVar
+from src import nub_ctm as ctm
+
+"""Function that returns the fingerprint of the thermal network of the prepared model: a hash of the number of nodes and of the sparse G and C matrices.
+Power is not part of the fingerprint, so a state can be used to start a simulation of the same model with another workload."""
+def model_fingerprint(GMatrix=None, CMatrix=None):
+    if GMatrix is None:
+        GMatrix = globalVar.GMatrix
+    if CMatrix is None:
+        CMatrix = globalVar.CMatrix
+    cache = ctm.get_factorization_cache(GMatrix, CMatrix)   # Sparse matrices are already built (and kept) for the solvers
+    fingerprint = hashlib.sha256(str(cache["G"].shape).encode())
+    for matrix in (cache["G"], cache["C"]):
+        matrix = matrix.copy()
+        matrix.sort_indices()
+        for array in (matrix.indptr, matrix.indices, matrix.data):
+            fingerprint.update(np.ascontiguousarray(array).tobytes())
+    return fingerprint.hexdigest()
+
+"""Function that saves a state. tempVector is relative to the ambient. Other metadata (position, stepDefinition, logSize, ...) can be given as keyword arguments."""
+def save_state(path, tempVector, kind, fingerprint=None, **metadata):
+    metadata.update({
+        "kind": kind,
+        "fingerprint": fingerprint if fingerprint is not None else model_fingerprint(),
+        "baseTemp": globalVar.baseTemp,
+        "nodes": len(tempVector),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__
+    })
+    temporaryPath = str(path) + ".tmp"
+    with open(temporaryPath, 'wb') as outfile:
+        np.savez(outfile, temperatures=np.asarray(tempVector, dtype=float), metadata=np.array(json.dumps(metadata)))
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.replace(temporaryPath, path)
+
+"""Function that loads a state. Returns the temperature vector (relative to the ambient of the saved run) and the metadata.
+If fingerprint is given, raises a ValueError when the state was saved on another thermal network."""
+def load_state(path, fingerprint=None):
+    with np.load(path) as state:
+        tempVector = state["temperatures"]
+        metadata = json.loads(str(state["metadata"]))
+    if fingerprint is not None and metadata["fingerprint"] != fingerprint:
+        raise ValueError("State " + str(path) + " was saved on another model (fingerprint mismatch)")
+    return tempVector, metadata
+
+"""Function that loads a saved steady state or transient state as the initial temperature vector of a new transient simulation, relative to the current ambient (globalVar.baseTemp).
+The absolute temperatures of the saved state are kept if the ambient temperature changed."""
+def load_initial_state(path):
+    tempVector, metadata = load_state(path, model_fingerprint())
+    return tempVector + (metadata["baseTemp"] - globalVar.baseTemp)
+
+"""Function that checks that a transient checkpoint can resume a run with stepDefinition: all the phases up to the checkpoint must be the same,
+later phases can differ (e.g. to extend the run). Raises a ValueError otherwise."""
+def check_resume(metadata, stepDefinition):
+    if metadata["kind"] != "transient":
+        raise ValueError("Only transient states can be resumed, use it as an initial state instead")
+    phase, substep = metadata["position"]
+    lastPhase = phase + 1 if substep > 0 else phase     # Phases started before the checkpoint
+    savedPhases = metadata["stepDefinition"][:lastPhase]
+    if len(stepDefinition) < lastPhase or [dict(step) for step in stepDefinition[:lastPhase]] != savedPhases:
+        raise ValueError("The step definition does not match the checkpoint up to phase " + str(lastPhase))
+    if metadata["baseTemp"] != globalVar.baseTemp:
+        raise ValueError("The checkpoint was saved with baseTemp = " + str(metadata["baseTemp"]) + ", not " + str(globalVar.baseTemp))
+
+"""Function that returns the (phase, substep) position following a substep, i.e. where a simulation stopped after this substep resumes."""
+def next_position(stepDefinition, phase, substep):
+    if substep + 1 < stepDefinition[phase]["steps"]:
+        return [phase, substep + 1]
+    return [phase + 1, 0]
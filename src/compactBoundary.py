@@ -0,0 +1,200 @@
+"""Compact boundary models of the passive layers on top of the stack (TIM, heat spreader, heat sink).
+
+The homogeneous passive layers at the top of the model (every block of the layer with the same material and thickness, and no power) are replaced by a compact model of the heat path
+from the top of the highest remaining layer to the ambient. Each compacted layer i is a plate of area A_i, fed by the area of the layer below it (A_s), with the heat transfer coefficient
+of everything above it on its top face. Its resistance is the one-dimensional resistance t_i/(k_i*A_i) plus the spreading resistance of the source over the plate
+(Lee, Song, Au and Moran, average temperature of the source):
+    epsilon = a/b, tau = t/b, Bi = h*b/k, lambda = pi + 1/(sqrt(pi)*epsilon), a = sqrt(A_s/pi), b = sqrt(A_i/pi)
+    phi = (tanh(lambda*tau) + lambda/Bi) / (1 + lambda/Bi*tanh(lambda*tau))
+    R_spreading = (1 - epsilon)^(3/2) * phi / (2*sqrt(pi)*k*a)
+Two compact models are available:
+boundary: the compacted layers are removed and the top of the highest remaining layer convects to the ambient with an effective heat transfer coefficient
+(sum of the plate resistances and of the convection of the top plate), spread uniformly over its area. Meant for steady state: the heat capacity of the compacted layers is lost.
+network: every compacted layer is replaced by a single block over the footprint of the highest remaining layer, with the conductivity giving its plate resistance and
+the volumetric heat capacity giving its heat capacity: a ladder of one node per layer, which keeps the thermal inertia of the heat sink for transient simulations.
+The heat transfer coefficient of the top of the model is globalVar.heatTransferCoefficient (W/(m^2*K)); compacting the top layers changes it to the effective coefficient of the new top,
+given to prepareModel in globalVar.topBoundaryCoefficient.
+By default, the compact model is the analytical one, built without solving anything. The analytical resistances assume a uniform source and are off by tens of percent for small dies
+under thin layers, so the compact model can be calibrated against the full model (globalVar.compactCalibration): the steady state of the full model is solved once, and all the resistances
+of the compact model (plates and convection) are scaled by one factor, found by secant iterations, so that the mean temperature of the active layers (the remaining layers that are not
+homogeneous and passive, or the highest remaining layer if there are none) matches. The largest change of the block temperatures (mean and max of every block) of the active layers
+is then the error of the compact model. Above the tolerance, fewer layers are compacted; if even one layer is above the tolerance, the model is not compacted, with a warning.
+The calibration (the compacted layers and the scale of their resistances) is kept in globalVar.compactCalibrations, keyed on the geometry of the model (its blocks without their power),
+so that the models of a sweep over power maps or a server session are calibrated once."""
+
+from copy import deepcopy
+import math
+
+import numpy as np
+import scipy.optimize
+import scipy.sparse.linalg
+
+from src import adaptiveMesh
+from src import blockStats
+from src import globalVar
+from src import nub_ctm as ctm
+
+MODES = ("off", "boundary", "network")
+
+"""Function that returns True if a layer of a block model is homogeneous and passive: all its blocks have the same material and thickness, and none of them dissipates power."""
+def is_homogeneous_passive(layer):
+    units = [unit for chiplet in layer for unit in chiplet]
+    if not units:
+        return False
+    for unit in units:
+        power = unit["powerDissipation"]
+        if any(p != 0 for p in power) if ctm.is_power_trace(power) else power != 0:
+            return False
+        if (unit["thickness"], unit["conductivity"], unit["volumetricHeatCapacity"]) != (units[0]["thickness"], units[0]["conductivity"], units[0]["volumetricHeatCapacity"]):
+            return False
+    return True
+
+"""Function that returns the area (m^2) of the blocks of a layer."""
+def get_layer_area(layer):
+    return sum(unit["width"] * unit["height"] for chiplet in layer for unit in chiplet)
+
+"""Function that returns the footprint of a layer (leftX, bottomY, width, height): the bounding box of its blocks."""
+def get_layer_footprint(layer):
+    units = [unit for chiplet in layer for unit in chiplet]
+    leftX = min(unit["leftX"] for unit in units)
+    bottomY = min(unit["bottomY"] for unit in units)
+    return leftX, bottomY, max(unit["leftX"] + unit["width"] for unit in units) - leftX, max(unit["bottomY"] + unit["height"] for unit in units) - bottomY
+
+"""Function that returns the spreading resistance (K/W) of a heat source of area sourceArea (m^2) on a plate of area plateArea, thickness (m) and conductivity (W/(m*K)),
+cooled on its other face with the given heat transfer coefficient (W/(m^2*K)). The source and the plate are taken as coaxial disks. It is 0 if the source covers the plate."""
+def get_spreading_resistance(sourceArea, plateArea, thickness, conductivity, heatTransferCoefficient):
+    if sourceArea >= plateArea:
+        return 0.0
+    a = math.sqrt(sourceArea / math.pi)
+    b = math.sqrt(plateArea / math.pi)
+    epsilon = a / b
+    tau = thickness / b
+    lambdaC = math.pi + 1 / (math.sqrt(math.pi) * epsilon)
+    lambdaOverBi = lambdaC * conductivity / (heatTransferCoefficient * b)
+    phi = (math.tanh(lambdaC * tau) + lambdaOverBi) / (1 + lambdaOverBi * math.tanh(lambdaC * tau))
+    return (1 - epsilon)**1.5 * phi / (2 * math.sqrt(math.pi) * conductivity * a)
+
+"""Function that returns the index of the first layer of the homogeneous passive layers at the top of a block model (len(blockModel) if the top layer is not one of them),
+taking at most maxLayers layers (default is all of them). The bottom layer is never compacted."""
+def find_compactable_layers(blockModel, maxLayers=None):
+    first = len(blockModel)
+    while first > 1 and is_homogeneous_passive(blockModel[first - 1]) and (maxLayers is None or len(blockModel) - first < maxLayers):
+        first -= 1
+    return first
+
+"""Function that returns the resistance (K/W) of every layer of the block model from layer first up (one-dimensional plus spreading resistance, see the description of this module)
+and the convection resistance of the top layer, for the heat transfer coefficient of the top of the stack."""
+def get_stack_resistances(blockModel, first, heatTransferCoefficient):
+    areas = [get_layer_area(layer) for layer in blockModel]
+    resistances = [0.0] * len(blockModel)
+    above = 1 / (heatTransferCoefficient * areas[-1])   # Resistance from the top of the current layer to the ambient
+    convection = above
+    for iLayer in range(len(blockModel) - 1, first - 1, -1):
+        unit = blockModel[iLayer][0][0]
+        plateCoefficient = 1 / (above * areas[iLayer])
+        resistances[iLayer] = unit["thickness"] / (unit["conductivity"] * areas[iLayer]) + get_spreading_resistance(min(areas[iLayer - 1], areas[iLayer]), areas[iLayer], unit["thickness"], unit["conductivity"], plateCoefficient)
+        above += resistances[iLayer]
+    return resistances[first:], convection
+
+"""Function that builds the compact model of the layers of a block model from layer first up (mode "boundary" or "network", see the description of this module),
+with all its resistances multiplied by scale. Returns the compacted block model (a copy) and the heat transfer coefficient (W/(m^2*K)) of its top layer."""
+def make_compact_model(blockModel, first, mode, heatTransferCoefficient, scale=1.0):
+    resistances, convection = get_stack_resistances(blockModel, first, heatTransferCoefficient)
+    if mode == "boundary":
+        return deepcopy(blockModel[:first]), 1 / ((sum(resistances) + convection) * scale * get_layer_area(blockModel[first - 1]))
+
+    leftX, bottomY, width, height = get_layer_footprint(blockModel[first - 1])
+    compacted = deepcopy(blockModel[:first])
+    for layer, resistance in zip(blockModel[first:], resistances):
+        unit = layer[0][0]
+        conductivity = unit["thickness"] / (resistance * scale * width * height)
+        volumetricHeatCapacity = unit["volumetricHeatCapacity"] * get_layer_area(layer) / (width * height)    # Same heat capacity as the layer
+        compacted.append([[ctm.make_unit_dict(volumetricHeatCapacity, conductivity, unit["thickness"], [1, 1], leftX, bottomY, width, height, 0)]])
+    return compacted, heatTransferCoefficient * get_layer_area(blockModel[-1]) / (width * height * scale)    # Same convection resistance as the top layer
+
+"""Function that solves the steady state of a block model with the given heat transfer coefficient on its top layer, without touching the prepared model.
+stampCache is shared by the solves (see assemble_geometry). Returns the statistics of every block (see compute_statistics: keys, mean and max, relative to the ambient)."""
+def solve_block_temperatures(blockModel, heatTransferCoefficient, stampCache):
+    previous = globalVar.topBoundaryCoefficient
+    globalVar.topBoundaryCoefficient = heatTransferCoefficient
+    try:
+        geometry = adaptiveMesh.assemble_geometry(blockModel, stampCache)
+    finally:
+        globalVar.topBoundaryCoefficient = previous
+    tempVector = scipy.sparse.linalg.splu(geometry["G"].tocsc()).solve(geometry["I"])
+    return blockStats.compute_statistics(tempVector, ("mean", "max"), ("block",), geometry["centerMap"])["block"]
+
+"""Function that returns the area-weighted mean temperature of the blocks of the given layers (statistics of solve_block_temperatures)."""
+def get_layers_mean(statistics, blockModel, layers):
+    inLayers = np.isin(statistics["keys"][:, 0], layers)
+    areas = np.array([blockModel[iLayer][iChiplet][iUnit]["width"] * blockModel[iLayer][iChiplet][iUnit]["height"] for iLayer, iChiplet, iUnit in statistics["keys"][inLayers]])
+    return float(np.dot(areas, statistics["mean"][inLayers]) / np.sum(areas))
+
+"""Function that calibrates the compact model of the layers of a block model from layer first up against the full model (statistics of its steady state, see the description
+of this module). Returns the compacted block model, the heat transfer coefficient of its top layer, the scale of its resistances and its error (K) on the active layers."""
+def calibrate_compact_model(blockModel, first, mode, heatTransferCoefficient, full, stampCache):
+    active = [iLayer for iLayer in range(first) if not is_homogeneous_passive(blockModel[iLayer])] or [first - 1]
+    target = get_layers_mean(full, blockModel, active)
+
+    def get_mismatch(scale):
+        compacted, coefficient = make_compact_model(blockModel, first, mode, heatTransferCoefficient, scale)
+        return get_layers_mean(solve_block_temperatures(compacted, coefficient, stampCache), blockModel, active) - target
+
+    result = scipy.optimize.root_scalar(get_mismatch, x0=1.0, x1=1.1, method="secant", xtol=1e-4, maxiter=20)
+    scale = result.root if result.converged and result.root > 0 else 1.0
+    compacted, coefficient = make_compact_model(blockModel, first, mode, heatTransferCoefficient, scale)
+    statistics = solve_block_temperatures(compacted, coefficient, stampCache)
+    fullIndex = {tuple(key): i for i, key in enumerate(full["keys"].tolist())}
+    pairs = np.array([(i, fullIndex[tuple(key)]) for i, key in enumerate(statistics["keys"].tolist()) if key[0] in active], dtype=np.int64).reshape(-1, 2)
+    changes = np.maximum(np.abs(statistics["mean"][pairs[:, 0]] - full["mean"][pairs[:, 1]]), np.abs(statistics["max"][pairs[:, 0]] - full["max"][pairs[:, 1]]))
+    return compacted, coefficient, scale, float(np.max(changes, initial=0))
+
+"""Function that returns a hashable key of the geometry of a block model (every block without its power), the key of the calibration cache."""
+def get_geometry_key(blockModel):
+    return repr([[[sorted((name, value) for name, value in unit.items() if name != "powerDissipation") for unit in chiplet] for chiplet in layer] for layer in blockModel])
+
+"""Function that returns the calibration of the compact model of a block model (see calibrate_compact_model): the first compacted layer and the scale of its resistances,
+or None if even the top layer alone is above the tolerance. The calibration is cached in globalVar.compactCalibrations per geometry, mode, heat transfer coefficient and tolerance."""
+def get_calibration(blockModel, first, mode, heatTransferCoefficient, tolerance):
+    key = (get_geometry_key(blockModel), first, mode, heatTransferCoefficient, tolerance)
+    if key in globalVar.compactCalibrations:
+        print("Compact boundary (" + mode + "): calibration of this geometry reused")
+        return globalVar.compactCalibrations[key]
+    stampCache = {}
+    full = solve_block_temperatures(blockModel, heatTransferCoefficient, stampCache)
+    calibration = None
+    for first in range(first, len(blockModel)):
+        _, _, scale, error = calibrate_compact_model(blockModel, first, mode, heatTransferCoefficient, full, stampCache)
+        resistances, convection = get_stack_resistances(blockModel, first, heatTransferCoefficient)
+        print("Compact boundary (" + mode + "): layers " + str(first) + " to " + str(len(blockModel) - 1) + ", resistance to ambient " + format((sum(resistances) + convection) * scale, ".4g")
+              + " K/W (analytical estimate x " + format(scale, ".3g") + "), error on the active layers " + format(error, ".3g") + " K")
+        if error <= tolerance:
+            calibration = (first, scale)
+            break
+    globalVar.compactCalibrations[key] = calibration
+    return calibration
+
+"""Function that replaces the homogeneous passive layers at the top of a block model by a compact model (mode "boundary" or "network", see the description of this module).
+maxLayers: largest number of layers to compact, from the top (default is all the homogeneous passive layers at the top).
+calibrate: calibrate the compact model against the full model (default is globalVar.compactCalibration), otherwise the analytical compact model is used.
+tolerance: largest error (K) of the block temperatures of the active layers with calibration (default is globalVar.compactTolerance); fewer layers are compacted above it.
+Returns the compacted block model (a copy, or the block model itself if no layer can be compacted) and the heat transfer coefficient (W/(m^2*K)) of its top layer."""
+def compact_top_layers(blockModel, mode, heatTransferCoefficient, maxLayers=None, tolerance=None, calibrate=None):
+    if mode not in MODES:
+        raise ValueError("Unknown compact boundary mode: " + str(mode) + ". Valid modes are: " + ", ".join(MODES))
+    first = find_compactable_layers(blockModel, maxLayers)
+    if mode == "off" or first == len(blockModel):
+        if mode != "off":
+            print("WARNING: no homogeneous passive layer at the top of the model, compact boundary not applied")
+        return blockModel, heatTransferCoefficient
+    if not (globalVar.compactCalibration if calibrate is None else calibrate):
+        resistances, convection = get_stack_resistances(blockModel, first, heatTransferCoefficient)
+        print("Compact boundary (" + mode + "): layers " + str(first) + " to " + str(len(blockModel) - 1) + ", analytical resistance to ambient " + format(sum(resistances) + convection, ".4g") + " K/W")
+        return make_compact_model(blockModel, first, mode, heatTransferCoefficient)
+    if tolerance is None:
+        tolerance = globalVar.compactTolerance
+    calibration = get_calibration(blockModel, first, mode, heatTransferCoefficient, tolerance)
+    if calibration is None:
+        print("WARNING: compact boundary not applied: compacting even the top layer changes the active layer temperatures by more than " + str(tolerance) + " K")
+        return blockModel, heatTransferCoefficient
+    return make_compact_model(blockModel, calibration[0], mode, heatTransferCoefficient, calibration[1])
@@ -8,6 +8,37 @@ parser.add_argument("--model", required=True)
 parser.add_argument("--base-temp", type=float, default=318.5)
 parser.add_argument("--transient", action="store_true")
 parser.add_argument("--steady-state", action="store_true")
+parser.add_argument("--report", default=None, help="write a JSON run report (timings per stage, counters, peak memory) to this file")
+parser.add_argument("--profile", action="store_true", help="profile the run with cProfile (stats written next to the report)")
+parser.add_argument("--trace-memory", action="store_true", help="record the peak Python allocation of each stage with tracemalloc")
+parser.add_argument("--transient-output", choices=["full", "probes", "summary"], default="full", help="transient output: every subblock, only the probe blocks, or per-step chiplet and layer aggregates")
+parser.add_argument("--probes", nargs="*", default=[], help="probe blocks of the probes output, as layer,chiplet,block (e.g. 0,0,1 0,1,3)")
+parser.add_argument("--steady-state-file", default=None, help="save the steady state to this file, to start transient simulations from it")
+parser.add_argument("--checkpoint", default=None, help="save transient checkpoints to this file")
+parser.add_argument("--checkpoint-every", type=int, default=100, help="number of substeps between two transient checkpoints")
+parser.add_argument("--resume", action="store_true", help="resume the transient simulation from the checkpoint file")
+parser.add_argument("--initial-state", default=None, help="start the transient simulation from this saved steady or transient state")
+parser.add_argument("--periodic", action="store_true", help="the transient step definition is one cycle of a repeating workload: output the settled (periodic steady state) cycle")
+parser.add_argument("--auto-steps", action="store_true", help="derive the transient step definition from the thermal time constants of the model")
+parser.add_argument("--tolerance", type=float, default=None, help="stop a transient phase early once the temperatures change slower than this (K/s)")
+parser.add_argument("--converged", choices=["stop", "steady"], default="stop", help="when a phase converges: keep the current state, or jump to the steady state of the phase")
+parser.add_argument("--solver", choices=["direct", "domain-decomposition"], default="direct", help="linear solver: sparse LU of the whole network, or Schur complement over (layer, chiplet) subdomains")
+parser.add_argument("--solver-threads", type=int, default=None, help="threads of the domain decomposition solver (default: number of CPUs)")
+parser.add_argument("--adaptive", action="store_true", help="choose the block resolutions automatically, refining the blocks with a high power density or temperature variation")
+parser.add_argument("--adaptive-tolerance", type=float, default=0.1, help="stop refining once the block temperatures change by less than this (K) between two refinements")
+parser.add_argument("--htc", type=float, default=1200, help="heat transfer coefficient (W/(m^2*K)) from the top of the model to the ambient")
+parser.add_argument("--compact-boundary", choices=["off", "boundary", "network"], default="off", help="replace the homogeneous passive layers at the top of the model by an effective boundary condition or a one-node-per-layer network")
+parser.add_argument("--compact-layers", type=int, default=None, help="largest number of top layers replaced by the compact boundary (default: all the homogeneous passive layers at the top)")
+parser.add_argument("--compact-tolerance", type=float, default=0.5, help="largest change (K) of the active layer temperatures caused by the calibrated compact boundary: fewer layers are compacted above it")
+parser.add_argument("--compact-calibration", action="store_true", help="calibrate the compact boundary against a steady state of the full model (cached per geometry) instead of using the analytical resistances")
+parser.add_argument("--parareal", action="store_true", help="integrate the transient in parallel in time (Parareal) on a process pool")
+parser.add_argument("--parareal-workers", type=int, default=None, help="processes and time slices of the Parareal integration (default: number of CPUs)")
+parser.add_argument("--preflight", choices=["off", "plan", "refuse", "downgrade"], default="off", help="estimate the memory and time of the run before building the model: print the plan, refuse runs over the limits or downgrade them")
+parser.add_argument("--preflight-memory", type=float, default=None, help="memory limit (MB) of the preflight check (default: available system memory)")
+parser.add_argument("--preflight-time", type=float, default=None, help="time limit (s) of the preflight check (default: no limit)")
+parser.add_argument("--validate", choices=["off", "warn", "error"], default="warn", help="check the geometry of the model before building it (overlaps, non-rectangular chiplets, zero-area interfaces): print the problems or stop on errors")
+parser.add_argument("--precision", choices=["double", "mixed"], default="double", help="precision of the factorizations: double, or single precision factors with iterative refinement against double precision residuals (less memory)")
+parser.add_argument("--refinement-tolerance", type=float, default=1e-4, help="mixed precision: largest estimated error (K) of the temperatures after the iterative refinement")
 args = parser.parse_args()
 
 model = args.model
@@ -17,10 +48,16 @@ global_vars = Path("src/globalVar.py")
 
 text = main_py.read_text()
 
-# Update model import
+# Update model import. Declarative model files (models/<name>.json, .toml or .npz) are read with the model file loader instead of being imported.
+modelFile = Path("models") / model
+if modelFile.suffix in (".json", ".toml", ".npz"):
+    modelImport = f'from src.modelFile import load_model; model = load_model("{modelFile.as_posix()}")'
+    model = modelFile.stem
+else:
+    modelImport = f"from models.{model} import model"
 text = re.sub(
-    r"from\s+models\.[a-zA-Z0-9_]+\s+import\s+model",
-    f"from models.{model} import model",
+    r"from\s+models\.[a-zA-Z0-9_]+\s+import\s+model|from\s+src\.modelFile\s+import\s+load_model;\s*model\s*=\s*load_model\([^\)]*\)",
+    lambda m: modelImport,
     text
 )
 
@@ -62,4 +99,45 @@ gv_text = re.sub(
     gv_text,
     flags=re.MULTILINE
 )
+# Update instrumentation, transient output and checkpoint settings
+settings = {
+    "reportFile": repr(args.report) if args.report else "None",
+    "profileRun": str(args.profile),
+    "traceMemory": str(args.trace_memory),
+    "transientOutput": repr(args.transient_output),
+    "transientProbes": repr([tuple(int(index) for index in probe.split(",")) for probe in args.probes]),
+    "steadyStateFile": repr(args.steady_state_file) if args.steady_state_file else "None",
+    "checkpointFile": repr(args.checkpoint) if args.checkpoint else "None",
+    "checkpointEvery": str(args.checkpoint_every),
+    "resumeTransient": str(args.resume),
+    "initialStateFile": repr(args.initial_state) if args.initial_state else "None",
+    "periodicTransient": str(args.periodic),
+    "autoStepDefinition": str(args.auto_steps),
+    "transientTolerance": str(args.tolerance),
+    "convergedPhase": repr(args.converged),
+    "solver": repr(args.solver),
+    "solverThreads": str(args.solver_threads),
+    "adaptiveResolution": str(args.adaptive),
+    "adaptiveTolerance": str(args.adaptive_tolerance),
+    "heatTransferCoefficient": str(args.htc),
+    "compactBoundary": repr(args.compact_boundary),
+    "compactLayers": str(args.compact_layers),
+    "compactTolerance": str(args.compact_tolerance),
+    "compactCalibration": str(args.compact_calibration),
+    "parallelInTime": str(args.parareal),
+    "pararealWorkers": str(args.parareal_workers),
+    "preflight": repr(args.preflight),
+    "preflightMemory": str(args.preflight_memory),
+    "preflightTime": str(args.preflight_time),
+    "validateGeometry": repr(args.validate),
+    "precision": repr(args.precision),
+    "refinementTolerance": str(args.refinement_tolerance)
+}
+for name, value in settings.items():
+    gv_text = re.sub(
+        rf"^{name}\s*=.*$",
+        f"{name} = {value}",
+        gv_text,
+        flags=re.MULTILINE
+    )
 global_vars.write_text(gv_text)
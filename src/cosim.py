@@ -0,0 +1,94 @@
+"""Online stepping interface, to drive ARTSim from a dynamic thermal management (DTM/DVFS) controller in a co-simulation loop.
+
+The controller gives the power of every block of the model for the next interval and gets the block temperatures at the end of the interval back:
+
+stepper = make_stepper()                            # after prepareModel(model)
+temperatures = step(stepper, blockPower, 0.001)     # one call per control interval
+
+A stepper is a dictionary holding the state (temperature vector, time) and everything a step needs, precomputed once: the center node index map, the diagonal of C and
+the LU factorizations of G + C/h, kept per timestep h. A step with an interval seen before costs one sparse solve plus a few vector operations.
+Blocks are ordered by (layer, chiplet, block) indices of the block model, as in stepper["blocks"] (passive layers are blocks too); the power of a block is shared equally by its subblocks."""
+
+import numpy as np
+
+from src import globalVar
+from src import nub_ctm as ctm
+
+"""Function that returns a new stepper for the prepared model (see prepareModel), starting at the ambient temperature or at initialState (temperature vector relative to the ambient)."""
+def make_stepper(initialState=None):
+    if not globalVar.modelPrepared:
+        raise Exception("Model not prepared. Please call prepareModel(model) before creating a stepper")
+    GMatrix = globalVar.GMatrix
+    CMatrix = globalVar.CMatrix
+    cache = ctm.get_factorization_cache(GMatrix, CMatrix)
+    centerMap = ctm.get_center_map(globalVar.nodes, globalVar.model)
+    counts = np.diff(centerMap["segmentOffsets"])
+    areas = centerMap["width"] * centerMap["height"]
+    nodeCount = len(globalVar.nodes)
+    return {
+        "GMatrix": GMatrix,
+        "CMatrix": CMatrix,
+        "capacities": cache["C"].diagonal().copy(),     # C is diagonal (capacities of the center nodes)
+        "factors": {},
+        "centerNodes": centerMap["centerNodes"],
+        "blockOfCenter": np.repeat(np.arange(len(counts)), counts),
+        "shareOfCenter": np.repeat(1/counts, counts),
+        "starts": centerMap["segmentOffsets"][:-1],
+        "areas": areas,
+        "blockAreas": np.add.reduceat(areas, centerMap["segmentOffsets"][:-1]),
+        "blocks": [tuple(int(index) for index in key) for key in centerMap["segmentKeys"]],
+        "baseTemp": globalVar.baseTemp,
+        "IVector": np.zeros(nodeCount),
+        "temperatures": np.zeros(nodeCount) if initialState is None else np.array(initialState, dtype=float),
+        "time": 0.0
+    }
+
+"""Function that converts the power of the blocks to a power vector ordered as stepper["blocks"]. blockPower is a sequence (one value per block, in W)
+or a dictionary {(layer, chiplet, block): W}, where the blocks that are not given dissipate no power."""
+def block_power_vector(stepper, blockPower):
+    if isinstance(blockPower, dict):
+        powerVector = np.zeros(len(stepper["blocks"]))
+        blockIndex = stepper.setdefault("blockIndex", {block: i for i, block in enumerate(stepper["blocks"])})
+        for block, power in blockPower.items():
+            powerVector[blockIndex[tuple(block)]] = power
+        return powerVector
+    powerVector = np.asarray(blockPower, dtype=float)
+    if powerVector.shape != (len(stepper["blocks"]),):
+        raise ValueError("Expected one power value per block (" + str(len(stepper["blocks"])) + "), got shape " + str(powerVector.shape))
+    return powerVector
+
+"""Function that advances the stepper by one interval (s) with the given block power (see block_power_vector), in `substeps` backward Euler steps.
+Returns the temperature (K) of every block at the end of the interval: the area-weighted mean of its subblocks, or their max if statistic is "max"."""
+def step(stepper, blockPower, interval, substeps=1, statistic="mean"):
+    h = interval / substeps
+    factor = stepper["factors"].get(h)
+    if factor is None:
+        factor = stepper["factors"][h] = ctm.get_step_factorization(stepper["GMatrix"], stepper["CMatrix"], h)  # Kept by the stepper, even if the global cache is reset
+    IVector = stepper["IVector"]
+    IVector[stepper["centerNodes"]] = block_power_vector(stepper, blockPower)[stepper["blockOfCenter"]] * stepper["shareOfCenter"]
+    capacitiesOverH = stepper["capacities"] / h
+    tempVector = stepper["temperatures"]
+    for _ in range(substeps):
+        tempVector = factor.solve(IVector + capacitiesOverH * tempVector)
+    stepper["temperatures"] = tempVector
+    stepper["time"] += interval
+    return get_block_temperatures(stepper, statistic)
+
+"""Function that returns the current temperature (K) of every block of the stepper: the area-weighted mean of its subblocks, or their max if statistic is "max"."""
+def get_block_temperatures(stepper, statistic="mean"):
+    return block_temperatures(stepper, stepper["temperatures"], statistic)
+
+"""Function that returns the temperature (K) of every block for a temperature vector relative to the ambient: the area-weighted mean of its subblocks, or their max if statistic is "max"."""
+def block_temperatures(stepper, tempVector, statistic="mean"):
+    centerTemps = tempVector[stepper["centerNodes"]]
+    if statistic == "max":
+        return np.maximum.reduceat(centerTemps, stepper["starts"]) + stepper["baseTemp"]
+    if statistic == "mean":
+        return np.add.reduceat(centerTemps * stepper["areas"], stepper["starts"]) / stepper["blockAreas"] + stepper["baseTemp"]
+    raise ValueError("Unknown statistic: " + str(statistic) + ". Valid statistics are: mean, max")
+
+"""Function that spreads a power vector of the blocks over their subblocks: returns an I vector with the power of every center node."""
+def spread_block_power(stepper, powerVector):
+    IVector = np.zeros(len(stepper["temperatures"]))
+    IVector[stepper["centerNodes"]] = powerVector[stepper["blockOfCenter"]] * stepper["shareOfCenter"]
+    return IVector
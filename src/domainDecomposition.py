@@ -0,0 +1,117 @@
+"""Schur-complement domain decomposition solver.
+
+The thermal network is split in an interface and subdomains: the interface is the package, the layers that span several chiplets (substrate, interposer, TIM, spreader and heat sink),
+and every connected stack of the other chiplets is a subdomain. Chiplets of a layer are not connected laterally, so the subdomains only couple to each other through the package.
+With A = G (steady state) or G + C/h (transient), ordered as interiors (I_k) and interface (S): each interior block A_kk is factorized independently (in parallel on a thread pool),
+the interface system S = A_SS - sum_k A_Sk A_kk^-1 A_kS is assembled and factorized (sparse LU: every subdomain only fills the block of the package nodes it touches),
+and a solve is two interior solves per subdomain and one interface solve.
+The partition is computed once per (G, C) pair and the factorizations once per timestep, and kept in the factorization cache like the direct factorizations.
+The sizes are reported (counters "subdomains" and "interfaceNodes"); a model without package layers (a single stack of chiplets) is one subdomain, solved like the direct solver."""
+
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+import scipy.sparse.linalg
+
+from src import globalVar
+from src import instrument
+
+_pool = {"executor": None, "threads": None, "process": None}
+
+"""Function that returns the thread pool of the subdomain factorizations and solves (globalVar.solverThreads threads, default is the number of CPUs).
+A forked process (sweep or Parareal worker) does not inherit the threads of the pool, so it makes its own."""
+def get_pool():
+    threads = globalVar.solverThreads or os.cpu_count() or 1
+    if _pool["executor"] is None or _pool["threads"] != threads or _pool["process"] != os.getpid():
+        if _pool["executor"] is not None and _pool["process"] == os.getpid():
+            _pool["executor"].shutdown(wait=False)
+        _pool["executor"], _pool["threads"], _pool["process"] = ThreadPoolExecutor(max_workers=threads), threads, os.getpid()
+    return _pool["executor"]
+
+"""Function that returns the package groups of a network split in (layer, chiplet) groups, given the groups coupled to every group ({group: set of groups}, every group of the network a key):
+the groups coupled to several chiplets of an adjacent layer (a substrate, interposer or TIM under or over several chiplets),
+then the groups alone in their layer that only couple to package groups (the spreader and heat sink over the TIM)."""
+def get_package_groups(neighbours):
+    layerSizes = Counter(layer for layer, _ in neighbours)
+    package = {group for group, others in neighbours.items() if max(Counter(layer for layer, _ in others).values(), default=0) > 1}
+    grown = bool(package)
+    while grown:
+        alone = {group for group, others in neighbours.items() if group not in package and layerSizes[group[0]] == 1 and others <= package}
+        package |= alone
+        grown = bool(alone)
+    return package
+
+"""Function that partitions the nodes of a network in subdomains and an interface.
+labels gives the (layer, chiplet) of every node, A is the sparse matrix of the network.
+The interface is the nodes of the package groups (see get_package_groups), the subdomains are the connected stacks of the other chiplets, which only couple to each other through the interface.
+Returns the interface nodes and the nodes of every subdomain."""
+def partition(A, labels):
+    A = scipy.sparse.coo_matrix(A)
+    groupIndex = {}
+    groups = np.array([groupIndex.setdefault(label, len(groupIndex)) for label in labels], dtype=np.int64)
+    groupLabels = list(groupIndex)
+    cross = (A.row != A.col) & (groups[A.row] != groups[A.col]) & (A.data != 0)
+    pairs = set(zip(groups[A.row[cross]].tolist(), groups[A.col[cross]].tolist()))
+    neighbours = {label: set() for label in groupLabels}
+    for group, other in pairs:
+        neighbours[groupLabels[group]].add(groupLabels[other])
+    package = get_package_groups(neighbours)
+    stacks = [(group, other) for group, other in pairs if groupLabels[group] not in package and groupLabels[other] not in package]
+    stackGraph = scipy.sparse.csr_matrix((np.ones(len(stacks)), ([group for group, _ in stacks], [other for _, other in stacks])), shape=(len(groupLabels), len(groupLabels)))
+    _, stackOf = scipy.sparse.csgraph.connected_components(stackGraph, directed=False)
+    interface = np.isin(groups, [groupIndex[label] for label in package])
+    nodeStacks = stackOf[groups]
+    interiors = [np.flatnonzero(~interface & (nodeStacks == stack)) for stack in np.unique(nodeStacks[~interface])]
+    return np.flatnonzero(interface), interiors
+
+"""Function that factorizes one subdomain: the LU factorization of its interior block, its coupling blocks with the interface, and its contribution A_Sk A_kk^-1 A_kS to the interface system."""
+def _factorize_subdomain(A, interior, interface):
+    rows = A[interior]
+    interiorFactor = scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(rows[:, interior]))
+    toInterface = scipy.sparse.csc_matrix(rows[:, interface])
+    fromInterface = scipy.sparse.csr_matrix(A[interface][:, interior])
+    coupled = np.flatnonzero(np.diff(toInterface.indptr))   # Interface nodes coupled to this subdomain (nonempty columns)
+    contribution = None
+    solvedCoupling = None
+    if len(coupled):
+        solvedCoupling = interiorFactor.solve(toInterface[:, coupled].toarray())
+        contribution = fromInterface.dot(solvedCoupling)
+    return {"interior": interior, "factor": interiorFactor, "fromInterface": fromInterface, "coupled": coupled, "solvedCoupling": solvedCoupling, "contribution": contribution}
+
+"""Function that factorizes A with the domain decomposition of the partition (see partition). Returns an object with a solve method, like the direct LU factorization, and its nnz."""
+def factorize(A, interface, interiors):
+    A = scipy.sparse.csr_matrix(A)
+    with instrument.span("factorize_subdomains"):
+        subdomains = list(get_pool().map(lambda interior: _factorize_subdomain(A, interior, interface), interiors))
+    with instrument.span("factorize_interface"):
+        blocks = [(subdomain["contribution"], subdomain["coupled"]) for subdomain in subdomains if subdomain["contribution"] is not None]
+        rows = np.concatenate([np.nonzero(contribution)[0] for contribution, _ in blocks] or [np.zeros(0, dtype=np.int64)])
+        cols = np.concatenate([coupled[np.nonzero(contribution)[1]] for contribution, coupled in blocks] or [np.zeros(0, dtype=np.int64)])
+        values = np.concatenate([contribution[np.nonzero(contribution)] for contribution, _ in blocks] or [np.zeros(0, dtype=A.dtype)])
+        schur = scipy.sparse.csc_matrix(A[interface][:, interface] - scipy.sparse.coo_matrix((values, (rows, cols)), shape=(len(interface), len(interface))), dtype=A.dtype)
+        schurFactor = scipy.sparse.linalg.splu(schur) if len(interface) else None
+    instrument.set_counter("subdomains", len(subdomains))
+    instrument.set_counter("interfaceNodes", len(interface))
+
+    def solve(b):
+        b = np.asarray(b, dtype=A.dtype)  # Factors of a single precision A (mixed precision, see refine_factorization in src/nub_ctm.py) solve in single precision
+        interiorSolutions = list(get_pool().map(lambda subdomain: subdomain["factor"].solve(b[subdomain["interior"]]), subdomains))
+        x = np.empty(len(b), dtype=A.dtype)
+        if len(interface):
+            interfaceRHS = b[interface].copy()
+            for subdomain, y in zip(subdomains, interiorSolutions):
+                interfaceRHS -= subdomain["fromInterface"].dot(y)
+            x[interface] = schurFactor.solve(interfaceRHS)
+        for subdomain, y in zip(subdomains, interiorSolutions):
+            if subdomain["solvedCoupling"] is not None:
+                y = y - subdomain["solvedCoupling"].dot(x[interface][subdomain["coupled"]])
+            x[subdomain["interior"]] = y
+        return x
+
+    nnz = sum(subdomain["factor"].nnz for subdomain in subdomains) + (schurFactor.nnz if schurFactor is not None else 0)
+    return SimpleNamespace(solve=solve, nnz=nnz)
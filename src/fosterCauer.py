@@ -0,0 +1,163 @@
+"""Foster/Cauer compact thermal model extraction.
+
+The prepared RC network is reduced to per-block thermal impedances for system-level simulators: for every block, its self-impedance (temperature rise of the block for a 1 W power step
+in the block) and its mutual impedances with the blocks it heats the most (temperature rise of the other block for a 1 W step in this block), as RC ladders of a few terms.
+Temperatures of blocks are area-weighted means of their subblocks and the power of a block is shared equally by its subblocks, as in the co-simulation stepper (see src/cosim.py).
+
+The exact step responses come from the modal analysis of the network: the nodes without heat capacity (ground nodes, only coupled to their center node) are eliminated,
+and the generalized eigenproblem G v = lambda C v of the center nodes is solved (dense, O(n^3) in the number of subblocks), giving Z(t) = sum_k r_k (1 - exp(-t/tau_k)), tau_k = 1/lambda_k.
+Every response is then fitted on a logarithmic time grid with a Foster ladder of `terms` RC pairs (Z(t) = sum_i R_i (1 - exp(-t/(R_i C_i)))), starting from a non-negative fit
+on a grid of time constants, refined by nonlinear least squares. Self-impedances are also converted to the equivalent Cauer ladder (continued fraction of the Foster impedance).
+Mutual impedances are not positive-real in general, so they are given as Foster ladders only (their resistances may be negative).
+The fit error is the largest difference between the fitted and exact responses on the grid, in K/W and relative to the steady-state value."""
+
+import json
+
+import numpy as np
+import scipy.linalg
+import scipy.optimize
+
+from src import cosim
+from src import globalVar
+from src import instrument
+from src import nub_ctm as ctm
+
+"""Function that returns the modes of the prepared model, seen from its blocks: time constants (s) and the block-to-mode (A) and mode-to-block (B) factors,
+so that the step response of block j to a 1 W step in block i is sum_k A[j,k] B[k,i] / lambda_k (1 - exp(-t lambda_k))."""
+def get_block_modes():
+    stepper = cosim.make_stepper()
+    cache = ctm.get_factorization_cache(globalVar.GMatrix, globalVar.CMatrix)
+    G = cache["G"].tocsr()
+    centerNodes = stepper["centerNodes"]
+    others = np.setdiff1d(np.arange(G.shape[0]), centerNodes)
+    Goo = G[others][:, others]
+    if Goo.nnz != np.count_nonzero(Goo.diagonal()):
+        raise Exception("Modal analysis needs the nodes without heat capacity to be coupled only to center nodes")
+    with instrument.span("foster_cauer_reduction"):
+        Gco = G[centerNodes][:, others]
+        reduced = G[centerNodes][:, centerNodes].toarray() - (Gco.multiply(1 / Goo.diagonal()[None, :])).dot(Gco.T).toarray()    # Ground nodes eliminated (Schur complement)
+    scale = 1 / np.sqrt(stepper["capacities"][centerNodes])
+    with instrument.span("foster_cauer_modes"):
+        eigenvalues, vectors = scipy.linalg.eigh(scale[:, None] * reduced * scale[None, :])
+    vectors = scale[:, None] * vectors   # C-orthonormal modes of the center nodes
+    blockCount = len(stepper["blocks"])
+    weights = np.zeros((blockCount, len(centerNodes)))  # Area-weighted mean of the subblocks of every block
+    weights[stepper["blockOfCenter"], np.arange(len(centerNodes))] = stepper["areas"] / stepper["blockAreas"][stepper["blockOfCenter"]]
+    powers = np.zeros((len(centerNodes), blockCount))   # Power of every subblock for 1 W in its block
+    powers[np.arange(len(centerNodes)), stepper["blockOfCenter"]] = stepper["shareOfCenter"]
+    instrument.set_counter("modes", len(eigenvalues))
+    return {"blocks": stepper["blocks"], "rates": eigenvalues, "A": weights.dot(vectors), "B": vectors.T.dot(powers)}
+
+"""Function that returns the step response (K/W) of a Foster ladder ([[R, C], ...]) at the given times (s)."""
+def evaluate_foster(foster, times):
+    times = np.asarray(times, dtype=float)
+    response = np.zeros(times.shape)
+    for R, C in foster:
+        response += R * (1 - np.exp(-times / (R * C)))
+    return response
+
+"""Function that returns the impedance of a Foster ladder ([[R, C], ...]) at the given complex frequencies s (rad/s)."""
+def foster_impedance(foster, s):
+    return sum(R / (1 + s * R * C) for R, C in foster)
+
+"""Function that returns the impedance of a Cauer ladder ([[R, C], ...], C of every node to the ambient, then R to the next node; the last R goes to the ambient) at the given complex frequencies s."""
+def cauer_impedance(cauer, s):
+    impedance = 0
+    for R, C in reversed(cauer):
+        impedance = 1 / (s * C + 1 / (R + impedance))
+    return impedance
+
+"""Function that fits the terms of a Foster ladder to a step response (K/W) sampled at the given times. If positive is True, all the resistances are non-negative.
+Returns the ladder ([[R, C], ...], sorted by time constant), or fewer terms if the response does not need them."""
+def fit_foster(times, response, terms=4, positive=True):
+    candidates = np.geomspace(times[0], times[-1], 8 * int(np.ceil(np.log10(times[-1] / times[0]))) + 1)    # 8 time constants per decade
+    basis = 1 - np.exp(-times[:, None] / candidates[None, :])
+    weights = scipy.optimize.nnls(basis, np.abs(response))[0]
+    chosen = np.argsort(-weights)[:terms]
+    chosen = chosen[weights[chosen] > 0]
+    if len(chosen) == 0:
+        return []
+    norm = max(np.max(np.abs(response)), 1e-300)
+
+    def residual(parameters):
+        resistances, logTaus = parameters[:len(chosen)], parameters[len(chosen):]
+        return ((1 - np.exp(-times[:, None] / np.exp(logTaus)[None, :])).dot(resistances) - response) / norm
+
+    def jacobian(parameters):
+        resistances, logTaus = parameters[:len(chosen)], parameters[len(chosen):]
+        scaledTimes = times[:, None] / np.exp(logTaus)[None, :]
+        decay = np.exp(-scaledTimes)
+        return np.hstack((1 - decay, -resistances[None, :] * decay * scaledTimes)) / norm
+
+    start = np.concatenate((weights[chosen] * np.sign(response[-1] if response[-1] != 0 else 1), np.log(candidates[chosen])))
+    lower = np.concatenate((np.zeros(len(chosen)) if positive else np.full(len(chosen), -np.inf), np.full(len(chosen), np.log(times[0]) - 5)))
+    upper = np.concatenate((np.full(len(chosen), np.inf), np.full(len(chosen), np.log(times[-1]) + 5)))
+    parameters = scipy.optimize.least_squares(residual, np.clip(start, lower, upper), jac=jacobian, bounds=(lower, upper), x_scale="jac", max_nfev=100).x
+    ladder = [[float(R), float(np.exp(logTau) / R)] for R, logTau in zip(parameters[:len(chosen)], parameters[len(chosen):]) if R != 0]
+    return sorted(ladder, key=lambda term: term[0] * term[1])
+
+"""Function that converts a Foster ladder ([[R, C], ...], positive resistances) to the equivalent Cauer ladder, by continued fraction expansion of its impedance.
+Returns None if the expansion is not realizable (non-positive or non-finite element, e.g. with time constants too close to each other)."""
+def foster_to_cauer(foster):
+    if not foster:
+        return []
+    reference = np.exp(np.mean([np.log(R * C) for R, C in foster]))    # Frequencies scaled by the mean time constant, for conditioning
+    numerator = np.zeros(1)
+    denominator = np.ones(1)
+    for R, C in foster:     # Z(s) = numerator(s) / denominator(s)
+        pole = np.array([R * C / reference, 1.0])
+        numerator = np.polyadd(np.polymul(numerator, pole), R * denominator)
+        denominator = np.polymul(denominator, pole)
+    cauer = []
+    for _ in range(len(foster)):
+        capacity = denominator[0] / numerator[0]    # Y = 1/Z = s C + remainder
+        denominator = np.polysub(denominator, np.polymul([capacity, 0], numerator))[1:]
+        resistance = numerator[0] / denominator[0]  # Z of the rest = R + remainder
+        numerator = np.polysub(numerator, resistance * denominator)[1:]
+        if not (np.isfinite(capacity) and np.isfinite(resistance) and capacity > 0 and resistance > 0):
+            return None
+        cauer.append([float(resistance), float(capacity * reference)])
+    return cauer
+
+"""Function that returns the largest difference (K/W) between a fitted and an exact step response, and the same relative to the steady-state value of the exact response."""
+def get_fit_error(fitted, exact):
+    error = float(np.max(np.abs(fitted - exact)))
+    return error, error / max(abs(float(exact[-1])), 1e-300)
+
+"""Function that extracts the compact thermal model of every block of the prepared model (see the description of this module).
+terms: number of RC pairs of every ladder; mutuals: number of mutual impedances per block (the blocks with the largest steady-state mutual resistance);
+points: number of times of the fitting grid, spanning the time constants of the modes (from a tenth of the fastest to ten times the slowest).
+Returns a dictionary with the blocks ((layer, chiplet, block)), the time grid and, for every block, its self-impedance (Foster and Cauer ladders) and its mutual impedances (Foster)."""
+def extract_compact_models(terms=4, mutuals=3, points=200):
+    modes = get_block_modes()
+    taus = 1 / modes["rates"]
+    times = np.geomspace(np.min(taus) / 10, np.max(taus) * 10, points)
+    rise = 1 - np.exp(-modes["rates"][:, None] * times[None, :])
+    steady = (modes["A"] / modes["rates"][None, :]).dot(modes["B"])    # Steady-state resistance of every block j for 1 W in block i (K/W)
+    models = []
+    with instrument.span("foster_cauer_fit"):
+        for i, block in enumerate(modes["blocks"]):
+            exact = (modes["A"][i] * modes["B"][:, i] / modes["rates"]).dot(rise)
+            foster = fit_foster(times, exact, terms)
+            error, relativeError = get_fit_error(evaluate_foster(foster, times), exact)
+            cauer = foster_to_cauer(foster)
+            if cauer is None:
+                print("WARNING: the Foster ladder of block " + str(block) + " has no Cauer equivalent")
+            blockModel = {"block": block, "self": {"steadyState": float(steady[i, i]), "foster": foster, "cauer": cauer, "error": error, "relativeError": relativeError}, "mutual": []}
+            others = [j for j in np.argsort(-steady[:, i], kind="stable") if j != i][:mutuals]
+            for j in others:
+                exact = (modes["A"][j] * modes["B"][:, i] / modes["rates"]).dot(rise)
+                foster = fit_foster(times, exact, terms, positive=False)
+                error, relativeError = get_fit_error(evaluate_foster(foster, times), exact)
+                blockModel["mutual"].append({"block": modes["blocks"][j], "steadyState": float(steady[j, i]), "foster": foster, "error": error, "relativeError": relativeError})
+            models.append(blockModel)
+    worst = max(model["self"]["relativeError"] for model in models)
+    print("Compact thermal models: " + str(len(models)) + " blocks, " + str(len(taus)) + " modes, largest self-impedance fit error " + format(100 * worst, ".3g") + "%")
+    return {"blocks": modes["blocks"], "times": times, "models": models}
+
+"""Function that writes compact thermal models (see extract_compact_models) to a JSON file. Ladders are lists of [R (K/W), C (J/K)] pairs."""
+def save_compact_models(compactModels, path):
+    document = {"format": "ladders are lists of [R (K/W), C (J/K)]; Cauer: C of every node to the ambient, then R to the next node, the last R to the ambient",
+                "models": [dict(model, block=list(model["block"]), mutual=[dict(mutual, block=list(mutual["block"])) for mutual in model["mutual"]]) for model in compactModels["models"]]}
+    with open(path, 'w') as outfile:
+        json.dump(document, outfile, indent=1)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from src import materials
+from src.nub_ctm import make_unit_dict
+
+"""Function that generates a parametric block model, to study how the simulator scales with the size of the model.
+The model has `layers` active silicon layers stacked on top of each other, each with the same `chipletsPerLayer` chiplets placed on a grid with a gap between them.
+Each chiplet is a grid of `blocksPerChiplet` blocks (rounded up to fill a full grid) with random power densities.
+If passiveLayers is True, a TIM and a heat spreader layer covering all the chiplets are added on top, as in example_model.
+If phases is larger than 0, each block gets a random power trace with that many values, for transient simulations.
+The same seed always generates the same model."""
+def generate_model(layers=2, chipletsPerLayer=2, blocksPerChiplet=4, resolution=[1,1], passiveLayers=True, phases=0, seed=0, chipletSize=0.001, chipletGap=0.0002, chipThickness=0.00002):
+    rng = np.random.default_rng(seed)
+    chipletColumns = int(np.ceil(np.sqrt(chipletsPerLayer)))
+    chipletRows = int(np.ceil(chipletsPerLayer / chipletColumns))
+    blockColumns = int(np.ceil(np.sqrt(blocksPerChiplet)))
+    blockRows = int(np.ceil(blocksPerChiplet / blockColumns))
+    blockWidth = chipletSize / blockColumns
+    blockHeight = chipletSize / blockRows
+    packageWidth = chipletColumns*chipletSize + (chipletColumns-1)*chipletGap
+    packageHeight = chipletRows*chipletSize + (chipletRows-1)*chipletGap
+    siVHC = materials.materials["Si"]["volumetricHeatCapacity"]
+    siConductivity = materials.materials["Si"]["conductivity"]
+
+    model = []
+    for iLayer in range(layers):
+        layer = []
+        for iChiplet in range(chipletsPerLayer):
+            chipletLeftX = (iChiplet % chipletColumns) * (chipletSize + chipletGap)
+            chipletBottomY = (iChiplet // chipletColumns) * (chipletSize + chipletGap)
+            chiplet = []
+            for row in range(blockRows):
+                for col in range(blockColumns):
+                    powerDensity = rng.uniform(1e10, 8e10, max(phases, 1))  # W/m^3, same range as example_model
+                    power = powerDensity * blockWidth * blockHeight * chipThickness
+                    chiplet.append(make_unit_dict(siVHC, siConductivity, chipThickness, list(resolution), chipletLeftX + col*blockWidth, chipletBottomY + row*blockHeight, blockWidth, blockHeight,
+                                                  power.tolist() if phases > 0 else float(power[0])))
+            layer.append(chiplet)
+        model.append(layer)
+
+    if passiveLayers:
+        tim = make_unit_dict(materials.materials["Aluminium Silicate"]["volumetricHeatCapacity"], materials.materials["Aluminium Silicate"]["conductivity"], 0.000020, list(resolution), 0, 0, packageWidth, packageHeight, 0)
+        hsp = make_unit_dict(materials.materials["Cu"]["volumetricHeatCapacity"], materials.materials["Cu"]["conductivity"], 0.000100, list(resolution), -packageWidth/2, -packageHeight/2, 2*packageWidth, 2*packageHeight, 0)
+        model.append([[tim]])
+        model.append([[hsp]])
+    return model
+
+"""Function that returns the number of subblocks (center nodes) of a block model, without flattening it."""
+def count_subblocks(blockModel):
+    return sum(unit["resolution"][0]*unit["resolution"][1] for layer in blockModel for chiplet in layer for unit in chiplet)
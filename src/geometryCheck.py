@@ -0,0 +1,208 @@
+"""Geometric validation of block models, before assembly.
+
+The assembly assumes a clean geometry: the blocks of a layer do not overlap, the blocks of a chiplet tile a rectangle (get_ground_nodes grounds a side of a block when no block
+of its chiplet extends further on that side), and the blocks in contact share a non-zero length or area. Problems found late waste long runs, or show up as error messages of
+are_adjacent in the middle of the assembly. validate_model checks the whole model at once and returns every problem found:
+errors: blocks with non-positive dimensions, thickness or conductivity, or an invalid resolution; overlapping blocks in a layer (whether in the same chiplet or not);
+zero-area interfaces (blocks of a chiplet that are_adjacent takes as adjacent while they only touch at a corner, blocks of adjacent layers that are_superposed takes
+as superposed, with a shared area of zero or less: an infinite or negative resistance).
+warnings: blocks of a chiplet that abut, but whose coordinates differ too much for are_adjacent to couple them (no heat flows between them); blocks resting on nothing
+(a block above the bottom layer with no block under it, only cooled laterally and from above); chiplets whose blocks do not cover their bounding box (gaps, or an outline
+that is not a rectangle): the sides on the bounding box are grounded and the others are adiabatic, which is consistent but often a mistake in the coordinates.
+The pairs of blocks in contact are found with a sweep line over X (see find_box_pairs), in O(n log n) plus the number of pairs for layouts without large overlaps,
+instead of testing every pair. Lengths are compared with an absolute tolerance of 1e-9 times the size of the model, except overlaps: blocks that overlap by less than
+1e-5 times the size of the model (coordinates rounded to about 5 significant digits) abut."""
+
+import bisect
+import heapq
+import math
+
+from src import nub_ctm as ctm
+
+MODES = ("off", "warn", "error")
+
+"""Function that returns the bounding box (leftX, bottomY, rightX, topY) of a block."""
+def get_box(unit):
+    return unit["leftX"], unit["bottomY"], unit["leftX"] + unit["width"], unit["bottomY"] + unit["height"]
+
+"""Function that returns the pairs (i, j), i < j, of boxes ((leftX, bottomY, rightX, topY) tuples) that intersect or touch within the tolerance, with a sweep line over X:
+the boxes are visited by increasing leftX, and the active boxes (those whose rightX is not yet behind the sweep line) are kept sorted by bottomY, in classes of heights within
+a factor of 2. Each box is compared with the active boxes of every class whose bottomY is within its Y range, extended downwards by the largest height of the class,
+so that a few tall boxes (e.g. a heat spreader over many small blocks) do not widen the search of the others."""
+def find_box_pairs(boxes, tolerance):
+    pairs = []
+    smallest = min((box[3] - box[1] for box in boxes if box[3] - box[1] > 0), default=1)
+    heightClass = [max(0, int(math.log2(max(box[3] - box[1], smallest) / smallest))) for box in boxes]
+    active = {}     # Per height class: (bottomY, index), sorted
+    tallest = {}    # Per height class: largest height
+    expiry = []     # Heap of (rightX, index) of the active boxes
+    for i in sorted(range(len(boxes)), key=lambda k: boxes[k][0]):
+        leftX, bottomY, rightX, topY = boxes[i]
+        while expiry and expiry[0][0] < leftX - tolerance:    # Boxes behind the sweep line
+            _, j = heapq.heappop(expiry)
+            column = active[heightClass[j]]
+            del column[bisect.bisect_left(column, (boxes[j][1], j))]
+        for c, column in active.items():
+            k = bisect.bisect_right(column, (topY + tolerance, math.inf)) - 1
+            while k >= 0 and column[k][0] >= bottomY - tallest[c] - tolerance:
+                j = column[k][1]
+                if boxes[j][3] >= bottomY - tolerance:
+                    pairs.append((min(i, j), max(i, j)))
+                k -= 1
+        bisect.insort(active.setdefault(heightClass[i], []), (bottomY, i))
+        tallest[heightClass[i]] = max(tallest.get(heightClass[i], 0), topY - bottomY)
+        heapq.heappush(expiry, (rightX, i))
+    return pairs
+
+"""Function that returns the overlap (length) of the intervals [start1, end1] and [start2, end2] (negative if they are apart)."""
+def get_overlap(start1, end1, start2, end2):
+    return min(end1, end2) - max(start1, start2)
+
+"""Function that returns the length of [start, end] not covered by a list of intervals ((start, end) pairs), sorting the intervals."""
+def get_uncovered_length(start, end, intervals, tolerance):
+    uncovered = 0.0
+    reached = start
+    for low, high in sorted(intervals):
+        if low > reached + tolerance:
+            uncovered += min(low, end) - reached
+        reached = max(reached, high)
+        if reached >= end - tolerance:
+            return uncovered
+    return uncovered + max(0.0, end - reached)
+
+"""Function that returns the name of a block for the messages of the validation."""
+def block_name(key):
+    return "block " + ",".join(str(index) for index in key)
+
+"""Function that checks the dimensions, materials and resolution of a block. Returns the problems found."""
+def check_block(key, unit):
+    problems = []
+    if not (unit["width"] > 0 and unit["height"] > 0 and unit["thickness"] > 0):
+        problems.append(("error", "dimensions", [key], block_name(key) + ": width, height and thickness must be positive"))
+    if not unit["conductivity"] > 0:
+        problems.append(("error", "material", [key], block_name(key) + ": conductivity must be positive"))
+    resolution = unit["resolution"]
+    if len(resolution) != 2 or any(int(r) != r or r < 1 for r in resolution):
+        problems.append(("error", "resolution", [key], block_name(key) + ": resolution must be [X,Y] with positive integers, got " + str(list(resolution))))
+    return problems
+
+"""Function that checks the blocks of a layer: overlaps (between any blocks of the layer, thicker than abutTolerance), zero-area lateral interfaces and abutting blocks
+that are not coupled (between blocks of a chiplet). Returns the problems found."""
+def check_layer_pairs(keys, units, boxes, tolerance, abutTolerance):
+    problems = []
+    for i, j in find_box_pairs(boxes, abutTolerance):
+        width = get_overlap(boxes[i][0], boxes[i][2], boxes[j][0], boxes[j][2])
+        height = get_overlap(boxes[i][1], boxes[i][3], boxes[j][1], boxes[j][3])
+        if keys[i][1] == keys[j][1] and (width > abutTolerance) != (height > abutTolerance) and not ctm.are_adjacent(units[i], units[j]):
+            problems.append(("warning", "contact", [keys[i], keys[j]], block_name(keys[i]) + " and " + block_name(keys[j]) + " abut, but their coordinates differ by "
+                             + format(abs(min(width, height)), ".2g") + " m: are_adjacent does not couple them, no heat flows between them"))
+        elif width > abutTolerance and height > abutTolerance:
+            problems.append(("error", "overlap", [keys[i], keys[j]], block_name(keys[i]) + " and " + block_name(keys[j]) + " overlap over " + format(width * 1e3, ".4g") + " x "
+                             + format(height * 1e3, ".4g") + " mm" + (" (same coordinates)" if boxes[i] == boxes[j] else "")))
+        elif keys[i][1] == keys[j][1] and width <= tolerance and height <= tolerance and ctm.are_adjacent(units[i], units[j]) and ctm.get_shared_area_2D(units[i], units[j]) <= 0:
+            problems.append(("error", "interface", [keys[i], keys[j]], block_name(keys[i]) + " and " + block_name(keys[j]) + " only touch at a corner but are taken as adjacent (zero-area interface)"))
+    return problems
+
+"""Function that checks the outline of a chiplet (keys, blocks and boxes of its blocks): every side of its bounding box should be covered by its blocks (rectangular outline),
+and the blocks should cover its area (no gaps; overlapping blocks are reported by check_layer_pairs). Returns the warnings found."""
+def check_chiplet_outline(chipletKey, keys, boxes, tolerance):
+    leftX, bottomY = min(box[0] for box in boxes), min(box[1] for box in boxes)
+    rightX, topY = max(box[2] for box in boxes), max(box[3] for box in boxes)
+    name = "chiplet " + ",".join(str(index) for index in chipletKey)
+    sides = (("west", [(box[1], box[3]) for box in boxes if abs(box[0] - leftX) <= tolerance], bottomY, topY),
+             ("east", [(box[1], box[3]) for box in boxes if abs(box[2] - rightX) <= tolerance], bottomY, topY),
+             ("south", [(box[0], box[2]) for box in boxes if abs(box[1] - bottomY) <= tolerance], leftX, rightX),
+             ("north", [(box[0], box[2]) for box in boxes if abs(box[3] - topY) <= tolerance], leftX, rightX))
+    open = [side for side, intervals, start, end in sides if get_uncovered_length(start, end, intervals, tolerance) > tolerance]
+    if open:
+        return [("warning", "outline", keys, name + ": the outline is not a rectangle (" + ", ".join(open) + " side" + ("s" if len(open) > 1 else "")
+                 + " of the bounding box not covered); the block sides inside the bounding box are adiabatic")]
+    area = (rightX - leftX) * (topY - bottomY)
+    missing = area - sum((box[2] - box[0]) * (box[3] - box[1]) for box in boxes)
+    if missing > tolerance * max(rightX - leftX, topY - bottomY):
+        return [("warning", "gap", keys, name + ": its blocks leave " + format(100 * missing / area, ".3g") + "% of its outline uncovered (gaps inside the chiplet)")]
+    return []
+
+"""Function that checks the couplings between two adjacent layers (keys, blocks and boxes of the blocks of each): zero-area vertical interfaces and blocks of the upper layer
+with no block under them. Returns the problems found."""
+def check_vertical_pairs(lower, upper, tolerance):
+    problems = []
+    boxes = lower[2] + upper[2]
+    supported = [False] * len(upper[0])
+    for i, j in find_box_pairs(boxes, tolerance):
+        if i >= len(lower[0]) or j < len(lower[0]):   # Pairs of the same layer
+            continue
+        j -= len(lower[0])
+        width = get_overlap(lower[2][i][0], lower[2][i][2], upper[2][j][0], upper[2][j][2])
+        height = get_overlap(lower[2][i][1], lower[2][i][3], upper[2][j][1], upper[2][j][3])
+        if width > tolerance and height > tolerance:
+            supported[j] = True
+        elif ctm.are_superposed(lower[1][i], upper[1][j]) and ctm.get_shared_area_3D(lower[1][i], upper[1][j]) <= 0:
+            problems.append(("error", "interface", [lower[0][i], upper[0][j]], block_name(lower[0][i]) + " and " + block_name(upper[0][j]) + " are taken as superposed with a zero overlap area"))
+    for j, isSupported in enumerate(supported):
+        if not isSupported:
+            problems.append(("warning", "overhang", [upper[0][j]], block_name(upper[0][j]) + " rests on nothing: no block of layer " + str(upper[0][j][0] - 1) + " under it"))
+    return problems
+
+"""Function that validates the geometry of a block model (see the description of this module). Returns the problems found, as dictionaries
+({"severity": "error" or "warning", "kind", "blocks": [(layer, chiplet, block), ...], "message"}), errors first, then warnings."""
+def validate_model(blockModel):
+    problems = []
+    layers = []
+    units = [unit for layer in blockModel for chiplet in layer for unit in chiplet]
+    if not units:
+        return [{"severity": "error", "kind": "empty", "blocks": [], "message": "the model has no blocks"}]
+    size = max(max(unit["leftX"] + unit["width"], unit["bottomY"] + unit["height"]) - min(unit["leftX"], unit["bottomY"]) for unit in units)
+    tolerance = 1e-9 * size
+    abutTolerance = 1e-5 * size
+    for iLayer, layer in enumerate(blockModel):
+        keys, layerUnits, boxes = [], [], []
+        for iChiplet, chiplet in enumerate(layer):
+            chipletKeys = [(iLayer, iChiplet, iUnit) for iUnit in range(len(chiplet))]
+            for key, unit in zip(chipletKeys, chiplet):
+                problems.extend(check_block(key, unit))
+            if chiplet:
+                problems.extend(check_chiplet_outline((iLayer, iChiplet), chipletKeys, [get_box(unit) for unit in chiplet], tolerance))
+            keys.extend(chipletKeys)
+            layerUnits.extend(chiplet)
+            boxes.extend(get_box(unit) for unit in chiplet)
+        problems.extend(check_layer_pairs(keys, layerUnits, boxes, tolerance, abutTolerance))
+        layers.append((keys, layerUnits, boxes))
+    for iLayer in range(len(layers) - 1):
+        problems.extend(check_vertical_pairs(layers[iLayer], layers[iLayer + 1], tolerance))
+    problems = [{"severity": severity, "kind": kind, "blocks": blocks, "message": message} for severity, kind, blocks, message in problems]
+    return sorted(problems, key=lambda problem: ("error", "warning").index(problem["severity"]))
+
+"""Function that reports the errors and warnings of validate_model: prints them ("warn") or raises a ValueError with all of them if there is an error ("error")."""
+def report_problems(problems, mode="warn"):
+    if mode not in MODES:
+        raise ValueError("Unknown geometry validation mode: " + str(mode) + ". Valid modes are: " + ", ".join(MODES))
+    if mode == "off" or not problems:
+        return
+    errors = [problem for problem in problems if problem["severity"] == "error"]
+    if mode == "error" and errors:
+        raise ValueError("Invalid model geometry (" + str(len(errors)) + " errors, " + str(len(problems) - len(errors)) + " warnings):\n"
+                         + "\n".join(problem["severity"] + ": " + problem["message"] for problem in problems))
+    for problem in problems:
+        print("WARNING: geometry " + problem["severity"] + ": " + problem["message"])
+
+
+if __name__ == "__main__":
+    import argparse
+    import importlib
+    import os
+
+    from src import modelFile
+
+    parser = argparse.ArgumentParser(description="Geometric validation of an ARTSim model")
+    parser.add_argument("model", help="name of a model module of the models directory (e.g. example_model) or model file (.json, .toml or .npz)")
+    args = parser.parse_args()
+
+    if os.path.splitext(args.model)[1] in (".json", ".toml", ".npz"):
+        blockModel = modelFile.load_model(args.model)
+    else:
+        blockModel = importlib.import_module("models." + args.model).model
+    problems = validate_model(blockModel)
+    for problem in problems:
+        print(problem["severity"] + ": " + problem["message"])
+    print(str(len(problems)) + " problems found")
@@ -7,4 +7,41 @@ IVectorVector = []
 nodes = []
 model = []
 modelPrepared = False
-baseTemp = 318.5
\ No newline at end of file
+factorCache = {}
+compactCalibrations = {}
+centerMap = None
+topBoundaryCoefficient = None
+preflightPlan = None
+modelSolver = None
+baseTemp = 318.5
+reportFile = None
+profileRun = False
+traceMemory = False
+transientOutput = "full"
+transientProbes = []
+steadyStateFile = None
+checkpointFile = None
+checkpointEvery = 100
+resumeTransient = False
+initialStateFile = None
+periodicTransient = False
+autoStepDefinition = False
+transientTolerance = None
+convergedPhase = "stop"
+solver = "direct"
+solverThreads = None
+adaptiveResolution = False
+adaptiveTolerance = 0.1
+heatTransferCoefficient = 1200
+compactBoundary = "off"
+compactLayers = None
+compactTolerance = 0.5
+compactCalibration = False
+parallelInTime = False
+pararealWorkers = None
+preflight = "off"
+preflightMemory = None
+preflightTime = None
+validateGeometry = "warn"
+precision = "double"
+refinementTolerance = 1e-4
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""Importers for HotSpot-style input files.
+
+.flp floorplan: one functional block per line, "<name> <width> <height> <left-x> <bottom-y> [<volumetric heat capacity> <resistivity>]", in meters, J/(m^3 K) and (m K)/W.
+.lcf layer configuration: 7 lines per layer: layer number, lateral heat flow (Y/N), power dissipation (Y/N), volumetric heat capacity, resistivity, thickness and floorplan file.
+Layers without power dissipation (N) get no power, even if the power trace has columns for their blocks. Layers without lateral heat flow (N) are rejected: the blocks of ARTSim
+always conduct laterally.
+.ptrace power trace: a header line with the block names, then one line of powers (W) per sample.
+Lines starting with # and empty lines are ignored in all files."""
+
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+from src import materials
+from src.nub_ctm import make_unit_dict
+
+"""Function that streams the meaningful lines of a HotSpot file, split in fields, without the comments and empty lines."""
+def _read_fields(path):
+    with open(path) as infile:
+        for line in infile:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                yield line.split()
+
+"""Function that reads a .flp floorplan file. Returns a list of dictionaries (one per block) with the name, width, height, leftX, bottomY of the block,
+and its volumetricHeatCapacity and conductivity if they are given in the file (None otherwise)."""
+def read_flp(path):
+    blocks = []
+    for fields in _read_fields(path):
+        if len(fields) not in (5, 7):
+            raise ValueError("Invalid floorplan line in " + str(path) + ": " + " ".join(fields))
+        block = {
+            "name": fields[0],
+            "width": float(fields[1]),
+            "height": float(fields[2]),
+            "leftX": float(fields[3]),
+            "bottomY": float(fields[4]),
+            "volumetricHeatCapacity": None,
+            "conductivity": None
+        }
+        if len(fields) == 7:
+            block["volumetricHeatCapacity"] = float(fields[5])
+            block["conductivity"] = 1/float(fields[6])  # HotSpot gives the resistivity
+        blocks.append(block)
+    return blocks
+
+"""Function that reads a .lcf layer configuration file. Returns the layers, from bottom to top (HotSpot attaches the heat sink to the last layer, as ARTSim does with the top layer), as dictionaries
+with the floorplan file (relative to the .lcf file), thickness, volumetricHeatCapacity and conductivity of the layer, and if it dissipates power."""
+def read_lcf(path):
+    fields = [line[0] for line in _read_fields(path)]
+    if len(fields) % 7 != 0:
+        raise ValueError("Invalid layer configuration file " + str(path) + ": expected 7 lines per layer")
+    layers = []
+    for i in range(0, len(fields), 7):
+        if fields[i+1].upper() != "Y":
+            raise ValueError("Layer " + fields[i] + " of " + str(path) + " has no lateral heat flow: not supported, ARTSim blocks always conduct laterally")
+        layers.append({
+            "layerNumber": int(fields[i]),
+            "lateralHeatFlow": fields[i+1].upper() == "Y",
+            "powerDissipation": fields[i+2].upper() == "Y",
+            "volumetricHeatCapacity": float(fields[i+3]),
+            "conductivity": 1/float(fields[i+4]),
+            "thickness": float(fields[i+5]),
+            "floorplan": Path(path).parent / fields[i+6]
+        })
+    layers.sort(key=lambda layer: layer["layerNumber"])
+    return layers
+
+"""Generator that streams a .ptrace power trace file: yields the block names of the header, then (samples, blocks) float arrays of the powers in W, of at most chunkSize samples.
+Only one chunk of lines is held at a time. If names is given, only the columns of these blocks are kept, in that order."""
+def iter_ptrace(path, names=None, chunkSize=65536):
+    with open(path) as infile:
+        header = None
+        while header is None:   # Skip comments and empty lines before the header
+            line = infile.readline()
+            if not line:
+                raise ValueError("Power trace " + str(path) + " has no header")
+            line = line.split("#", 1)[0].strip()
+            if line:
+                header = line.split()
+        columns = None
+        if names is not None:
+            missing = [name for name in names if name not in header]
+            if missing:
+                raise ValueError("Power trace " + str(path) + " has no column for blocks: " + ", ".join(missing))
+            columns = [header.index(name) for name in names]
+            header = list(names)
+        yield header
+        while True:
+            lines = list(itertools.islice(infile, chunkSize))
+            if not lines:
+                return
+            lines = [line for line in lines if line.split("#", 1)[0].strip()]   # Chunks of only comments or empty lines have no samples
+            if lines:
+                yield np.loadtxt(lines, dtype=np.float64, comments="#", usecols=columns, ndmin=2)
+
+"""Function that reads a .ptrace power trace file. Returns the block names of the header and a (samples, blocks) float array of the powers in W.
+The file is streamed in chunks (see iter_ptrace) into an array that grows by half its size when full, so the peak memory stays close to the size of the trace.
+If names is given, only the columns of these blocks are kept, in that order."""
+def read_ptrace(path, names=None, chunkSize=65536):
+    chunks = iter_ptrace(path, names, chunkSize)
+    header = next(chunks)
+    power = np.empty((0, len(header)))
+    samples = 0
+    for chunk in chunks:
+        if samples + len(chunk) > len(power):
+            power = np.resize(power, (max(samples + len(chunk), len(power) * 3 // 2), len(header)))
+        power[samples:samples + len(chunk)] = chunk
+        samples += len(chunk)
+    return header, power[:samples].copy() if samples < len(power) else power
+
+"""Function that builds an ARTSim block model from HotSpot floorplans and, optionally, a power trace.
+layers is a list (from bottom to top) of layer definitions, or the path of a .lcf file. Each layer definition is a dictionary with:
+floorplan: path of the .flp file of the layer
+thickness: thickness of the layer (m)
+material: name of a material of src/materials.py, or volumetricHeatCapacity and conductivity (used for blocks that do not define their own in the floorplan)
+resolution (optional): [X,Y] resolution of the blocks of the layer, default is the resolution argument
+powerDissipation (optional): False for a layer that dissipates no power (default is True)
+Each floorplan becomes a single chiplet. Power columns are mapped to blocks by name; blocks that are not in the trace, or in a layer without power dissipation, dissipate no power.
+With a power trace, every block gets one power value per sample (as an array) and the step definition has one phase of samplingInterval seconds per sample.
+Without a power trace, blocks dissipate no power unless a power dictionary (block name -> W) is given.
+Returns the block model and the step definition (None without a power trace)."""
+def import_hotspot(layers, ptraceFile=None, samplingInterval=None, resolution=(1, 1), power=None):
+    if isinstance(layers, (str, Path)):
+        layers = read_lcf(layers)
+    floorplans = [read_flp(layer["floorplan"]) for layer in layers]
+
+    trace = None
+    names = [block["name"] for floorplan in floorplans for block in floorplan]
+    if ptraceFile is not None:
+        if samplingInterval is None:
+            raise ValueError("A sampling interval is needed to import a power trace")
+        header, trace = read_ptrace(ptraceFile)
+        unknown = [name for name in header if name not in names]
+        if unknown:
+            print("WARNING: power trace columns without a matching block are ignored: " + ", ".join(unknown))
+        columns = {name: i for i, name in enumerate(header)}
+
+    blockModel = []
+    for layer, floorplan in zip(layers, floorplans):
+        if "material" in layer:
+            layerVHC = materials.materials[layer["material"]]["volumetricHeatCapacity"]
+            layerConductivity = materials.materials[layer["material"]]["conductivity"]
+        else:
+            layerVHC = layer["volumetricHeatCapacity"]
+            layerConductivity = layer["conductivity"]
+        dissipates = layer.get("powerDissipation", True)
+        if not dissipates and trace is not None:
+            ignored = [block["name"] for block in floorplan if block["name"] in columns and np.any(trace[:, columns[block["name"]]] != 0)]
+            if ignored:
+                print("WARNING: power of blocks in a layer without power dissipation is ignored: " + ", ".join(ignored))
+        chiplet = []
+        for block in floorplan:
+            if not dissipates:
+                blockPower = np.zeros(len(trace)) if trace is not None else 0
+            elif trace is not None:
+                if block["name"] in columns:
+                    blockPower = trace[:, columns[block["name"]]]   # Column view of the trace, no copy
+                else:
+                    blockPower = np.zeros(len(trace))
+            elif power is not None:
+                blockPower = power.get(block["name"], 0)
+            else:
+                blockPower = 0
+            chiplet.append(make_unit_dict(
+                block["volumetricHeatCapacity"] if block["volumetricHeatCapacity"] is not None else layerVHC,
+                block["conductivity"] if block["conductivity"] is not None else layerConductivity,
+                layer["thickness"],
+                list(layer.get("resolution", resolution)),
+                block["leftX"], block["bottomY"], block["width"], block["height"],
+                blockPower
+            ))
+        blockModel.append([chiplet])
+
+    stepDefinition = None
+    if trace is not None:
+        stepDefinition = [{"duration": samplingInterval, "steps": 1}] * len(trace)
+    return blockModel, stepDefinition
+
+
+if __name__ == "__main__":
+    import argparse
+    from src.modelFile import block_model_to_arrays, save_model_file
+    parser = argparse.ArgumentParser(description="Convert a HotSpot layer configuration (.lcf) and power trace (.ptrace) to an ARTSim model file")
+    parser.add_argument("lcf", help="HotSpot layer configuration file")
+    parser.add_argument("output", help="output model file (.json, .toml or .npz; .npz is recommended for long traces)")
+    parser.add_argument("--ptrace", help="HotSpot power trace file")
+    parser.add_argument("--sampling-interval", type=float, help="duration of one power trace sample, in seconds")
+    parser.add_argument("--resolution", type=int, nargs=2, default=[1, 1], help="resolution of all the blocks")
+    args = parser.parse_args()
+    blockModel, stepDefinition = import_hotspot(args.lcf, args.ptrace, args.sampling_interval, args.resolution)
+    save_model_file(block_model_to_arrays(blockModel), args.output)
+    if stepDefinition is not None:
+        print("Use stepDefinition = [{\"duration\": " + str(args.sampling_interval) + ", \"steps\": 1}] * " + str(len(stepDefinition)) + " in ARTSim.py")
@@ -0,0 +1,228 @@
+"""Instanced chiplets and reusable conductance stamps.
+
+2.5D packages place the same chiplet design (same blocks, materials and resolution) many times, e.g. on an interposer. A chiplet is declared once and placed at several offsets:
+
+gpu = [make_unit_dict(...), make_unit_dict(...)]         # blocks of the design
+layer = [interposer, make_chiplet_instance(gpu, 0.001, 0.002), make_chiplet_instance(gpu, 0.004, 0.002, powerDissipation=[0.8, 0.1])]
+
+Chiplets with the same flattened geometry and materials relative to their lower left corner share a design, whether they were placed with make_chiplet_instance or written out.
+prepareModel assembles every model with stamps (see assemble_model): the intra-chiplet part of G and C (lateral and side ground conductances, capacities) is computed
+once per design with the resistance functions of nub_ctm and added at the node indices of every instance. Only the couplings between layers (vertical conductances and
+top/bottom ground conductances), which depend on the placement, are computed per instance, vectorized over the superposed subblocks.
+G and C are built directly as sparse matrices. Without repeated designs, every chiplet is its own design. The center and side ground nodes are those of make_nodes in nub_ctm,
+in the same order, but top and bottom ground nodes are only made for ground areas above the rounding residues of covered units, so make_nodes has more top and bottom
+ground nodes (226 nodes against 198 for example_model); the extra ones are floating and do not change the temperatures."""
+
+import numpy as np
+import scipy.sparse
+
+from src import instrument
+from src import nub_ctm as ctm
+
+"""Function that returns a copy of the blocks of a chiplet design moved by (offsetX, offsetY) (m), to use as a chiplet of a layer of the block model.
+powerDissipation optionally gives the power of every block of this instance (a single value or a power trace per block, in the order of the design); default is the power of the design."""
+def make_chiplet_instance(chiplet, offsetX, offsetY, powerDissipation=None):
+    if powerDissipation is not None and len(powerDissipation) != len(chiplet):
+        raise ValueError("Expected one power dissipation per block of the chiplet (" + str(len(chiplet)) + "), got " + str(len(powerDissipation)))
+    instance = []
+    for i, unit in enumerate(chiplet):
+        instance.append(dict(unit, leftX=unit["leftX"] + offsetX, bottomY=unit["bottomY"] + offsetY))
+        if powerDissipation is not None:
+            instance[-1]["powerDissipation"] = powerDissipation[i]
+    return instance
+
+"""Function that returns the geometry and materials of the units of a flattened chiplet as NumPy arrays."""
+def get_unit_arrays(chiplet):
+    fields = ("leftX", "bottomY", "width", "height", "thickness", "conductivity", "volumetricHeatCapacity")
+    values = np.array([[unit[field] for field in fields] for unit in chiplet], dtype=float).reshape(-1, len(fields))
+    arrays = {field: values[:, i] for i, field in enumerate(fields)}
+    arrays["rightX"] = arrays["leftX"] + arrays["width"]
+    arrays["topY"] = arrays["bottomY"] + arrays["height"]
+    return arrays
+
+"""Function that returns the design signature of a flattened chiplet: its unit geometry relative to its lower left corner (rounded to 1e-12 m), materials and block indices.
+Two chiplets with the same signature have the same intra-chiplet stamp."""
+def chiplet_signature(chiplet, arrays):
+    relative = np.column_stack((arrays["leftX"] - arrays["leftX"].min(), arrays["bottomY"] - arrays["bottomY"].min(), arrays["width"], arrays["height"]))
+    materials = np.column_stack((arrays["thickness"], arrays["conductivity"], arrays["volumetricHeatCapacity"]))
+    blockIndices = np.array([unit["unitIndex"] for unit in chiplet], dtype=np.int64)
+    return (len(chiplet), (np.round(relative, 12) + 0.0).tobytes(), materials.tobytes(), blockIndices.tobytes())    # + 0.0 turns -0.0 into 0.0
+
+"""Function that groups the chiplets of a flattened model by design.
+Returns a dictionary with the unit arrays of every chiplet ("arrays", per layer), the design index of every chiplet ("designOf", per layer),
+the (layer, chiplet) of the first instance of every design ("designs") and its signature ("signatures"), and the number of chiplets ("instances")."""
+def find_chiplet_designs(model):
+    signatures = {}
+    designs = {"arrays": [], "designOf": [], "designs": [], "signatures": [], "instances": 0}
+    for iLayer, layer in enumerate(model):
+        designs["arrays"].append([get_unit_arrays(chiplet) for chiplet in layer])
+        designs["designOf"].append([])
+        for iChiplet, chiplet in enumerate(layer):
+            signature = chiplet_signature(chiplet, designs["arrays"][iLayer][iChiplet])
+            if signature not in signatures:
+                signatures[signature] = len(designs["designs"])
+                designs["designs"].append((iLayer, iChiplet))
+                designs["signatures"].append(signature)
+            designs["designOf"][iLayer].append(signatures[signature])
+            designs["instances"] += 1
+    return designs
+
+"""Function that returns the ground sides of every unit of a flattened chiplet (see get_ground_nodes): a unit is grounded on a side when no unit of the chiplet extends further on that side
+(beyond the tolerance of isclose)."""
+def get_ground_sides(arrays):
+    grounded = []
+    for field, extreme in (("topY", np.max), ("rightX", np.max), ("bottomY", np.min), ("leftX", np.min)):  # North, east, south, west
+        values = arrays[field]
+        limit = extreme(values)
+        grounded.append(np.abs(values - limit) <= 1e-9 * np.maximum(np.abs(values), abs(limit)))
+    return [[side for side in range(4) if grounded[side][i]] for i in range(len(arrays["leftX"]))]
+
+"""Function that returns the pairs (i, j), i < j, of adjacent units of a flattened chiplet (see are_adjacent).
+The units are sorted by their left (bottom) edge, so that are_adjacent is only called for the units whose left (bottom) edge is at the right (top) edge of another unit."""
+def find_adjacent_units(chiplet, arrays):
+    pairs = set()
+    for high, low in (("rightX", "leftX"), ("topY", "bottomY")):
+        order = np.argsort(arrays[low], kind="stable")
+        sortedLow = arrays[low][order]
+        tolerance = 2e-9 * np.abs(arrays[high])    # Wider than the tolerance of isclose, are_adjacent decides
+        first = np.searchsorted(sortedLow, arrays[high] - tolerance, "left")
+        last = np.searchsorted(sortedLow, arrays[high] + tolerance, "right")
+        for i in np.flatnonzero(last > first):
+            for j in order[first[i]:last[i]]:
+                if i != j and ctm.are_adjacent(chiplet[i], chiplet[j]):
+                    pairs.add((min(i, j), max(i, j)))
+    return sorted(pairs)
+
+"""Function that computes the intra-chiplet stamp of a flattened chiplet: the ground sides of every unit (see get_ground_nodes) and the conductance to each of them,
+the lateral conductances between adjacent units (pairs of unit indices) and the capacity of every unit. The stamp does not depend on where the chiplet is placed."""
+def make_chiplet_stamp(chiplet, arrays):
+    groundSides = get_ground_sides(arrays)
+    sideUnits = [i for i, sides in enumerate(groundSides) for side in sides]
+    sideRanks = [rank for sides in groundSides for rank in range(len(sides))]
+    sideConductances = [1/ctm.get_side_ground_resistance(chiplet[i], side) for i, sides in enumerate(groundSides) for side in sides]
+    lateral = []
+    for i, j in find_adjacent_units(chiplet, arrays):
+        r = ctm.calculate_2D_res(chiplet[i], chiplet[j]) + ctm.calculate_2D_res(chiplet[j], chiplet[i])
+        lateral.append((i, j, 1/r))
+    lateral = np.array(lateral, dtype=float).reshape(-1, 3)
+    return {
+        "groundSides": groundSides,
+        "sideCounts": np.array([len(sides) for sides in groundSides], dtype=np.int64),
+        "sideUnits": np.array(sideUnits, dtype=np.int64),
+        "sideRanks": np.array(sideRanks, dtype=np.int64),
+        "sideConductances": np.array(sideConductances, dtype=float),
+        "lateralUnits": lateral[:, :2].astype(np.int64),
+        "lateralConductances": lateral[:, 2],
+        "capacities": np.array([ctm.get_unit_capacitance(unit) for unit in chiplet], dtype=float)
+    }
+
+"""Function that returns the superposed units of two chiplets of adjacent layers and their shared area: (units of the lower chiplet, units of the upper chiplet, areas).
+Units are superposed when they overlap in X and in Y by more than the relative tolerance of are_superposed (1e-9)."""
+def find_superposed_units(lower, upper):
+    candidatesLower = np.flatnonzero((lower["rightX"] > upper["leftX"].min()) & (lower["leftX"] < upper["rightX"].max()) & (lower["topY"] > upper["bottomY"].min()) & (lower["bottomY"] < upper["topY"].max()))
+    candidatesUpper = np.flatnonzero((upper["rightX"] > lower["leftX"].min()) & (upper["leftX"] < lower["rightX"].max()) & (upper["topY"] > lower["bottomY"].min()) & (upper["bottomY"] < lower["topY"].max()))
+    lengths = []
+    for low, high in (("leftX", "rightX"), ("bottomY", "topY")):
+        start = np.maximum(lower[low][candidatesLower, None], upper[low][None, candidatesUpper])
+        end = np.minimum(lower[high][candidatesLower, None], upper[high][None, candidatesUpper])
+        length = end - start
+        length[length <= 1e-9 * np.maximum(np.abs(start), np.abs(end))] = 0   # Touching edges (isclose) are not superposed
+        lengths.append(length)
+    area = lengths[0] * lengths[1]
+    iLower, iUpper = np.nonzero(area > 0)
+    return candidatesLower[iLower], candidatesUpper[iUpper], area[iLower, iUpper]
+
+"""Function that assembles a flattened model with chiplet stamps. designs is the result of find_chiplet_designs (computed if not given).
+stampCache is an optional dictionary of stamps by design signature, shared between assemblies of models with common chiplet designs (e.g. the same chiplet at different resolutions of the other layers):
+the stamps found in it are reused and the new ones are added to it.
+Returns the nodes (see the description of this module for how they differ from make_nodes) and the sparse G and C matrices."""
+def assemble_model(model, designs=None, stampCache=None):
+    if designs is None:
+        designs = find_chiplet_designs(model)
+    arrays = designs["arrays"]
+    with instrument.span("chiplet_stamps"):
+        stamps = []
+        for (iLayer, iChiplet), signature in zip(designs["designs"], designs["signatures"]):
+            stamp = None if stampCache is None else stampCache.get(signature)
+            if stamp is None:
+                stamp = make_chiplet_stamp(model[iLayer][iChiplet], arrays[iLayer][iChiplet])
+                if stampCache is not None:
+                    stampCache[signature] = stamp
+            stamps.append(stamp)
+    instrument.set_counter("chipletDesigns", len(stamps))
+    instrument.set_counter("chipletInstances", designs["instances"])
+
+    # Couplings between adjacent layers, per pair of superposed chiplets
+    vertical = []
+    coveredBelow = [[np.zeros(len(chiplet)) for chiplet in layer] for layer in model]  # Area of every unit covered by units of the layer below
+    coveredAbove = [[np.zeros(len(chiplet)) for chiplet in layer] for layer in model]  # Area of every unit covered by units of the layer above
+    with instrument.span("vertical_couplings"):
+        for iLayer in range(len(model) - 1):
+            for iLower, lower in enumerate(arrays[iLayer]):
+                for iUpper, upper in enumerate(arrays[iLayer + 1]):
+                    unitsLower, unitsUpper, area = find_superposed_units(lower, upper)
+                    if len(area):
+                        r = (lower["thickness"][unitsLower] / 2) / (lower["conductivity"][unitsLower] * area) + (upper["thickness"][unitsUpper] / 2) / (upper["conductivity"][unitsUpper] * area)
+                        vertical.append((iLayer, iLower, unitsLower, iUpper, unitsUpper, 1/r))
+                        np.add.at(coveredAbove[iLayer][iLower], unitsLower, area)
+                        np.add.at(coveredBelow[iLayer + 1][iUpper], unitsUpper, area)
+
+    # Nodes, in the order of make_nodes: for each unit, its center node, its side ground nodes, then its bottom and top ground nodes
+    nodes = []
+    centerIndices = [[None] * len(layer) for layer in model]
+    rows, cols, values = [], [], []
+
+    def couple(a, b, g):
+        rows.extend((a, b, a, b))
+        cols.extend((a, b, b, a))
+        values.extend((g, g, -g, -g))
+
+    capacityRows, capacities = [], []
+    with instrument.span("place_stamps"):
+        for iLayer, layer in enumerate(model):
+            for iChiplet, chiplet in enumerate(layer):
+                stamp = stamps[designs["designOf"][iLayer][iChiplet]]
+                unitArrays = arrays[iLayer][iChiplet]
+                unitArea = unitArrays["width"] * unitArrays["height"]
+                bottomArea = unitArea - coveredBelow[iLayer][iChiplet]
+                topArea = unitArea - coveredAbove[iLayer][iChiplet]
+                hasBottom = bottomArea > 1e-9 * unitArea   # Rounding residues of fully covered units are not ground areas
+                hasTop = topArea > 1e-9 * unitArea
+                counts = 1 + stamp["sideCounts"] + hasBottom + hasTop
+                center = len(nodes) + np.concatenate(([0], np.cumsum(counts)[:-1]))
+                centerIndices[iLayer][iChiplet] = center
+                for i in range(len(chiplet)):
+                    nodes.append(ctm.make_center_node(i, stamp["groundSides"][i], iLayer, iChiplet))
+                    nodes.extend(ctm.make_ground_node(i, iChiplet, iLayer, side) for side in stamp["groundSides"][i])
+                    if hasBottom[i]:
+                        nodes.append(ctm.make_ground_node_3D(i, iChiplet, iLayer, 0, bottomArea[i]))
+                    if hasTop[i]:
+                        nodes.append(ctm.make_ground_node_3D(i, iChiplet, iLayer, 1, topArea[i]))
+
+                # Intra-chiplet stamp, moved to the node indices of this instance
+                couple(center[stamp["lateralUnits"][:, 0]], center[stamp["lateralUnits"][:, 1]], stamp["lateralConductances"])
+                couple(center[stamp["sideUnits"]], center[stamp["sideUnits"]] + 1 + stamp["sideRanks"], stamp["sideConductances"])
+                capacityRows.append(center)
+                capacities.append(stamp["capacities"])
+
+                # Ground conductances to the bottom and top of the units that are not (fully) covered
+                bottomNodes = center + 1 + stamp["sideCounts"]
+                topNodes = bottomNodes + hasBottom
+                conductivity = unitArrays["conductivity"]
+                halfThickness = unitArrays["thickness"] / 2
+                couple(center[hasBottom], bottomNodes[hasBottom], conductivity[hasBottom] * bottomArea[hasBottom] / halfThickness[hasBottom])
+                couple(center[hasTop], topNodes[hasTop], conductivity[hasTop] * topArea[hasTop] / halfThickness[hasTop])
+                if iLayer == len(model) - 1:    # Convection to the ambient from the top of the top layer
+                    rows.append(topNodes[hasTop])
+                    cols.append(topNodes[hasTop])
+                    values.append(1/ctm.get_convection_resistance(unitArea[hasTop]))
+
+        for iLayer, iLower, unitsLower, iUpper, unitsUpper, g in vertical:
+            couple(centerIndices[iLayer][iLower][unitsLower], centerIndices[iLayer + 1][iUpper][unitsUpper], g)
+
+    with instrument.span("sparse_GC"):
+        nodeCount = len(nodes)
+        GMatrix = scipy.sparse.coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(nodeCount, nodeCount)).tocsr()   # Duplicates are summed
+        capacityRows = np.concatenate(capacityRows)
+        CMatrix = scipy.sparse.coo_matrix((np.concatenate(capacities), (capacityRows, capacityRows)), shape=(nodeCount, nodeCount)).tocsr()
+    return nodes, GMatrix, CMatrix
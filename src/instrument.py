@@ -0,0 +1,109 @@
+"""Run instrumentation: named timing spans, counters and a machine-readable run report.
+
+Spans with the same name are aggregated (count, total, min and max duration), so a span per transient step does not grow the report with the number of steps.
+Every thread (and every context, see contextvars) records to its own report, started by start_report: runs in the worker threads of the simulation server do not reset or mix
+with each other's spans and counters. Code that runs before any start_report records to a shared default report; the reports are updated under a lock.
+The report is written as JSON to globalVar.reportFile. If globalVar.profileRun is True, the whole run is also profiled with cProfile (stats written next to the report, .prof),
+and if globalVar.traceMemory is True, each span also records its peak Python allocation with tracemalloc."""
+
+import contextvars
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from src import globalVar
+
+try:
+    import resource     # Not available on Windows
+except ImportError:
+    resource = None
+
+_report = contextvars.ContextVar("report", default={"spans": {}, "counters": {}, "startTime": time.time()})
+_span = contextvars.ContextVar("span", default=None)    # Record of the innermost open span
+_lock = threading.Lock()
+_profiler = None
+
+"""Function that starts a new run report for the current thread (or context), discarding the spans and counters of its previous one. Starts cProfile and tracemalloc if they are enabled in globalVar."""
+def start_report():
+    global _profiler
+    _report.set({"spans": {}, "counters": {}, "startTime": time.time()})
+    with _lock:
+        if globalVar.profileRun and _profiler is None:
+            _profiler = cProfile.Profile()
+            _profiler.enable()
+        if globalVar.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+"""Context manager that times a named stage of the run and adds it to the report. The yielded record gets the duration (s) of the span when it exits.
+With memory tracing, the peak of tracemalloc is reset when a span starts, which would lose the peak the enclosing span has reached so far: that peak and the peak of the span
+are passed on to the record of the enclosing span ("peakTracedMemory"), which takes the largest of them and its own peak when it exits."""
+@contextmanager
+def span(name):
+    record = {"duration": 0}
+    traceMemory = globalVar.traceMemory and tracemalloc.is_tracing()   # Do not interfere with tracemalloc measurements of the caller when memory tracing is disabled
+    if traceMemory:
+        outerPeak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+    parent = _span.get()
+    token = _span.set(record)
+    spanStart = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["duration"] = time.perf_counter() - spanStart
+        _span.reset(token)
+        if traceMemory:
+            record["peakTracedMemory"] = max(tracemalloc.get_traced_memory()[1], record.get("peakTracedMemory", 0))
+            if parent is not None:
+                parent["peakTracedMemory"] = max(parent.get("peakTracedMemory", 0), outerPeak, record["peakTracedMemory"])
+        with _lock:
+            spanStats = _report.get()["spans"].setdefault(name, {"count": 0, "total": 0, "min": record["duration"], "max": record["duration"]})
+            spanStats["count"] += 1
+            spanStats["total"] += record["duration"]
+            spanStats["min"] = min(spanStats["min"], record["duration"])
+            spanStats["max"] = max(spanStats["max"], record["duration"])
+            if traceMemory:
+                spanStats["peakTracedMemory"] = max(spanStats.get("peakTracedMemory", 0), record["peakTracedMemory"])
+
+"""Function that sets the value of a counter of the report (e.g. number of nodes)."""
+def set_counter(name, value):
+    with _lock:
+        _report.get()["counters"][name] = value
+
+"""Function that adds an increment to a counter of the report (e.g. number of solves)."""
+def add_counter(name, increment=1):
+    with _lock:
+        counters = _report.get()["counters"]
+        counters[name] = counters.get(name, 0) + increment
+
+"""Function that returns the peak resident set size of the process in bytes, or None if it is not available on this platform."""
+def peak_rss():
+    if resource is None:
+        return None
+    maxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxRSS if sys.platform == "darwin" else maxRSS*1024     # Linux reports kilobytes, macOS bytes
+
+"""Function that returns the run report of the current thread (or context) as a dictionary (a copy, taken under the lock)."""
+def get_report():
+    report = _report.get()
+    with _lock:
+        return {
+            "wallTime": time.time() - report["startTime"],
+            "peakRSS": peak_rss(),
+            "spans": {name: dict(spanStats) for name, spanStats in report["spans"].items()},
+            "counters": dict(report["counters"])
+        }
+
+"""Function that writes the run report to globalVar.reportFile (nothing is written if it is None), and the cProfile stats next to it if profiling is enabled."""
+def write_report():
+    if globalVar.reportFile is None:
+        return
+    with open(globalVar.reportFile, 'w') as outfile:
+        json.dump(get_report(), outfile, indent=1)
+    if _profiler is not None:
+        _profiler.dump_stats(str(globalVar.reportFile) + ".prof")   # Dumping stops the profiler
+        _profiler.enable()
@@ -0,0 +1,109 @@
+"""Temperature-dependent leakage power.
+
+A leakage function gives the leakage power (W) of every block from the block temperatures (K): leakage(blockTemperatures) -> array, with blocks ordered as in the co-simulation stepper
+(by (layer, chiplet, block) indices, see src/cosim.py). The leakage of a block only depends on its own temperature (the area-weighted mean of its subblocks).
+It is added to the power of the model, and the coupled problem A x = b + leakage(x) is solved inside each solve, with A = G (steady state) or G + C/h (transient step):
+fixed-point: x = A^-1 (b + leakage(x)), one solve with the cached factorization of A per iteration
+newton: Newton iterations on A x - b - leakage(x) = 0, each linear system solved with GMRES preconditioned by the cached factorization of A
+(the derivative of the leakage is estimated by finite differences, one extra leakage evaluation per iteration). Newton also converges when the leakage feedback is strong.
+Each solve returns diagnostics: iterations, convergence, temperature change of the last iteration (K) and total leakage power (W)."""
+
+import numpy as np
+import scipy.sparse.linalg
+
+from src import cosim
+from src import globalVar
+from src import instrument
+from src import nub_ctm as ctm
+
+METHODS = ("fixed-point", "newton")
+
+"""Function that returns an exponential leakage function: leakage = referencePower * exp(beta * (T - referenceTemp)), per block.
+referencePower: leakage power (W) of every block at referenceTemp (K), beta: temperature sensitivity (1/K)."""
+def exponential_leakage(referencePower, referenceTemp=318.5, beta=0.02):
+    referencePower = np.asarray(referencePower, dtype=float)
+
+    def leakage(blockTemperatures):
+        return referencePower * np.exp(beta * (blockTemperatures - referenceTemp))
+    return leakage
+
+"""Function that solves A x = b + leakage(x) for x (temperature vector relative to the ambient).
+A is the sparse matrix of the system and factorization its cached LU factorization, x0 the initial guess and blockMap a co-simulation stepper of the model (block maps, see src/cosim.py).
+tolerance: largest temperature change (K) of an iteration at convergence
+Returns x and the diagnostics of the solve."""
+def solve_with_leakage(A, factorization, b, x0, blockMap, leakage, method="fixed-point", tolerance=1e-6, maxIterations=100):
+    if method not in METHODS:
+        raise ValueError("Unknown leakage method: " + str(method) + ". Valid methods are: " + ", ".join(METHODS))
+    x = np.array(x0, dtype=float)
+    info = {"method": method, "iterations": 0, "converged": False, "change": np.inf}
+    with np.errstate(over="ignore", invalid="ignore"):     # A thermal runaway is reported below, without NumPy warnings
+        for iteration in range(maxIterations):
+            blockTemperatures = cosim.block_temperatures(blockMap, x)
+            leakagePower = leakage(blockTemperatures)
+            if method == "fixed-point":
+                xNew = factorization.solve(b + cosim.spread_block_power(blockMap, leakagePower))
+            else:
+                epsilon = 1e-3  # K, finite difference step of the leakage derivative
+                leakageDerivative = (leakage(blockTemperatures + epsilon) - leakagePower) / epsilon
+                derivativeOfCenter = leakageDerivative[blockMap["blockOfCenter"]] * blockMap["shareOfCenter"]
+                weightOfCenter = blockMap["areas"] / blockMap["blockAreas"][blockMap["blockOfCenter"]]
+
+                def jacobian(v):
+                    blockChange = np.add.reduceat(v[blockMap["centerNodes"]] * weightOfCenter, blockMap["starts"])     # Change of the block temperatures
+                    result = A.dot(v)
+                    result[blockMap["centerNodes"]] -= derivativeOfCenter * blockChange[blockMap["blockOfCenter"]]
+                    return result
+
+                residual = A.dot(x) - b - cosim.spread_block_power(blockMap, leakagePower)
+                operator = scipy.sparse.linalg.LinearOperator(A.shape, matvec=jacobian, dtype=float)
+                preconditioner = scipy.sparse.linalg.LinearOperator(A.shape, matvec=factorization.solve, dtype=float)
+                delta, status = scipy.sparse.linalg.gmres(operator, -residual, x0=factorization.solve(-residual), rtol=1e-10, atol=0, M=preconditioner)
+                xNew = x + delta
+            info["iterations"] = iteration + 1
+            info["change"] = float(np.max(np.abs(xNew - x)))
+            x = xNew
+            if not np.all(np.isfinite(x)):
+                print("WARNING: leakage iterations diverged (thermal runaway?)")
+                break
+            if info["change"] < tolerance:
+                info["converged"] = True
+                break
+        info["leakagePower"] = float(np.sum(leakage(cosim.block_temperatures(blockMap, x))))
+    if not info["converged"] and np.all(np.isfinite(x)):
+        print("WARNING: leakage iterations did not converge in " + str(info["iterations"]) + " iterations (last change " + str(info["change"]) + " K)")
+    instrument.add_counter("leakageIterations", info["iterations"])
+    instrument.add_counter("solves", info["iterations"])
+    return x, info
+
+"""Function that solves the steady state of the prepared model with leakage. Returns the temperature vector (relative to the ambient) and the diagnostics."""
+def solve_steady_state_with_leakage(leakage, method="fixed-point", tolerance=1e-6, maxIterations=100):
+    cache = ctm.get_factorization_cache(globalVar.GMatrix, globalVar.CMatrix)
+    factorization = ctm.get_steady_state_factorization(globalVar.GMatrix, globalVar.CMatrix)
+    b = np.asarray(globalVar.IVector, dtype=float)
+    x0 = factorization.solve(b)     # Solution without leakage as initial guess
+    instrument.add_counter("solves")
+    with instrument.span("solve_steady_state_leakage"):
+        return solve_with_leakage(cache["G"], factorization, b, x0, cosim.make_stepper(), leakage, method, tolerance, maxIterations)
+
+"""Function that returns a transient step solver with leakage, to use instead of bEuler in iterBeuler (same arguments and result), and the diagnostics it accumulates:
+number of steps, total and largest number of iterations per step, number of steps that did not converge and total leakage power of the last step."""
+def make_leakage_step_solver(leakage, method="fixed-point", tolerance=1e-6, maxIterations=100):
+    blockMap = cosim.make_stepper()
+    diagnostics = {"method": method, "steps": 0, "iterations": 0, "maxIterations": 0, "failedSteps": 0, "leakagePower": 0}
+
+    def step_solver(nSteps, timeStep, GMatrix, CMatrix, IVector, oldX):
+        h = timeStep / nSteps
+        cache = ctm.get_factorization_cache(GMatrix, CMatrix)
+        factorization = ctm.get_step_factorization(GMatrix, CMatrix, h)
+        oldX = np.asarray(oldX, dtype=float)
+        A = cache.setdefault("stepMatrices", {}).get(h)
+        if A is None:
+            A = cache["stepMatrices"][h] = scipy.sparse.csr_matrix(cache["G"] + cache["C"] / h)
+        newX, info = solve_with_leakage(A, factorization, np.add(IVector, blockMap["capacities"] * oldX / h), oldX, blockMap, leakage, method, tolerance, maxIterations)
+        diagnostics["steps"] += 1
+        diagnostics["iterations"] += info["iterations"]
+        diagnostics["maxIterations"] = max(diagnostics["maxIterations"], info["iterations"])
+        diagnostics["failedSteps"] += 0 if info["converged"] else 1
+        diagnostics["leakagePower"] = info["leakagePower"]
+        return newX
+    return step_solver, diagnostics
@@ -0,0 +1,419 @@
+"""Declarative model files.
+
+A model file describes the same structure as the Python model modules (layers, chiplets, blocks) without running any code:
+
+{
+    "format": "artsim-model",
+    "version": 1,
+    "resolution": [2, 2],
+    "materials": {"My epoxy": {"volumetricHeatCapacity": 1.5e6, "conductivity": 0.8}},
+    "layers": [
+        {"name": "die", "material": "Si", "thickness": 2e-05, "chiplets": [
+            {"name": "core", "blocks": [
+                {"name": "alu", "leftX": 0, "bottomY": 0, "width": 1e-4, "height": 1e-4, "power": 0.5},
+                {"name": "fpu", "leftX": 1e-4, "bottomY": 0, "width": 1e-4, "height": 1e-4, "power": [0.1, 0.3], "resolution": [4, 4]}
+            ]}
+        ]}
+    ],
+    "powerTraces": {"alu": [0.5, 0.2]}
+}
+
+- "material", "thickness" and "resolution" can be set on the model, a layer, a chiplet or a block; the innermost definition is used.
+- A material is either the name of a material of src/materials.py (or of the "materials" section), or explicit "volumetricHeatCapacity" and "conductivity" values on the block/chiplet/layer.
+- "power" is the power dissipation in W: a single value, or one value per transient step. "powerTraces" optionally maps block names to their transient power.
+- All lengths are in meters, as in the Python models.
+- A chiplet used several times can be declared once in a "chipletDesigns" section ({"gpu": {"material": "Si", "blocks": [...]}}) and placed in the layers with
+  {"name": "gpu0", "design": "gpu", "offset": [x, y], "power": {"alu": 0.8}}: its blocks are moved by the offset and named "gpu0.alu", etc. (see src/instancing.py).
+
+Supported files: .json, .toml (TOML with the same structure, read with tomllib) and .npz (binary struct-of-arrays written by save_model_file, the fastest to load)."""
+
+import importlib
+import json
+from cmath import isclose
+from pathlib import Path
+
+import numpy as np
+
+from src import materials
+from src.nub_ctm import make_unit_dict
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    tomllib = None
+
+MODEL_FORMAT = "artsim-model"
+MODEL_FORMAT_VERSION = 1
+
+# Fields of the struct-of-arrays form, one entry per block of the model
+ARRAY_FIELDS_FLOAT = ("leftX", "bottomY", "width", "height", "thickness", "volumetricHeatCapacity", "conductivity", "power")
+ARRAY_FIELDS_INT = ("layerIndex", "chipletIndex", "unitIndex")
+INHERITED_FIELDS = ("material", "thickness", "resolution", "volumetricHeatCapacity", "conductivity")
+
+"""Function that returns True if a value of a model document is a number (int or float, not bool)."""
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+"""Function that returns the (volumetricHeatCapacity, conductivity) of a block definition, from its material name or its explicit values. Errors are appended to the errors list."""
+def _resolve_material(definition, customMaterials, where, errors):
+    if "volumetricHeatCapacity" in definition and "conductivity" in definition:
+        return definition["volumetricHeatCapacity"], definition["conductivity"]
+    name = definition.get("material")
+    if name is None:
+        errors.append(where + ": no material (or volumetricHeatCapacity and conductivity) defined")
+        return 0, 0
+    if name in customMaterials:
+        material = customMaterials[name]
+    elif name in materials.materials:
+        material = materials.materials[name]
+    else:
+        errors.append(where + ": unknown material " + repr(name))
+        return 0, 0
+    if "volumetricHeatCapacity" not in material or "conductivity" not in material:     # Incomplete custom material, reported by document_to_arrays
+        return 0, 0
+    return material["volumetricHeatCapacity"], material["conductivity"]
+
+"""Function that expands an instance of a chiplet design ({"design": name, "offset": [x, y], "power": {block name: power}}) to a chiplet definition:
+the blocks of the design moved by the offset, named "<chiplet name>.<block name>", with the power given for this instance if any. Errors are appended to the errors list."""
+def _instance_chiplet(chiplet, chipletName, designs, source, errors):
+    where = source + ": chiplet " + chipletName
+    design = designs.get(chiplet["design"])
+    if design is None:
+        errors.append(where + ": unknown chiplet design " + repr(chiplet["design"]))
+        return {}
+    offset = chiplet.get("offset", [0, 0])
+    if not (isinstance(offset, (list, tuple)) and len(offset) == 2 and all(_is_number(value) for value in offset)):
+        errors.append(where + ": offset must be [X,Y] in meters, got " + repr(offset))
+        offset = [0, 0]
+    power = chiplet.get("power", {})
+    blocks = []
+    for iUnit, block in enumerate(design.get("blocks", [])):
+        blockName = block.get("name", "b" + str(iUnit))
+        block = dict(block, name=chipletName + "." + blockName)
+        if _is_number(block.get("leftX")) and _is_number(block.get("bottomY")):
+            block["leftX"] += offset[0]
+            block["bottomY"] += offset[1]
+        if blockName in power:
+            block["power"] = power[blockName]
+        blocks.append(block)
+    for blockName in power:
+        if blockName not in [block.get("name", "b" + str(i)) for i, block in enumerate(design.get("blocks", []))]:
+            errors.append(where + ": power refers to unknown block " + repr(blockName) + " of design " + repr(chiplet["design"]))
+    instance = {field: design[field] for field in INHERITED_FIELDS if field in design}
+    instance.update({field: chiplet[field] for field in INHERITED_FIELDS if field in chiplet})
+    instance["blocks"] = blocks
+    return instance
+
+"""Function that validates a model document (dictionary read from a JSON or TOML model file) and converts it to the struct-of-arrays form.
+All problems of the document are collected and reported at once in a ValueError.
+The struct-of-arrays form is a dictionary of NumPy arrays with one entry per block (see ARRAY_FIELDS_FLOAT and ARRAY_FIELDS_INT), plus:
+resolution: (blocks, 2) int array
+powerTrace: (blocks, phases) float array of the transient power (None if every block has a constant power)
+hasTrace: bool array, True for blocks with a transient power
+names, layerNames, chipletNames: names of the blocks, layers and chiplets (chipletNames is a list per layer)"""
+def document_to_arrays(document, source="model"):
+    errors = []
+    if document.get("format", MODEL_FORMAT) != MODEL_FORMAT:
+        errors.append(source + ": unsupported format " + repr(document.get("format")))
+    version = document.get("version", MODEL_FORMAT_VERSION)
+    if not isinstance(version, int) or isinstance(version, bool):
+        errors.append(source + ": version must be an integer, got " + repr(version))
+    elif version > MODEL_FORMAT_VERSION:
+        errors.append(source + ": unsupported version " + repr(version))
+    customMaterials = document.get("materials", {})
+    for name, material in customMaterials.items():
+        if "volumetricHeatCapacity" not in material or "conductivity" not in material:
+            errors.append(source + ": material " + repr(name) + " needs volumetricHeatCapacity and conductivity")
+    layers = document.get("layers")
+    if not layers:
+        errors.append(source + ": the model has no layers")
+        layers = []
+
+    columns = {field: [] for field in ARRAY_FIELDS_FLOAT + ARRAY_FIELDS_INT}
+    resolutions = []
+    names = []
+    traces = []
+    layerNames = []
+    chipletNames = []
+    modelDefaults = {field: document[field] for field in INHERITED_FIELDS if field in document}
+    for iLayer, layer in enumerate(layers):
+        layerNames.append(layer.get("name", "layer" + str(iLayer)))
+        chipletNames.append([])
+        layerDefaults = dict(modelDefaults, **{field: layer[field] for field in INHERITED_FIELDS if field in layer})
+        if not layer.get("chiplets"):
+            errors.append(source + ": layer " + layerNames[-1] + " has no chiplets")
+        for iChiplet, chiplet in enumerate(layer.get("chiplets", [])):
+            chipletNames[-1].append(chiplet.get("name", "chiplet" + str(iChiplet)))
+            if "design" in chiplet:
+                chiplet = _instance_chiplet(chiplet, chipletNames[-1][-1], document.get("chipletDesigns", {}), source, errors)
+            chipletDefaults = dict(layerDefaults, **{field: chiplet[field] for field in INHERITED_FIELDS if field in chiplet})
+            if not chiplet.get("blocks"):
+                errors.append(source + ": chiplet " + layerNames[-1] + "/" + chipletNames[-1][-1] + " has no blocks")
+            for iUnit, block in enumerate(chiplet.get("blocks", [])):
+                name = block.get("name", "l" + str(iLayer) + "_c" + str(iChiplet) + "_b" + str(iUnit))
+                where = source + ": block " + name
+                definition = dict(chipletDefaults, **block)
+                if "material" in block and not ("volumetricHeatCapacity" in block and "conductivity" in block):
+                    definition.pop("volumetricHeatCapacity", None)  # A material named on the block overrides explicit values inherited from above
+                    definition.pop("conductivity", None)
+                for field in ("leftX", "bottomY", "width", "height", "thickness"):
+                    if not _is_number(definition.get(field)):
+                        errors.append(where + ": missing or non-numeric " + field)
+                        definition[field] = 0
+                if definition["width"] <= 0 or definition["height"] <= 0 or definition["thickness"] <= 0:
+                    errors.append(where + ": width, height and thickness must be positive")
+                resolution = definition.get("resolution")
+                if not (isinstance(resolution, (list, tuple)) and len(resolution) == 2 and all(isinstance(r, int) and not isinstance(r, bool) and r > 0 for r in resolution)):
+                    errors.append(where + ": resolution must be [X,Y] with positive integers, got " + repr(resolution))
+                    resolution = [1, 1]
+                vhc, conductivity = _resolve_material(definition, customMaterials, where, errors)
+                power = document.get("powerTraces", {}).get(name, definition.get("power", 0))
+                if isinstance(power, (list, tuple)) and all(_is_number(value) for value in power):
+                    traces.append((len(names), power))
+                    steadyPower = power[0] if len(power) else 0
+                elif _is_number(power):
+                    steadyPower = power
+                else:
+                    errors.append(where + ": power must be a number or a list of numbers")
+                    steadyPower = 0
+                names.append(name)
+                resolutions.append(resolution)
+                for field, value in (("leftX", definition["leftX"]), ("bottomY", definition["bottomY"]), ("width", definition["width"]), ("height", definition["height"]),
+                                     ("thickness", definition["thickness"]), ("volumetricHeatCapacity", vhc), ("conductivity", conductivity), ("power", steadyPower),
+                                     ("layerIndex", iLayer), ("chipletIndex", iChiplet), ("unitIndex", iUnit)):
+                    columns[field].append(value)
+
+    if len(set(names)) != len(names) and "powerTraces" in document:
+        errors.append(source + ": block names must be unique when powerTraces is used")
+    for name in document.get("powerTraces", {}):
+        if name not in names:
+            errors.append(source + ": powerTraces refers to unknown block " + repr(name))
+    phases = {len(trace) for _, trace in traces}
+    if len(phases) > 1:
+        errors.append(source + ": all power traces must have the same length, got lengths " + str(sorted(phases)))
+        phases = {max(phases)}
+    if errors:     # The arrays are not built from an invalid document (their checks would repeat these errors)
+        raise ValueError("Invalid model file:\n" + "\n".join(errors))
+
+    arrays = {field: np.array(columns[field], dtype=np.float64) for field in ARRAY_FIELDS_FLOAT}
+    arrays.update({field: np.array(columns[field], dtype=np.int32) for field in ARRAY_FIELDS_INT})
+    arrays["resolution"] = np.array(resolutions, dtype=np.int32).reshape(-1, 2)
+    arrays["hasTrace"] = np.zeros(len(names), dtype=bool)
+    arrays["powerTrace"] = None
+    if traces:
+        powerTrace = np.repeat(arrays["power"][:, None], phases.pop(), axis=1)  # Blocks with a constant power use the same value at every step
+        for index, trace in traces:
+            powerTrace[index] = trace
+            arrays["hasTrace"][index] = True
+        arrays["powerTrace"] = powerTrace
+    arrays["names"] = names
+    arrays["layerNames"] = layerNames
+    arrays["chipletNames"] = chipletNames
+    check_arrays(arrays, source)
+    return arrays
+
+"""Function that validates the struct-of-arrays form of a model (see document_to_arrays), whether it was built from a document or read from a .npz file:
+one entry per block in every field, finite values, positive sizes and materials, [X,Y] resolutions with positive integers, power traces of the same length
+for the blocks that have one, and layer/chiplet/block indexes consistent with the layer and chiplet names (every chiplet has blocks, numbered in order).
+All problems are reported at once in a ValueError."""
+def check_arrays(arrays, source="model"):
+    errors = []
+    count = len(arrays["names"])
+    for field in ARRAY_FIELDS_FLOAT + ARRAY_FIELDS_INT + ("hasTrace",):
+        if np.shape(arrays[field]) != (count,):
+            errors.append(source + ": " + field + " must have one value per block (" + str(count) + "), got shape " + str(np.shape(arrays[field])))
+    if np.shape(arrays["resolution"]) != (count, 2):
+        errors.append(source + ": resolution must be [X,Y] per block, got shape " + str(np.shape(arrays["resolution"])))
+    if errors:
+        raise ValueError("Invalid model file:\n" + "\n".join(errors))
+
+    names = arrays["names"]
+    for field in ARRAY_FIELDS_FLOAT:
+        for i in np.flatnonzero(~np.isfinite(arrays[field])):
+            errors.append(source + ": block " + str(names[i]) + ": non-finite " + field)
+    for i in np.flatnonzero((arrays["width"] <= 0) | (arrays["height"] <= 0) | (arrays["thickness"] <= 0)):
+        errors.append(source + ": block " + str(names[i]) + ": width, height and thickness must be positive")
+    for i in np.flatnonzero((arrays["volumetricHeatCapacity"] <= 0) | (arrays["conductivity"] <= 0)):
+        errors.append(source + ": block " + str(names[i]) + ": volumetricHeatCapacity and conductivity must be positive")
+    for i in np.flatnonzero(np.any(arrays["resolution"] < 1, axis=1) | np.any(arrays["resolution"] != np.round(arrays["resolution"]), axis=1)):
+        errors.append(source + ": block " + str(names[i]) + ": resolution must be [X,Y] with positive integers, got " + str(list(arrays["resolution"][i])))
+
+    powerTrace = arrays["powerTrace"]
+    if powerTrace is None:
+        if np.any(arrays["hasTrace"]):
+            errors.append(source + ": blocks have a power trace but the model has no powerTrace")
+    elif np.ndim(powerTrace) != 2 or len(powerTrace) != count:
+        errors.append(source + ": powerTrace must have one trace per block (" + str(count) + "), all of the same length, got shape " + str(np.shape(powerTrace)))
+    elif not np.all(np.isfinite(powerTrace)):
+        errors.append(source + ": non-finite values in powerTrace")
+
+    chipletCounts = [len(chipletNames) for chipletNames in arrays["chipletNames"]]
+    if len(chipletCounts) != len(arrays["layerNames"]):
+        errors.append(source + ": " + str(len(arrays["layerNames"])) + " layer names for " + str(len(chipletCounts)) + " layers of chiplets")
+    layerIndex, chipletIndex, unitIndex = arrays["layerIndex"], arrays["chipletIndex"], arrays["unitIndex"]
+    if np.any((layerIndex < 0) | (layerIndex >= len(chipletCounts))):
+        errors.append(source + ": layerIndex out of range (" + str(len(chipletCounts)) + " layers)")
+    else:
+        expected = {}   # Next block index of every chiplet
+        for i in range(count):
+            chiplet = (int(layerIndex[i]), int(chipletIndex[i]))
+            if not 0 <= chiplet[1] < chipletCounts[chiplet[0]]:
+                errors.append(source + ": block " + str(names[i]) + ": chipletIndex " + str(chiplet[1]) + " out of range (" + str(chipletCounts[chiplet[0]]) + " chiplets in layer " + str(chiplet[0]) + ")")
+            elif unitIndex[i] != expected.get(chiplet, 0):
+                errors.append(source + ": block " + str(names[i]) + ": unitIndex " + str(int(unitIndex[i])) + " out of order (expected " + str(expected.get(chiplet, 0)) + ")")
+            expected[chiplet] = expected.get(chiplet, 0) + 1
+        for iLayer, chipletCount in enumerate(chipletCounts):
+            if chipletCount == 0:
+                errors.append(source + ": layer " + str(arrays["layerNames"][iLayer] if iLayer < len(arrays["layerNames"]) else iLayer) + " has no chiplets")
+            for iChiplet in range(chipletCount):
+                if (iLayer, iChiplet) not in expected:
+                    errors.append(source + ": chiplet " + str(arrays["chipletNames"][iLayer][iChiplet]) + " has no blocks")
+    if errors:
+        raise ValueError("Invalid model file:\n" + "\n".join(errors))
+
+"""Function that converts the struct-of-arrays form to the nested block model (list of layers, of chiplets, of make_unit_dict blocks) expected by prepareModel."""
+def arrays_to_block_model(arrays):
+    blockModel = [[[] for _ in chiplets] for chiplets in arrays["chipletNames"]]
+    hasTrace = arrays["hasTrace"]
+    powerTrace = arrays["powerTrace"]
+    columns = [arrays[field].tolist() for field in ("volumetricHeatCapacity", "conductivity", "thickness", "leftX", "bottomY", "width", "height", "power", "layerIndex", "chipletIndex")]
+    resolutions = arrays["resolution"].tolist()
+    for i, (vhc, conductivity, thickness, leftX, bottomY, width, height, power, layerIndex, chipletIndex) in enumerate(zip(*columns)):
+        if hasTrace[i]:
+            power = powerTrace[i].tolist()
+        blockModel[layerIndex][chipletIndex].append(make_unit_dict(vhc, conductivity, thickness, resolutions[i], leftX, bottomY, width, height, power))
+    return blockModel
+
+"""Function that reads a model file (.json, .toml or .npz) and returns its validated struct-of-arrays form (see document_to_arrays and check_arrays)."""
+def load_model_arrays(path):
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".npz":
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["format"]) != MODEL_FORMAT or int(data["version"]) > MODEL_FORMAT_VERSION:
+                raise ValueError("Invalid model file:\n" + str(path) + ": unsupported format or version")
+            arrays = {field: data[field] for field in ARRAY_FIELDS_FLOAT + ARRAY_FIELDS_INT + ("resolution", "hasTrace")}
+            arrays["powerTrace"] = data["powerTrace"] if "powerTrace" in data else None
+            arrays["names"] = data["names"].tolist()
+            arrays["layerNames"] = data["layerNames"].tolist()
+            chipletCounts = data["chipletCounts"].tolist()
+            chipletNames = data["chipletNames"].tolist()
+        arrays["chipletNames"] = []
+        start = 0
+        for count in chipletCounts:
+            arrays["chipletNames"].append(chipletNames[start:start+count])
+            start += count
+        check_arrays(arrays, str(path))
+        return arrays
+    if suffix == ".json":
+        with open(path) as infile:
+            document = json.load(infile)
+    elif suffix == ".toml":
+        if tomllib is None:
+            raise ImportError("Reading TOML model files requires Python 3.11 or later (tomllib)")
+        with open(path, "rb") as infile:
+            document = tomllib.load(infile)
+    else:
+        raise ValueError("Unsupported model file extension: " + str(path) + " (expected .json, .toml or .npz)")
+    return document_to_arrays(document, str(path))
+
+"""Function that reads a model file (.json, .toml or .npz) and returns the block model to pass to prepareModel."""
+def load_model(path):
+    return arrays_to_block_model(load_model_arrays(path))
+
+"""Function that converts the struct-of-arrays form back to a model document (dictionary). Materials are referred to by name when they match an entry of src/materials.py."""
+def arrays_to_document(arrays):
+    layers = [{"name": layerName, "chiplets": [{"name": chipletName, "blocks": []} for chipletName in arrays["chipletNames"][i]]} for i, layerName in enumerate(arrays["layerNames"])]
+    for i in range(len(arrays["names"])):
+        block = {"name": arrays["names"][i]}
+        for field in ("leftX", "bottomY", "width", "height", "thickness"):
+            block[field] = float(arrays[field][i])
+        block["resolution"] = [int(r) for r in arrays["resolution"][i]]
+        vhc = float(arrays["volumetricHeatCapacity"][i])
+        conductivity = float(arrays["conductivity"][i])
+        for name, material in materials.materials.items():
+            if isclose(material["volumetricHeatCapacity"], vhc) and isclose(material["conductivity"], conductivity):
+                block["material"] = name
+                break
+        else:
+            block["volumetricHeatCapacity"] = vhc
+            block["conductivity"] = conductivity
+        if arrays["hasTrace"][i]:
+            block["power"] = [float(p) for p in arrays["powerTrace"][i]]
+        else:
+            block["power"] = float(arrays["power"][i])
+        layers[int(arrays["layerIndex"][i])]["chiplets"][int(arrays["chipletIndex"][i])]["blocks"].append(block)
+    return {"format": MODEL_FORMAT, "version": MODEL_FORMAT_VERSION, "layers": layers}
+
+"""Function that writes a model document as TOML (only the subset of TOML needed by model files)."""
+def _document_to_toml(document):
+    def value(v):
+        if isinstance(v, str):
+            return json.dumps(v)
+        if isinstance(v, (list, tuple)):
+            return "[" + ", ".join(value(x) for x in v) + "]"
+        return repr(v)
+    lines = ["format = " + value(document["format"]), "version = " + value(document["version"])]
+    for layer in document["layers"]:
+        lines += ["", "[[layers]]", "name = " + value(layer["name"])]
+        for chiplet in layer["chiplets"]:
+            lines += ["", "[[layers.chiplets]]", "name = " + value(chiplet["name"])]
+            for block in chiplet["blocks"]:
+                lines += ["", "[[layers.chiplets.blocks]]"] + [key + " = " + value(v) for key, v in block.items()]
+    return "\n".join(lines) + "\n"
+
+"""Function that writes the struct-of-arrays form of a model to a .json, .toml or .npz model file."""
+def save_model_file(arrays, path):
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".npz":
+        data = {field: arrays[field] for field in ARRAY_FIELDS_FLOAT + ARRAY_FIELDS_INT + ("resolution", "hasTrace")}
+        if arrays["powerTrace"] is not None:
+            data["powerTrace"] = arrays["powerTrace"]
+        data["names"] = np.array(arrays["names"], dtype=str)
+        data["layerNames"] = np.array(arrays["layerNames"], dtype=str)
+        data["chipletNames"] = np.array([name for names in arrays["chipletNames"] for name in names], dtype=str)
+        data["chipletCounts"] = np.array([len(names) for names in arrays["chipletNames"]], dtype=np.int32)
+        np.savez(path, format=MODEL_FORMAT, version=MODEL_FORMAT_VERSION, **data)
+    elif suffix == ".json":
+        with open(path, 'w') as outfile:
+            json.dump(arrays_to_document(arrays), outfile, indent=1)
+    elif suffix == ".toml":
+        with open(path, 'w') as outfile:
+            outfile.write(_document_to_toml(arrays_to_document(arrays)))
+    else:
+        raise ValueError("Unsupported model file extension: " + str(path) + " (expected .json, .toml or .npz)")
+
+"""Function that converts a block model (as defined in the Python model modules) to the struct-of-arrays form."""
+def block_model_to_arrays(blockModel):
+    document = {"format": MODEL_FORMAT, "version": MODEL_FORMAT_VERSION, "layers": []}
+    for iLayer, layer in enumerate(blockModel):
+        document["layers"].append({"name": "layer" + str(iLayer), "chiplets": []})
+        for iChiplet, chiplet in enumerate(layer):
+            blocks = []
+            for iUnit, unit in enumerate(chiplet):
+                power = unit["powerDissipation"]
+                blocks.append({
+                    "name": "l" + str(iLayer) + "_c" + str(iChiplet) + "_b" + str(iUnit),
+                    "leftX": float(unit["leftX"]), "bottomY": float(unit["bottomY"]),
+                    "width": float(unit["width"]), "height": float(unit["height"]), "thickness": float(unit["thickness"]),
+                    "resolution": [int(r) for r in unit["resolution"]],
+                    "volumetricHeatCapacity": float(unit["volumetricHeatCapacity"]), "conductivity": float(unit["conductivity"]),
+                    "power": [float(p) for p in power] if isinstance(power, (list, tuple, np.ndarray)) else float(power)
+                })
+            document["layers"][-1]["chiplets"].append({"name": "chiplet" + str(iChiplet), "blocks": blocks})
+    return document_to_arrays(document, "block model")
+
+"""Function that converts a Python model module of the models directory (e.g. "example_model") to a model file (.json, .toml or .npz)."""
+def convert_python_model(moduleName, path):
+    module = importlib.import_module("models." + moduleName)
+    save_model_file(block_model_to_arrays(module.model), path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert a Python model module of the models directory to a declarative model file")
+    parser.add_argument("module", help="name of the model module, e.g. example_model")
+    parser.add_argument("output", help="output model file (.json, .toml or .npz)")
+    args = parser.parse_args()
+    convert_python_model(args.module, args.output)
@@ -1,14 +1,16 @@
 # Author: Adam Corbier (@Ad2Am2)
 
 from copy import deepcopy
+from types import SimpleNamespace
 
 import numpy as np
 import scipy
 import scipy.linalg
 import scipy.sparse.linalg
-import time
 
+from src import domainDecomposition
 from src import globalVar
+from src import instrument
 from cmath import isclose
 
 r_conv = 1
@@ -28,6 +30,10 @@ def make_unit_dict(volumetricHeatCapacity, conductivity, thickness, resolution,
     }
     return(unitDict)
 
+"""Function that returns True if the power dissipation of a unit is a transient power trace (list or array with one value per step) rather than a single value."""
+def is_power_trace(powerDissipation):
+    return isinstance(powerDissipation, (list, tuple, np.ndarray))
+
 """Function that turns one function unit of the structure and turn it into several smaller units, using the given resolution."""
 def flatten_unit(bigUnit, layerIndex, chipletIndex, unitIndex):
     unitArray = []
@@ -35,7 +41,22 @@ def flatten_unit(bigUnit, layerIndex, chipletIndex, unitIndex):
     unitHeight = bigUnit["height"]/bigUnit["resolution"][1]   # The height of each smaller unit will be the height of the big unit / the number of nodes in the y direction
     for rows in range (bigUnit["resolution"][1]): # For each row in the big unit (from bottom to top)
         for cols in range (bigUnit["resolution"][0]): # For each column in the big unit (from left to right)
-            if type(bigUnit["powerDissipation"]) == list:
+            if isinstance(bigUnit["powerDissipation"], np.ndarray):   # Power traces given as arrays (e.g. imported power traces) stay arrays, which is much lighter than lists for long traces
+
+                unitDict = {
+                    "volumetricHeatCapacity": bigUnit["volumetricHeatCapacity"],
+                    "conductivity": bigUnit["conductivity"],
+                    "thickness": bigUnit["thickness"],
+                    "leftX": bigUnit["leftX"] + unitWidth*cols,
+                    "bottomY": bigUnit["bottomY"] + unitHeight*rows,
+                    "width": unitWidth,
+                    "height": unitHeight,
+                    "powerDissipation": bigUnit["powerDissipation"]/(bigUnit["resolution"][0]*bigUnit["resolution"][1]),
+                    "layerIndex": layerIndex,
+                    "chipletIndex": chipletIndex,
+                    "unitIndex": unitIndex
+                }
+            elif is_power_trace(bigUnit["powerDissipation"]):
 
                 unitDict = {
                     "volumetricHeatCapacity": bigUnit["volumetricHeatCapacity"],
@@ -520,16 +541,25 @@ def make_unit_ground_nodes_3D(unitIndex, chipletIndex, layerIndex, model):
 
 
 
+"""Function that returns the resistance between the center node of a unit and its ground node on the given side of the chiplet (0-3, see get_ground_nodes)."""
+def get_side_ground_resistance(unit, side):
+    if side == 0 or side == 2:  # If the ground node is to the north or to the south
+        return calculate_resistance(unit["thickness"] * unit["width"], unit["conductivity"], unit["height"] / 2)  # Area adjacent to ground is thickness of the unit * width of the unit, distance from the middle X of the unit to the top/bottom X is height/2
+    return calculate_resistance(unit["thickness"] * unit["height"], unit["conductivity"], unit["width"] / 2)  # East or west: area adjacent to ground is thickness of the unit * height of the unit, distance from the middle X of the unit to the right/left X is width/2
+
+"""Function that returns the convection resistance from the top of the top layer to the ambient, for the given area. Works on NumPy arrays of areas too.
+The heat transfer coefficient is globalVar.heatTransferCoefficient (default 1200 W/(m^2*K)), or the effective coefficient of the compact boundary of the prepared model (see src/compactBoundary.py)."""
+def get_convection_resistance(area):
+    heatTransferCoefficient = globalVar.heatTransferCoefficient if globalVar.topBoundaryCoefficient is None else globalVar.topBoundaryCoefficient
+    return 1/(heatTransferCoefficient*area)
+
 """Function that populates the GMatrix with all the resistances that it is connected to. Includes 2D and 3D."""
 def make_center_node_resistances(centerNode, centerNodeIndex, nodes, model):
     unit = model[centerNode["layerIndex"]][centerNode["chipletIndex"]][centerNode["unitIndex"]]
     # Calculate resistances to ground
     groundNodes = find_unit_ground_nodes(nodes, centerNode["unitIndex"], centerNode["chipletIndex"], centerNode["layerIndex"])
     for i in range(len(groundNodes)):
-        if nodes[groundNodes[i]]["side"] == 0 or nodes[groundNodes[i]]["side"] == 2:  # If the ground node is to the north or to the south
-            populate_center_to_boundary_G(centerNodeIndex, groundNodes[i], calculate_resistance(unit["thickness"] * unit["width"], unit["conductivity"], unit["height"] / 2))  # Area adjacent to ground is thickness of the unit * width of the unit, distance from the middle X of the unit to the top/bottom X is height/2
-        if nodes[groundNodes[i]]["side"] == 1 or nodes[groundNodes[i]]["side"] == 3:  # If the ground node is to the north or to the south
-            populate_center_to_boundary_G(centerNodeIndex, groundNodes[i], calculate_resistance(unit["thickness"] * unit["height"], unit["conductivity"],unit["width"] / 2))  # Area adjacent to ground is thickness of the unit * height of the unit, distance from the middle X of the unit to the right/left X is width/2
+        populate_center_to_boundary_G(centerNodeIndex, groundNodes[i], get_side_ground_resistance(unit, nodes[groundNodes[i]]["side"]))
 
     # Calculate 2D boundary resistances
     boundaryUnits = []
@@ -583,8 +613,7 @@ def make_center_node_resistances(centerNode, centerNodeIndex, nodes, model):
             if len(model) - 1 == centerNode["layerIndex"]:
                 unitArea = unit["width"] * unit["height"]
 
-                r = 1/(1200*unitArea)
-                populate_ground_G(groundNodes3D[i], r)
+                populate_ground_G(groundNodes3D[i], get_convection_resistance(unitArea))
 
 
 
@@ -622,7 +651,7 @@ def initialize_I_vector(nodes):
 """Populates the value of the I vector for a center node, in accordance to the format of MNA (Modified Nodal Analysis) for the solver of the system.
 I represents the power dissipation of the unit. It is considered that the power dissipation comes from ground to the center node of the unit."""
 def populate_centerNode_I(centerNode, centerNodeIndex, model, nodes):
-    if type(model[nodes[centerNodeIndex]["layerIndex"]][nodes[centerNodeIndex]["chipletIndex"]][nodes[centerNodeIndex]["unitIndex"]]["powerDissipation"]) == list:
+    if is_power_trace(model[nodes[centerNodeIndex]["layerIndex"]][nodes[centerNodeIndex]["chipletIndex"]][nodes[centerNodeIndex]["unitIndex"]]["powerDissipation"]):
         globalVar.IVector[centerNodeIndex] = model[centerNode["layerIndex"]][centerNode["chipletIndex"]][centerNode["unitIndex"]]["powerDissipation"][0]
     else:
         globalVar.IVector[centerNodeIndex] = model[centerNode["layerIndex"]][centerNode["chipletIndex"]][centerNode["unitIndex"]]["powerDissipation"]
@@ -635,29 +664,176 @@ def populate_I_vector(nodes, model):
             populate_centerNode_I(nodes[i], i, model, nodes)
 
 
+"""Function that returns the I vector of every step of a transient simulation, as a (steps, nodes) array.
+Units with a power trace (list or array) must have one power value per step; units with a single power value use it at every step."""
 def populate_I_vector_vector_transient(nodes, model, steps):
-    IVectorVector = []
-
-    for i in range(steps):
-        IVector = initialize_I_vector(nodes)
-        for j in range (len(nodes)):
-            if nodes[j]["type"] == 0:
-                if type(model[nodes[j]["layerIndex"]][nodes[j]["chipletIndex"]][nodes[j]["unitIndex"]]["powerDissipation"]) == list:
-                    if len(model[nodes[j]["layerIndex"]][nodes[j]["chipletIndex"]][nodes[j]["unitIndex"]]["powerDissipation"]) != steps:
-                        print("Error: power dissipation list length does not match number of steps")
-                        return
-                    IVector[j] = model[nodes[j]["layerIndex"]][nodes[j]["chipletIndex"]][nodes[j]["unitIndex"]]["powerDissipation"][i]
-                else:
-                    IVector[j] = model[nodes[j]["layerIndex"]][nodes[j]["chipletIndex"]][nodes[j]["unitIndex"]]["powerDissipation"]
-        IVectorVector.append(IVector)
+    IVectorVector = np.zeros((steps, len(nodes)))
+
+    for j in range (len(nodes)):
+        if nodes[j]["type"] == 0:
+            powerDissipation = model[nodes[j]["layerIndex"]][nodes[j]["chipletIndex"]][nodes[j]["unitIndex"]]["powerDissipation"]
+            if is_power_trace(powerDissipation):
+                if len(powerDissipation) != steps:
+                    print("Error: power dissipation list length does not match number of steps")
+                    return
+            IVectorVector[:, j] = powerDissipation  # A single value is broadcast to all the steps
     return IVectorVector
 
 
+"""Function that returns the I vector source of a transient simulation: a function that builds the I vector of one step (phase) on demand, so the I vectors of all the steps are never held at once.
+Power is looked up once per block (all the subblocks of a block dissipate the same share of its power): constant powers are kept in one vector and power traces in a (steps, blocks with a trace) array.
+Units with a power trace (list or array) must have one power value per step; units with a single power value use it at every step."""
+def make_I_vector_source(nodes, model, steps):
+    centerMap = get_center_map(nodes, model)
+    offsets = centerMap["segmentOffsets"]
+    counts = np.diff(offsets)
+    constantPower = np.zeros(len(counts))
+    tracedBlocks = []
+    traces = []
+    for k in range(len(counts)):
+        centerNode = nodes[centerMap["centerNodes"][offsets[k]]]   # First subblock of the block
+        powerDissipation = model[centerNode["layerIndex"]][centerNode["chipletIndex"]][centerNode["unitIndex"]]["powerDissipation"]
+        if is_power_trace(powerDissipation):
+            if len(powerDissipation) != steps:
+                raise ValueError("Power dissipation list length does not match number of steps")
+            tracedBlocks.append(k)
+            traces.append(np.asarray(powerDissipation, dtype=float))
+        else:
+            constantPower[k] = powerDissipation
+    traces = np.stack(traces, axis=1) if traces else np.zeros((steps, 0))
+    tracedBlocks = np.array(tracedBlocks, dtype=np.int64)
+
+    def get_I_vector(step):
+        blockPower = constantPower.copy()
+        blockPower[tracedBlocks] = traces[step]
+        IVector = np.zeros(len(nodes))
+        IVector[centerMap["centerNodes"]] = np.repeat(blockPower, counts)
+        return IVector
+    return get_I_vector
+
+
 
 # Solvers
 
+"""Function that converts a G, C or A matrix (nested lists, NumPy array or SciPy sparse matrix) to the compressed sparse column format used by the factorizations."""
+def to_sparse(matrix):
+    if scipy.sparse.issparse(matrix):
+        return scipy.sparse.csc_matrix(matrix)
+    return scipy.sparse.csc_matrix(np.asarray(matrix, dtype=float))
+
+"""Function that returns the factorization cache entry of a (G, C) pair.
+The cache lives in globalVar.factorCache and is keyed on the identity of the matrices (and the solver and precision), so that a new prepareModel or a matrix passed in by the caller never reuses stale factors.
+Each entry holds the sparse G and C, the steady state factorization of G ("steady") and one factorization of G + C/h per timestep h.
+labels gives the (layer, chiplet) of every node, used by the domain decomposition solver; for the matrices of the prepared model (globalVar.GMatrix), they are taken from globalVar.nodes."""
+def get_factorization_cache(GMatrix, CMatrix, labels=None):
+    key = (id(GMatrix), id(CMatrix), get_solver(), globalVar.precision)
+    if key not in globalVar.factorCache:
+        with instrument.span("sparsify_GC"):
+            globalVar.factorCache[key] = {
+                "source": (GMatrix, CMatrix),   # Keep the matrices alive so that their ids cannot be reused by other objects
+                "G": to_sparse(GMatrix),
+                "C": to_sparse(CMatrix),
+                "labels": get_node_labels(globalVar.nodes) if labels is None and GMatrix is globalVar.GMatrix and globalVar.nodes else labels,
+                "steps": {}
+            }
+        instrument.set_counter("GNonzeros", globalVar.factorCache[key]["G"].nnz)
+        instrument.set_counter("CNonzeros", globalVar.factorCache[key]["C"].nnz)
+    elif labels is not None:
+        globalVar.factorCache[key]["labels"] = labels
+    return globalVar.factorCache[key]
+
+"""Function that returns the solver of the prepared model: the one chosen by the preflight check (globalVar.modelSolver, see src/preflight.py) or the configured globalVar.solver."""
+def get_solver():
+    return globalVar.modelSolver or globalVar.solver
+
+"""Function that returns the (layer, chiplet) of every node, the subdomains of the domain decomposition solver."""
+def get_node_labels(nodes):
+    return [(node.get("layerIndex"), node.get("chipletIndex")) for node in nodes]
+
+"""Function that wraps a single precision factorization of A in mixed-precision iterative refinement: every solve starts from the single precision solution,
+then repeats x += solve(b - A x), with the residual b - A x computed in double precision against A (float64). Every correction shrinks the error by the same factor (about the condition number
+of A times the single precision epsilon), estimated as the ratio of the last correction to the previous one (the first one to the largest |x|), so the error left after a correction is
+about the correction times this ratio; the refinement stops when it is below globalVar.refinementTolerance (K, default 1e-4), which takes one correction for thermal networks
+(at most maxIterations corrections). The refinement converges as long as the condition number of A is well below 1/(single precision epsilon) = 1.7e7;
+if a solve does not converge (corrections that do not shrink), the factorization is replaced by the double precision
+factorization of doubleFactorize() with a warning. Returns an object with a solve method and the nnz, shape and itemsize of the factors, like the other factorizations."""
+def refine_factorization(A, factorization, doubleFactorize, maxIterations=10):
+    state = {"factorization": factorization, "double": False}
+
+    def solve(b):
+        b = np.asarray(b, dtype=float)
+        if state["double"]:
+            return state["factorization"].solve(b)
+        x = state["factorization"].solve(b.astype(np.float32)).astype(float)
+        lastCorrection = float(np.max(np.abs(x))) if x.size else 0.0     # The single precision solve is the first correction, from 0
+        for _ in range(maxIterations):
+            correction = state["factorization"].solve((b - A.dot(x)).astype(np.float32))
+            x += correction
+            instrument.add_counter("refinementSolves")
+            largest = float(np.max(np.abs(correction))) if correction.size else 0.0
+            if largest * largest <= globalVar.refinementTolerance * lastCorrection:   # Estimated error left: the correction times its ratio to the previous one
+                return x
+            if largest > lastCorrection / 2:
+                break
+            lastCorrection = largest
+        print("WARNING: mixed-precision refinement did not converge (last correction " + format(largest, ".3g") + "), switching to double precision for this matrix")
+        state["factorization"], state["double"] = doubleFactorize(), True
+        namespace.nnz, namespace.itemsize = state["factorization"].nnz, 8
+        return state["factorization"].solve(b)
+
+    namespace = SimpleNamespace(solve=solve, nnz=factorization.nnz, shape=A.shape, itemsize=4)
+    return namespace
+
+"""Function that factorizes A (G or G + C/h of a factorization cache entry) with the solver of get_solver(): "direct" (sparse LU)
+or "domain-decomposition" (Schur complement over (layer, chiplet) subdomains, see src/domainDecomposition.py; its partition is computed once per entry).
+With globalVar.precision "mixed", the factors are computed and stored in single precision and the solves use iterative refinement (see refine_factorization)."""
+def factorize(cache, A):
+    solver = get_solver()
+    if solver not in ("direct", "domain-decomposition"):
+        raise ValueError("Unknown solver: " + str(solver) + ". Valid solvers are: direct, domain-decomposition")
+    if globalVar.precision not in ("double", "mixed"):
+        raise ValueError("Unknown precision: " + str(globalVar.precision) + ". Valid precisions are: double, mixed")
+    if solver == "domain-decomposition":
+        if "partition" not in cache:
+            labels = cache.get("labels")
+            if labels is None:
+                raise ValueError("The domain decomposition solver needs the (layer, chiplet) of every node: pass labels to get_factorization_cache for matrices that are not the prepared model's")
+            if len(labels) != A.shape[0]:
+                raise ValueError("The domain decomposition labels (" + str(len(labels)) + " nodes) do not match the matrix (" + str(A.shape[0]) + " nodes)")
+            with instrument.span("partition"):
+                cache["partition"] = domainDecomposition.partition(A, labels)
+        factorizeWith = lambda matrix: domainDecomposition.factorize(matrix, *cache["partition"])
+    else:
+        factorizeWith = scipy.sparse.linalg.splu
+    if globalVar.precision == "mixed":
+        return refine_factorization(A, factorizeWith(scipy.sparse.csc_matrix(A, dtype=np.float32)), lambda: factorizeWith(A))
+    return factorizeWith(A)
+
+"""Function that returns the (cached) LU factorization of G, used for steady state solves."""
+def get_steady_state_factorization(GMatrix, CMatrix):
+    cache = get_factorization_cache(GMatrix, CMatrix)
+    if "steady" not in cache:
+        with instrument.span("factorize_steady_state"):
+            cache["steady"] = factorize(cache, cache["G"])
+        instrument.set_counter("steadyStateFillIn", cache["steady"].nnz - cache["G"].nnz)    # Nonzeros created by the factorization
+    return cache["steady"]
+
+"""Function that returns the (cached) LU factorization of G + C/h, used by every backward Euler step of timestep h."""
+def get_step_factorization(GMatrix, CMatrix, h):
+    cache = get_factorization_cache(GMatrix, CMatrix)
+    if h not in cache["steps"]:
+        with instrument.span("factorize_step"):
+            A = scipy.sparse.csc_matrix(cache["G"] + cache["C"] / h)
+            cache["steps"][h] = factorize(cache, A)
+        instrument.add_counter("stepFactorizations")
+        instrument.set_counter("stepFillIn", cache["steps"][h].nnz - A.nnz)
+    return cache["steps"][h]
+
 def solve_steady_state():
-    return scipy.sparse.linalg.spsolve(globalVar.GMatrix, globalVar.IVector)
+    factorization = get_steady_state_factorization(globalVar.GMatrix, globalVar.CMatrix)
+    with instrument.span("solve_steady_state"):
+        instrument.add_counter("solves")
+        return factorization.solve(np.asarray(globalVar.IVector, dtype=float))
 
 
 
@@ -676,47 +852,68 @@ def bEuler(nSteps, timeStep, GMatrix, CMatrix, IVector, oldX):
     # t2-t1 is the time interval between 2 lines
     # inputs: nSteps, timeInt
     # h=timeInt/nSteps
-    XVector = []
-    for i in range(1):
-        # print("Backwards Euler progress: " + str(i*100/nSteps) + "%")
-        # print("Computing step "+str(i)+"...")
-        # oldX = np.zeros(len(GMatrix))
-        A = np.add(GMatrix, divideMatrix(CMatrix, h))
-        C = np.array(divideMatrix(CMatrix, h)).dot(oldX)
-        B = np.add(IVector, C)
-        newX = np.linalg.solve(A,B)
-        XVector.append(newX)
-        oldX = newX
-        # printInfo(newX, nodes, model)
+    # (G + C/h) * newX = I + (C/h) * oldX. The factorization of G + C/h is computed once per timestep h and reused for every substep.
+    cache = get_factorization_cache(GMatrix, CMatrix)
+    B = np.add(IVector, cache["C"].dot(np.asarray(oldX, dtype=float)) / h)
+    newX = get_step_factorization(GMatrix, CMatrix, h).solve(B)
+    instrument.add_counter("solves")
     return newX
 
 
 
-def doBeuler(GMatrix, CMatrix, IVectorVector, initTempVector, stepDefinition):
-    tTempVector = []
-    for i in range(len(stepDefinition)):
+"""Generator that runs the backward Euler transient simulation over all the phases of stepDefinition, and yields (phase index, substep index, time (s), temperature vector) after every substep.
+Only the current temperature vector is kept, so memory does not depend on the number of steps: consumers (writers, statistics, probes) must copy what they want to keep.
+IVectorVector gives the I vector of each phase: a sequence indexed by phase, or a function of the phase (see make_I_vector_source).
+start is the (phase, substep) of the first substep to compute, to resume a simulation: initTempVector is then the temperature vector at the end of the previous substep.
+If tolerance is given, a phase stops early once the temperatures change slower than tolerance (K/s: largest temperature change of a substep divided by its duration): the remaining substeps of the phase are skipped
+and the state at the end of the phase is yielded as its last substep. It is the current state if onConverged is "stop", or the steady state of the power of the phase if it is "steady".
+stepSolver solves one substep, with the arguments and result of bEuler (default), e.g. a solver with temperature-dependent leakage (see src/leakage.py)."""
+def iterBeuler(GMatrix, CMatrix, IVectorVector, initTempVector, stepDefinition, start=(0, 0), tolerance=None, onConverged="stop", stepSolver=bEuler):
+    if onConverged not in ("stop", "steady"):
+        raise ValueError("Unknown convergence action: " + str(onConverged) + ". Valid actions are: stop, steady")
+    startTimeAtStep = sum(stepDefinition[i]["duration"] for i in range(start[0]))
+    for i in range(start[0], len(stepDefinition)):
+        IVector = IVectorVector(i) if callable(IVectorVector) else IVectorVector[i]
 
-        for j in range(stepDefinition[i]["steps"]):
+        for j in range(start[1] if i == start[0] else 0, stepDefinition[i]["steps"]):
             
-            stepStartTime = time.time()
             progress = (i*100/len(stepDefinition)) + (j*100/stepDefinition[i]["steps"])/len(stepDefinition)
             print("Backwards Euler progress: " + str(progress) + "%")
             print("Computing step "+str(i+1)+", substep "+str(j+1)+"...")
 
-            if (len(tTempVector) == 0):
-                initTempVector = initTempVector
-            else:
-                initTempVector = tTempVector[-1]
-            
-            tTempVector.append(bEuler(stepDefinition[i]["steps"], stepDefinition[i]["duration"], GMatrix, CMatrix, IVectorVector[i], initTempVector))
+            oldTempVector = initTempVector
+            with instrument.span("transient_step") as span:
+                initTempVector = stepSolver(stepDefinition[i]["steps"], stepDefinition[i]["duration"], GMatrix, CMatrix, IVector, initTempVector)
 
-            stepEndTime = time.time()
+            print("Step time: " + str(span["duration"]) + " seconds", end='\n')
+            yield i, j, startTimeAtStep + (j+1)*(stepDefinition[i]["duration"]/stepDefinition[i]["steps"]), initTempVector
 
-            print("Step time: " + str(stepEndTime-stepStartTime) + " seconds", end='\n')
+            lastSubstep = stepDefinition[i]["steps"] - 1
+            h = stepDefinition[i]["duration"]/stepDefinition[i]["steps"]
+            if tolerance is not None and j < lastSubstep and np.max(np.abs(initTempVector - np.asarray(oldTempVector, dtype=float)))/h < tolerance:
+                if onConverged == "steady":
+                    initTempVector = get_steady_state_factorization(GMatrix, CMatrix).solve(np.asarray(IVector, dtype=float))
+                    instrument.add_counter("solves")
+                print("Step " + str(i+1) + " converged, skipping " + str(lastSubstep - j) + " substeps")
+                instrument.add_counter("skippedSteps", lastSubstep - j)
+                yield i, lastSubstep, startTimeAtStep + stepDefinition[i]["duration"], initTempVector
+                break
 
+        startTimeAtStep += stepDefinition[i]["duration"]
 
-    return tTempVector
+"""Function that runs the backward Euler transient simulation over all the phases of stepDefinition (see iterBeuler).
+If stepCallback is given, it is called after every substep with (phase index, substep index, time (s), temperature vector), so outputs can be computed inside the time loop.
+If keepHistory is False, only the current temperature vector is kept (memory independent of the number of steps) and None is returned instead of the list of all the temperature vectors.
+With globalVar.precision "mixed", the kept temperature vectors are stored in single precision."""
+def doBeuler(GMatrix, CMatrix, IVectorVector, initTempVector, stepDefinition, stepCallback=None, keepHistory=True):
+    tTempVector = []
+    for i, j, time, tempVector in iterBeuler(GMatrix, CMatrix, IVectorVector, initTempVector, stepDefinition):
+        if keepHistory:
+            tTempVector.append(tempVector.astype(np.float32) if globalVar.precision == "mixed" else tempVector)  # Half the memory of the history, within 1e-4 K below 1000 K
+        if stepCallback is not None:
+            stepCallback(i, j, time, tempVector)
 
+    return tTempVector if keepHistory else None
 
 
 
@@ -725,52 +922,61 @@ def doBeuler(GMatrix, CMatrix, IVectorVector, initTempVector, stepDefinition):
 
 # Helper functions
 
-def find_center_temperatures(model, nodes, tempVector):
-    centerNodeNumber = 0
-    unitArray = []
-    chipletArray = []
-    layerArray = []
-    modelArray = []
-    currentLayer = 0
-    currentChiplet = 0
-    currentUnit = 0
-    for i in range(len(nodes)):
-        nodes[i]["temperature"] = tempVector[i]
-    for i in range(len(nodes)):
-        if nodes[i]["type"] == 0:   # If the node is a center node (type 0 is a center node)
-            unit = model[nodes[i]["layerIndex"]][nodes[i]["chipletIndex"]][nodes[i]["unitIndex"]]
-            if (unit["unitIndex"] == currentUnit and unit["chipletIndex"] == currentChiplet and unit["layerIndex"] == currentLayer):   # If node is in current unit, append temp, otherwise, create new array and update currentVars
-                unitArray.append(nodes[i]["temperature"])
-            if currentLayer != unit["layerIndex"]:
-                chipletArray.append(unitArray)
-                layerArray.append(chipletArray)
-                modelArray.append(layerArray)
-                unitArray = []
-                chipletArray = []
-                layerArray = []
-                currentLayer = unit["layerIndex"]
-                currentChiplet = unit["chipletIndex"]
-                currentUnit = unit["unitIndex"]
-                unitArray.append(nodes[i]["temperature"])
-            elif currentChiplet != unit["chipletIndex"]:
-                chipletArray.append(unitArray)
-                layerArray.append(chipletArray)
-                unitArray = []
-                chipletArray = []
-                currentChiplet = unit["chipletIndex"]
-                currentUnit = unit["unitIndex"]
-                unitArray.append(nodes[i]["temperature"])
-            elif currentUnit != unit["unitIndex"]:
-                chipletArray.append(unitArray)
-                unitArray = []
-                currentUnit = unit["unitIndex"]
-                unitArray.append(nodes[i]["temperature"])
-    chipletArray.append(unitArray)
-    layerArray.append(chipletArray)
-    modelArray.append(layerArray)
+"""Function that builds the center node index map of a prepared model, used to extract results from temperature vectors without walking the nodes.
+Returns a dictionary with:
+centerNodes: int array of the indexes of the center nodes, grouped by (layer, chiplet, unit of the block model), in node order
+segmentOffsets: int array of the offsets of each unit's segment in centerNodes (segment k is centerNodes[segmentOffsets[k]:segmentOffsets[k+1]])
+segmentKeys: (segments, 3) int array of the (layer, chiplet, unit) of each segment
+leftX, bottomY, width, height: float arrays of the geometry of the subblock of each center node
+nodes: the node list the map was built for"""
+def make_center_map(nodes, model):
+    centerNodes = find_center_nodes(nodes)
+    units = [model[nodes[i]["layerIndex"]][nodes[i]["chipletIndex"]][nodes[i]["unitIndex"]] for i in centerNodes]
+    keys = np.array([(nodes[i]["layerIndex"], nodes[i]["chipletIndex"], model[nodes[i]["layerIndex"]][nodes[i]["chipletIndex"]][nodes[i]["unitIndex"]]["unitIndex"]) for i in centerNodes], dtype=np.int64).reshape(-1, 3)
+    starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1    # A new segment starts wherever the (layer, chiplet, unit) changes
+    segmentOffsets = np.concatenate(([0], starts, [len(centerNodes)])).astype(np.int64)
+    return {
+        "centerNodes": np.array(centerNodes, dtype=np.int64),
+        "segmentOffsets": segmentOffsets,
+        "segmentKeys": keys[segmentOffsets[:-1]],
+        "leftX": np.array([unit["leftX"] for unit in units], dtype=float),
+        "bottomY": np.array([unit["bottomY"] for unit in units], dtype=float),
+        "width": np.array([unit["width"] for unit in units], dtype=float),
+        "height": np.array([unit["height"] for unit in units], dtype=float),
+        "nodes": nodes
+    }
+
+"""Function that returns the center node index map of the given nodes: the map of the prepared model (globalVar.centerMap) if the nodes are the prepared ones, otherwise a new map."""
+def get_center_map(nodes, model):
+    if globalVar.centerMap is None or globalVar.centerMap["nodes"] is not nodes:
+        globalVar.centerMap = make_center_map(nodes, model)
+    return globalVar.centerMap
 
+"""Function that extracts the center node temperatures from a temperature vector (nodes,) or a stack of vectors (steps, nodes) with one fancy-indexing operation."""
+def extract_center_temperatures(tempVectors, centerMap):
+    return np.asarray(tempVectors)[..., centerMap["centerNodes"]]
+
+"""Function that regroups the center temperatures of one temperature vector (as returned by extract_center_temperatures) per layer, chiplet and unit, as nested lists."""
+def nest_center_temperatures(centerTemps, centerMap):
+    modelArray = []
+    offsets = centerMap["segmentOffsets"]
+    previousLayer = None
+    previousChiplet = None
+    for k, (layerIndex, chipletIndex, unitIndex) in enumerate(centerMap["segmentKeys"]):
+        if layerIndex != previousLayer:
+            modelArray.append([[]])
+        elif chipletIndex != previousChiplet:
+            modelArray[-1].append([])
+        modelArray[-1][-1].append(list(centerTemps[offsets[k]:offsets[k+1]]))
+        previousLayer = layerIndex
+        previousChiplet = chipletIndex
     return modelArray
 
+"""Function that returns the center node temperatures of a temperature vector, grouped as a nested list per layer, chiplet and unit: modelArray[layer][chiplet][unit] is the list of the temperatures of the unit's subblocks."""
+def find_center_temperatures(model, nodes, tempVector):
+    centerMap = get_center_map(nodes, model)
+    return nest_center_temperatures(extract_center_temperatures(tempVector, centerMap), centerMap)
+
 
 def get_unit_average_temps(modelTempArray):
     modelAverageTempArray = []
@@ -846,33 +1052,10 @@ def get_unit_center_temps(modelTempArray):
     return modelAverageTempArray
 
 def printInfo(tempVector, nodes, model, outputFile):
-    maxTemp = max(tempVector)
-    # print("Max temperature: ", maxTemp)
-    minTemp = min(tempVector)
-    # print("Min temperature: ", minTemp)
-    averageTemp = np.average(tempVector)
-    # print("Average temperature: ", averageTemp)
     modelTemp = find_center_temperatures(model, nodes, tempVector)
-    # print("Temperatures of center nodes: \n")
-    # for i in range(len(modelTemp)):
-        # print(modelTemp[i])
     with open(outputFile, 'w') as outfile:
         outfile.write('\n\n\n'.join(str(i) for i in modelTemp))
-    averageUnitTemps = get_unit_average_temps(modelTemp)
-    # print("Average temperature of the units:\n", averageUnitTemps)
-    # print("All temps: \n", tempVector)
-    maxUnitTemps = get_unit_max_temps(modelTemp)
-    # print("Max temperature of the units: \n", maxUnitTemps)
-    minUnitTemps = get_unit_min_temps(modelTemp)
-    # print("Min temperature of the units: \n", minUnitTemps)
-    centerUnitRunOne = get_unit_center_temps(modelTemp)
-    # print("Center temperature of the units: \n", centerUnitRunOne)
-    maxTemp = max(tempVector)
-    # print("Max temperature: ", maxTemp)
-    minTemp = min(tempVector)
-    # print("Min temperature: ", minTemp)
-    averageTemp = np.average(tempVector)
-    # print("Average temperature: ", averageTemp)
+    # Per-block, per-chiplet and per-layer statistics are computed on demand with src/blockStats.py
 
 def printInfoCenters(tempVector, nodes, model):
     maxTemp = max(tempVector)
@@ -893,23 +1076,27 @@ def printInfoCenters(tempVector, nodes, model):
 
 
 
+"""Function that formats the center temperatures of one substep of a transient simulation as in the transient log."""
+def format_transient_step(step, substep, time, centerTemps, centerMap):
+    modelTemp = nest_center_temperatures(centerTemps, centerMap)
+    return ("Step " + str(step+1) + ", substep " + str(substep+1) + ":\n" + "Time: " + str(time) + "s\n" + "Center temperatures:\n"
+            + str('\n\n\n'.join(str(i) for i in modelTemp)) + "\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n")
+
 def saveTransientInfo(tempVector, stepDefinition, nodes, model, fileName):
-    outString = ""
+    centerMap = get_center_map(nodes, model)
+    centerTemps = extract_center_temperatures(tempVector, centerMap)    # Center temperatures of all the substeps, extracted at once
+    outString = []
     startTimeAtStep = 0
     startStepsAtStep = 0
     for i in range(len(stepDefinition)):
         for j in range(stepDefinition[i]["steps"]):
-            outString += "Step " + str(i+1) + ", substep " + str(j+1) + ":\n"
-            outString += "Time: " + str(startTimeAtStep + (j+1)*(stepDefinition[i]["duration"]/stepDefinition[i]["steps"])) + "s\n"
-            outString += "Center temperatures:\n"
-            modelTemp = find_center_temperatures(model, nodes, tempVector[startStepsAtStep + j])
-            outString += str('\n\n\n'.join(str(i) for i in modelTemp)) + "\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n\n"
+            outString.append(format_transient_step(i, j, startTimeAtStep + (j+1)*(stepDefinition[i]["duration"]/stepDefinition[i]["steps"]), centerTemps[startStepsAtStep + j], centerMap))
         
         startTimeAtStep += stepDefinition[i]["duration"]
         startStepsAtStep += stepDefinition[i]["steps"]
 
     with open(fileName, 'w') as outfile:
-        outfile.write(outString)
+        outfile.write("".join(outString))
 
 
 
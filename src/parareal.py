@@ -0,0 +1,127 @@
+"""Parallel-in-time transient integration (Parareal).
+
+The substeps of the step definition are split in time slices of equal numbers of substeps, one per worker process. A coarse propagator (one backward Euler step over the part of every
+phase that is in the slice, in the main process) sweeps the whole horizon serially, and the fine propagator (the backward Euler substeps of the step definition, as in iterBeuler)
+refines all the slices in parallel on a process pool. The start state of every slice is then corrected: U[k+1] = coarse(U[k]) + fine(old U[k]) - coarse(old U[k]).
+After iteration k, the first k slices are exact and are not propagated again. The iterations stop when the start states of the slices change by less than tolerance (K).
+Every fine sweep writes the trajectory of each slice it propagates to a temporary file (replacing the one of the previous iteration), so after the last iteration the files hold
+the temperatures of every substep: those of the slices propagated from their exact start states, and for the other slices the last fine sweep, whose start states changed by less
+than tolerance. They are yielded in order like iterBeuler, read back one substep at a time, so memory does not depend on the number of substeps.
+The speedup is at most (number of workers) / (number of iterations), minus the coarse sweeps: it pays off for long transients on many cores, where few iterations are needed.
+Each worker factorizes the step matrices of its slices once (factorizations cannot be shared between processes)."""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src import globalVar
+from src import instrument
+from src import nub_ctm as ctm
+
+_worker = {}
+
+"""Function that initializes a worker process with the sparse G and C matrices, their node labels (see get_factorization_cache) and the solver and precision of the main process."""
+def _init_worker(GMatrix, CMatrix, labels, solver, precision):
+    _worker["G"] = GMatrix
+    _worker["C"] = CMatrix
+    globalVar.solver = solver
+    globalVar.precision = precision
+    ctm.get_factorization_cache(GMatrix, CMatrix, labels)
+
+"""Function that propagates a temperature vector over a time slice with the fine propagator, in a worker process.
+portions: (steps, duration, I vector, number of substeps) of every phase in the slice. Returns the temperature vector at the end of the slice.
+If trajectoryFile is given, the temperature vectors of all the substeps are also written there, as a (substeps, nodes) .npy array."""
+def _fine_slice(portions, tempVector, trajectoryFile=None):
+    if trajectoryFile is not None:
+        states = np.lib.format.open_memmap(trajectoryFile, mode="w+", dtype=np.float64, shape=(sum(portion[3] for portion in portions), len(tempVector)))
+    substep = 0
+    for steps, duration, IVector, count in portions:
+        for _ in range(count):
+            tempVector = ctm.bEuler(steps, duration, _worker["G"], _worker["C"], IVector, tempVector)
+            if trajectoryFile is not None:
+                states[substep] = tempVector
+            substep += 1
+    if trajectoryFile is not None:
+        states.flush()
+        del states
+    return tempVector
+
+"""Function that propagates a temperature vector over a time slice with the coarse propagator: backward Euler steps of coarseRatio substeps over the part of every phase that is in the slice
+(at least one step per phase)."""
+def coarse_slice(GMatrix, CMatrix, portions, tempVector, coarseRatio):
+    for steps, duration, IVector, count in portions:
+        coarseSteps = max(1, count // coarseRatio)
+        for _ in range(coarseSteps):
+            tempVector = ctm.bEuler(coarseSteps, duration * count / steps, GMatrix, CMatrix, IVector, tempVector)
+    return tempVector
+
+"""Function that splits the substeps of stepDefinition, from start (phase, substep), in sliceCount slices of (nearly) equal numbers of substeps.
+Returns the substeps ((phase, substep) pairs) of every slice."""
+def make_slices(stepDefinition, start, sliceCount):
+    substeps = [(i, j) for i in range(start[0], len(stepDefinition)) for j in range(start[1] if i == start[0] else 0, stepDefinition[i]["steps"])]
+    bounds = np.linspace(0, len(substeps), min(sliceCount, len(substeps)) + 1).round().astype(int)
+    return [substeps[bounds[k]:bounds[k+1]] for k in range(len(bounds) - 1)]
+
+"""Generator that runs the transient simulation with Parareal (see the description of this module) and yields (phase index, substep index, time (s), temperature vector) after every substep,
+as iterBeuler. workers: number of processes and time slices (default globalVar.pararealWorkers, or the number of CPUs); tolerance: largest change (K) of the slice start states at convergence."""
+def iter_parareal(GMatrix, CMatrix, IVectorVector, initTempVector, stepDefinition, start=(0, 0), workers=None, tolerance=1e-6, coarseRatio=None, maxIterations=None):
+    workers = workers or globalVar.pararealWorkers or os.cpu_count() or 1
+    slices = make_slices(stepDefinition, start, workers)
+    if not slices:
+        return
+    if coarseRatio is None:
+        coarseRatio = max(1, len(slices[0]) // 4)     # 4 coarse steps per slice
+    cache = ctm.get_factorization_cache(GMatrix, CMatrix)
+    phaseStarts = [sum(stepDefinition[k]["duration"] for k in range(i)) for i in range(len(stepDefinition))]   # Same times as iterBeuler
+
+    def get_portions(slice):
+        portions = []
+        for i, j in slice:
+            if portions and portions[-1][0] == i:
+                portions[-1][-1] += 1
+            else:
+                portions.append([i, stepDefinition[i]["steps"], stepDefinition[i]["duration"], None, 1])
+        for portion in portions:
+            portion[3] = np.asarray(IVectorVector(portion[0]) if callable(IVectorVector) else IVectorVector[portion[0]], dtype=float)
+        return [tuple(portion[1:]) for portion in portions]
+
+    print("Parareal: " + str(len(slices)) + " time slices of " + str(len(slices[0])) + " substeps on " + str(workers) + " processes")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache["G"], cache["C"], cache["labels"], ctm.get_solver(), globalVar.precision)) as pool:
+        starts = [np.asarray(initTempVector, dtype=float)]
+        coarse = []
+        with instrument.span("parareal_coarse"):
+            for slice in slices:
+                coarse.append(coarse_slice(GMatrix, CMatrix, get_portions(slice), starts[-1], coarseRatio))
+                starts.append(coarse[-1])
+        fine = [None] * len(slices)
+        iterations = 0
+        with tempfile.TemporaryDirectory(prefix="parareal") as trajectoryDir:
+            trajectoryFiles = [os.path.join(trajectoryDir, "slice" + str(k) + ".npy") for k in range(len(slices))]
+            for iteration in range(maxIterations or len(slices)):
+                with instrument.span("parareal_fine"):
+                    ends = pool.map(_fine_slice, [get_portions(slice) for slice in slices[iteration:]], starts[iteration:-1], trajectoryFiles[iteration:])
+                    fine[iteration:] = list(ends)   # The first `iteration` slices are exact since the previous iterations
+                change = 0
+                with instrument.span("parareal_coarse"):
+                    for k in range(iteration, len(slices)):
+                        newCoarse = coarse_slice(GMatrix, CMatrix, get_portions(slices[k]), starts[k], coarseRatio)
+                        newStart = newCoarse + fine[k] - coarse[k]
+                        change = max(change, float(np.max(np.abs(newStart - starts[k + 1]))))
+                        coarse[k] = newCoarse
+                        starts[k + 1] = newStart
+                iterations = iteration + 1
+                print("Parareal iteration " + str(iterations) + ": largest correction " + format(change, ".4g") + " K")
+                if change < tolerance:
+                    break
+            else:
+                print("WARNING: Parareal did not converge in " + str(iterations) + " iterations (last correction " + format(change, ".4g") + " K)")
+            instrument.set_counter("pararealIterations", iterations)
+
+            for slice, trajectoryFile in zip(slices, trajectoryFiles):
+                trajectory = np.load(trajectoryFile, mmap_mode="r")
+                for (i, j), tempVector in zip(slice, trajectory):
+                    yield i, j, phaseStarts[i] + (j+1)*(stepDefinition[i]["duration"]/stepDefinition[i]["steps"]), np.array(tempVector)
+                del trajectory
+                os.remove(trajectoryFile)
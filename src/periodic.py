@@ -0,0 +1,72 @@
+"""Periodic steady state of cyclic workloads.
+
+When the power trace of stepDefinition is one cycle of a repeating workload, the temperatures settle, after many cycles, to a cycle that reproduces itself.
+Instead of simulating all these cycles, the initial state x0 of the settled cycle is solved for directly.
+With backward Euler, one period is an affine map x(T) = M x0 + b, where b is the state after one period from the ambient and M is the propagator of one period without power.
+The settled cycle satisfies x0 = M x0 + b, i.e. (I - M) x0 = b, which is solved with GMRES: every product by M is one period of solves with the cached step factorizations.
+GMRES is preconditioned with I + G^-1 C / T (T: period), an approximation of (I - M)^-1 that is exact for the slowest and fastest thermal modes, so it converges in a few iterations."""
+
+import numpy as np
+import scipy.sparse.linalg
+
+from src import globalVar
+from src import instrument
+from src import nub_ctm as ctm
+
+"""Function that propagates a temperature vector over one period of stepDefinition. IVectorVector gives the I vector of each phase (a sequence or a function of the phase, see iterBeuler),
+or is None to propagate without power. Returns the temperature vector at the end of the period."""
+def propagate_period(GMatrix, CMatrix, IVectorVector, tempVector, stepDefinition):
+    zeroVector = np.zeros(len(tempVector))
+    for i in range(len(stepDefinition)):
+        if IVectorVector is None:
+            IVector = zeroVector
+        else:
+            IVector = IVectorVector(i) if callable(IVectorVector) else IVectorVector[i]
+        for j in range(stepDefinition[i]["steps"]):
+            tempVector = ctm.bEuler(stepDefinition[i]["steps"], stepDefinition[i]["duration"], GMatrix, CMatrix, IVector, tempVector)
+    return tempVector
+
+"""Function that solves the initial temperature vector (relative to the ambient) of the periodic steady state of stepDefinition, one cycle of the workload.
+tolerance: relative tolerance of GMRES on (I - M) x0 = b
+Returns the initial temperature vector and a dictionary with the number of GMRES iterations, the number of periods propagated and
+the residual: largest difference (K) between the temperatures at the start and at the end of the settled cycle."""
+def solve_periodic_steady_state(GMatrix, CMatrix, IVectorVector, stepDefinition, tolerance=1e-10, maxIterations=200):
+    cache = ctm.get_factorization_cache(GMatrix, CMatrix)
+    nodeCount = cache["G"].shape[0]
+    period = sum(phase["duration"] for phase in stepDefinition)
+    steadyFactorization = ctm.get_steady_state_factorization(GMatrix, CMatrix)
+    info = {"iterations": 0, "periods": 0}
+
+    def one_minus_M(vector):
+        info["periods"] += 1
+        return vector - propagate_period(GMatrix, CMatrix, None, vector, stepDefinition)
+
+    def preconditioner(vector):
+        return vector + steadyFactorization.solve(cache["C"].dot(vector)) / period
+
+    def count_iteration(residual):
+        info["iterations"] += 1
+
+    with instrument.span("periodic_steady_state"):
+        b = propagate_period(GMatrix, CMatrix, IVectorVector, np.zeros(nodeCount), stepDefinition)
+        info["periods"] += 1
+        operator = scipy.sparse.linalg.LinearOperator((nodeCount, nodeCount), matvec=one_minus_M, dtype=float)
+        initialGuess = preconditioner(b)
+        x0, status = scipy.sparse.linalg.gmres(operator, b, x0=initialGuess, rtol=tolerance, atol=0, maxiter=maxIterations,
+                                               M=scipy.sparse.linalg.LinearOperator((nodeCount, nodeCount), matvec=preconditioner, dtype=float),
+                                               callback=count_iteration, callback_type="pr_norm")
+        endVector = propagate_period(GMatrix, CMatrix, IVectorVector, x0, stepDefinition)
+        info["periods"] += 1
+    if status != 0:
+        print("WARNING: periodic steady state did not converge in " + str(maxIterations) + " iterations")
+    info["residual"] = float(np.max(np.abs(endVector - x0)))
+    info["converged"] = status == 0
+    instrument.set_counter("periodicIterations", info["iterations"])
+    instrument.set_counter("periodicPeriods", info["periods"])
+    return x0, info
+
+"""Function that solves the periodic steady state of the prepared model over one cycle stepDefinition (power traces must have one value per phase of the cycle).
+Returns the initial temperature vector of the settled cycle (relative to the ambient) and the solver information (see solve_periodic_steady_state)."""
+def find_periodic_steady_state(stepDefinition, tolerance=1e-10):
+    IVectorSource = ctm.make_I_vector_source(globalVar.nodes, globalVar.model, len(stepDefinition))
+    return solve_periodic_steady_state(globalVar.GMatrix, globalVar.CMatrix, IVectorSource, stepDefinition, tolerance)
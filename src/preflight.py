@@ -0,0 +1,335 @@
+"""Preflight resource estimation: counts and cost estimates of a run, computed from the block model before anything is built.
+
+The subblocks, nodes and nonzeros of G are counted block by block from the resolutions (no flattening, no node or matrix is built):
+every subblock has a center node, a side ground node on every side where it touches the edge of its chiplet, and a top or bottom ground node where it is not entirely covered
+by the layer above or below (estimated per block from its covered area: subblocks crossing the edge of the covered area are counted as uncovered); couplings are the lateral
+neighbours inside a block, the subblock pairs along the shared edge of adjacent blocks of a chiplet and the superposed subblock pairs of blocks of adjacent layers.
+From these counts, the memory (bytes) and time (s) of every path of the simulator are estimated:
+assembly "stamps" (sparse assembly of src/instancing.py, the path of prepareModel for every model),
+solver "direct" (sparse LU, fill-in growing as N^(4/3) as measured on stacks of layers) or "domain-decomposition" (src/domainDecomposition.py: interface of the package chiplets),
+transient "serial" (one factorization per timestep, all kept in the factorization cache, and one solve per substep) or "parareal" (src/parareal.py: factorizations on every worker,
+all substeps held in memory). The time constants are rough (one core of a recent x86 machine): estimates are meant to spot runs that are orders of magnitude too large.
+The run is checked against a memory limit (MB, default is the available system memory) and a time limit (s, default is no limit) with an action:
+"plan" prints the plan, "refuse" raises an exception if the chosen paths exceed a limit, "downgrade" switches to the cheapest paths that fit, then halves the largest
+block resolutions until the run fits (and raises an exception if it does not fit at [1,1])."""
+
+from copy import deepcopy
+import math
+import os
+
+from src import domainDecomposition
+from src import globalVar
+
+ACTIONS = ("off", "plan", "refuse", "downgrade")
+
+# Rough cost constants of the paths (s per unit of work, bytes per entry)
+COSTS = {
+    "stampAssembly": 5e-8,          # Stamp assembly: per nonzero of G, to the power 1.5 (search of the superposed subblocks)
+    "sparseNonzero": 12,            # Sparse matrices and factors: value and index
+    "singleNonzero": 8,             # Factors in mixed precision (globalVar.precision): single precision value and index
+    "fillIn": 6,                    # Nonzeros of the LU factors per node^(4/3) (nested dissection of a stack of layers)
+    "factorNonzero": 7e-9,          # Sparse LU: per nonzero of the factors, times the square root of the mean nonzeros per column
+    "solveNonzero": 2e-9,           # Sparse triangular solves: per nonzero of the factors
+    "denseFlop": 5e-11,             # LU of the interface (estimated as dense): per floating point operation
+    "pararealIterations": 5,        # Typical Parareal iterations (see src/parareal.py)
+}
+
+"""Function that returns the available memory of the system (bytes), or None if it is not known."""
+def get_available_memory():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):  # Not available on this platform
+        return None
+
+"""Function that returns the number of subblocks of a block along a length (m) of it, in the direction of its resolution (resolution subblocks over size)."""
+def count_along(length, size, resolution):
+    return min(resolution, max(1, math.ceil(length / (size / resolution) - 1e-9)))
+
+"""Function that returns the overlap (length) of the intervals [start1, end1] and [start2, end2], 0 if they do not overlap."""
+def get_overlap(start1, end1, start2, end2):
+    return max(0.0, min(end1, end2) - max(start1, start2))
+
+"""Function that returns the bounding box (leftX, bottomY, rightX, topY) of a list of blocks."""
+def get_bounds(units):
+    return (min(unit["leftX"] for unit in units), min(unit["bottomY"] for unit in units),
+            max(unit["leftX"] + unit["width"] for unit in units), max(unit["bottomY"] + unit["height"] for unit in units))
+
+"""Function that returns the block-level design signature of a chiplet (geometry relative to its lower left corner, materials and resolutions), as in src/instancing.py."""
+def chiplet_signature(chiplet):
+    leftX, bottomY = get_bounds(chiplet)[:2]
+    return tuple((round(unit["leftX"] - leftX, 12) + 0.0, round(unit["bottomY"] - bottomY, 12) + 0.0, unit["width"], unit["height"], unit["thickness"], unit["conductivity"],
+                  unit["volumetricHeatCapacity"], tuple(unit["resolution"])) for unit in chiplet)
+
+"""Function that returns the vertical couplings between the blocks of two adjacent layers: (lower block, upper block, number of superposed subblock pairs, overlap area (m^2)),
+blocks as (chiplet, block) pairs. Chiplets whose bounding boxes do not overlap are skipped."""
+def get_vertical_couplings(lower, upper):
+    couplings = []
+    upperBounds = [get_bounds(chiplet) for chiplet in upper]
+    for iLower, lowerChiplet in enumerate(lower):
+        lowerBounds = get_bounds(lowerChiplet)
+        for iUpper, upperChiplet in enumerate(upper):
+            if get_overlap(lowerBounds[0], lowerBounds[2], upperBounds[iUpper][0], upperBounds[iUpper][2]) * get_overlap(lowerBounds[1], lowerBounds[3], upperBounds[iUpper][1], upperBounds[iUpper][3]) <= 0:
+                continue
+            for a, unit1 in enumerate(lowerChiplet):
+                for b, unit2 in enumerate(upperChiplet):
+                    width = get_overlap(unit1["leftX"], unit1["leftX"] + unit1["width"], unit2["leftX"], unit2["leftX"] + unit2["width"])
+                    height = get_overlap(unit1["bottomY"], unit1["bottomY"] + unit1["height"], unit2["bottomY"], unit2["bottomY"] + unit2["height"])
+                    if width * height <= 1e-9 * min(unit1["width"] * unit1["height"], unit2["width"] * unit2["height"]):
+                        continue
+                    columns = count_along(width, unit1["width"], unit1["resolution"][0]) + count_along(width, unit2["width"], unit2["resolution"][0]) - 1
+                    rows = count_along(height, unit1["height"], unit1["resolution"][1]) + count_along(height, unit2["height"], unit2["resolution"][1]) - 1
+                    couplings.append(((iLower, a), (iUpper, b), columns * rows, width * height))
+    return couplings
+
+"""Function that returns the number of subblocks of a block with a top or bottom ground node, given the area of the block covered by the adjacent layer."""
+def count_uncovered(unit, coveredArea):
+    subblocks = unit["resolution"][0] * unit["resolution"][1]
+    uncovered = 1 - coveredArea / (unit["width"] * unit["height"])
+    if uncovered <= 1e-9:
+        return 0
+    return min(subblocks, math.ceil(uncovered * subblocks) + unit["resolution"][0] + unit["resolution"][1])   # Plus the subblocks crossing the edge of the covered area
+
+"""Function that counts the subblocks, nodes and couplings of a block model (see the description of this module), per layer and in total.
+Returns a dictionary with the totals ("subblocks", "centerNodes", "groundNodes", "nodes", "couplings", "GNonzeros", "CNonzeros"), the per-layer counts ("layers"),
+the number of chiplets and of chiplet designs, and the nodes of the package chiplets ("interfaceNodes", the interface of the domain decomposition solver)."""
+def count_model(blockModel):
+    layers = [{"subblocks": 0, "groundNodes": 0, "couplings": 0} for _ in blockModel]
+    coveredBelow = [[[0.0] * len(chiplet) for chiplet in layer] for layer in blockModel]
+    coveredAbove = [[[0.0] * len(chiplet) for chiplet in layer] for layer in blockModel]
+    neighbours = {(iLayer, iChiplet): set() for iLayer, layer in enumerate(blockModel) for iChiplet in range(len(layer))}
+    for iLayer in range(len(blockModel) - 1):
+        for (iLower, a), (iUpper, b), pairs, area in get_vertical_couplings(blockModel[iLayer], blockModel[iLayer + 1]):
+            neighbours[(iLayer, iLower)].add((iLayer + 1, iUpper))
+            neighbours[(iLayer + 1, iUpper)].add((iLayer, iLower))
+            coveredAbove[iLayer][iLower][a] += area
+            coveredBelow[iLayer + 1][iUpper][b] += area
+            layers[iLayer]["couplings"] += pairs
+    package = domainDecomposition.get_package_groups(neighbours)
+    signatures = set()
+    chiplets = 0
+    interfaceNodes = 0
+    for iLayer, layer in enumerate(blockModel):
+        counts = layers[iLayer]
+        for iChiplet, chiplet in enumerate(layer):
+            chiplets += 1
+            signatures.add(chiplet_signature(chiplet))
+            leftX, bottomY, rightX, topY = get_bounds(chiplet)
+            nodesBefore = counts["subblocks"] + counts["groundNodes"]
+            for a, unit in enumerate(chiplet):
+                X, Y = unit["resolution"]
+                counts["subblocks"] += X * Y
+                counts["couplings"] += (X - 1) * Y + X * (Y - 1)   # Lateral neighbours inside the block
+                counts["groundNodes"] += Y * (math.isclose(unit["leftX"], leftX) + math.isclose(unit["leftX"] + unit["width"], rightX))
+                counts["groundNodes"] += X * (math.isclose(unit["bottomY"], bottomY) + math.isclose(unit["bottomY"] + unit["height"], topY))
+                counts["groundNodes"] += X * Y if iLayer == 0 else count_uncovered(unit, coveredBelow[iLayer][iChiplet][a])
+                counts["groundNodes"] += X * Y if iLayer == len(blockModel) - 1 else count_uncovered(unit, coveredAbove[iLayer][iChiplet][a])
+                for unit2 in chiplet[a+1:]:     # Subblock pairs along the shared edge of adjacent blocks
+                    if math.isclose(unit["leftX"] + unit["width"], unit2["leftX"]) or math.isclose(unit2["leftX"] + unit2["width"], unit["leftX"]):
+                        length = get_overlap(unit["bottomY"], unit["bottomY"] + unit["height"], unit2["bottomY"], unit2["bottomY"] + unit2["height"])
+                        if length > 0:
+                            counts["couplings"] += count_along(length, unit["height"], Y) + count_along(length, unit2["height"], unit2["resolution"][1]) - 1
+                    elif math.isclose(unit["bottomY"] + unit["height"], unit2["bottomY"]) or math.isclose(unit2["bottomY"] + unit2["height"], unit["bottomY"]):
+                        length = get_overlap(unit["leftX"], unit["leftX"] + unit["width"], unit2["leftX"], unit2["leftX"] + unit2["width"])
+                        if length > 0:
+                            counts["couplings"] += count_along(length, unit["width"], X) + count_along(length, unit2["width"], unit2["resolution"][0]) - 1
+            if (iLayer, iChiplet) in package:
+                interfaceNodes += counts["subblocks"] + counts["groundNodes"] - nodesBefore
+        counts["nodes"] = counts["subblocks"] + counts["groundNodes"]
+        counts["couplings"] += counts["groundNodes"]    # Every ground node is coupled to its center node
+    totals = {key: sum(counts[key] for counts in layers) for key in ("subblocks", "groundNodes", "nodes", "couplings")}
+    totals["centerNodes"] = totals["subblocks"]
+    totals["GNonzeros"] = totals["nodes"] + 2 * totals["couplings"]
+    totals["CNonzeros"] = totals["centerNodes"]
+    return dict(totals, layers=layers, chiplets=chiplets, designs=len(signatures), interfaceNodes=interfaceNodes)
+
+"""Function that returns the estimated memory (bytes) and time (s) of a sparse LU factorization of a matrix of the model (direct solver), with its number of nonzeros."""
+def estimate_direct_factorization(counts):
+    factorNonzeros = max(counts["GNonzeros"], COSTS["fillIn"] * counts["nodes"]**(4/3))
+    return {"factorNonzeros": factorNonzeros, "memory": factorNonzeros * COSTS["singleNonzero" if globalVar.precision == "mixed" else "sparseNonzero"],
+            "time": COSTS["factorNonzero"] * factorNonzeros * math.sqrt(factorNonzeros / counts["nodes"])}
+
+"""Function that returns the estimated memory (bytes) and time (s) of a domain decomposition factorization (see src/domainDecomposition.py), with its number of interface nodes:
+the nodes of the package chiplets (see count_model). The interior factorizations are estimated as one direct factorization, the interface system as dense (an upper bound of its sparse LU)."""
+def estimate_domain_decomposition(counts):
+    layerNodes = [layer["subblocks"] for layer in counts["layers"]]
+    interface = counts["interfaceNodes"]
+    interiors = dict(counts, nodes=counts["nodes"] - interface, centerNodes=counts["centerNodes"] - interface, GNonzeros=max(counts["nodes"], counts["GNonzeros"] - 4 * interface))
+    direct = estimate_direct_factorization(interiors)
+    return {"interfaceNodes": interface, "factorNonzeros": direct["factorNonzeros"] + interface**2,
+            "memory": direct["memory"] + 2 * (4 if globalVar.precision == "mixed" else 8) * interface**2,     # Interface system and its LU
+            "time": direct["time"] + COSTS["denseFlop"] * (2 / 3 * interface**3 + 2 * interface**2 * counts["nodes"] / max(1, len(layerNodes)))}
+
+"""Function that returns the number of substeps and the number of distinct timesteps of a step definition."""
+def count_steps(stepDefinition):
+    return sum(phase["steps"] for phase in stepDefinition), len({phase["duration"] / phase["steps"] for phase in stepDefinition})
+
+"""Function that estimates every path of a run from the counts of its model (see count_model) and optionally its step definition (list of phases, for the transient paths).
+Returns the estimates ({"memory", "time"} and details) of the assembly path ("assembly": {"stamps"}), the solvers ("solver": {"direct", "domain-decomposition"}: steady state)
+and the transient paths ("transient": {"serial", "parareal"} per solver, only with a step definition)."""
+def estimate_paths(counts, stepDefinition=None, workers=None):
+    sparseMatrices = (counts["GNonzeros"] + counts["CNonzeros"]) * COSTS["sparseNonzero"]
+    paths = {"assembly": {"stamps": {"memory": 3 * sparseMatrices, "time": COSTS["stampAssembly"] * counts["GNonzeros"]**1.5}}}
+    factorizations = {"direct": estimate_direct_factorization(counts), "domain-decomposition": estimate_domain_decomposition(counts)}
+    paths["solver"] = {solver: dict(factorization, memory=sparseMatrices + factorization["memory"], time=factorization["time"] + COSTS["solveNonzero"] * factorization["factorNonzeros"])
+                       for solver, factorization in factorizations.items()}
+    if stepDefinition is not None:
+        substeps, timesteps = count_steps(stepDefinition)
+        workers = workers or globalVar.pararealWorkers or os.cpu_count() or 1
+        paths["transient"] = {}
+        for solver, factorization in factorizations.items():
+            serial = {"substeps": substeps, "timesteps": timesteps, "memory": sparseMatrices + timesteps * factorization["memory"],     # Every factorization stays in the cache
+                      "time": timesteps * factorization["time"] + substeps * COSTS["solveNonzero"] * factorization["factorNonzeros"]}
+            slices = min(workers, max(1, substeps))
+            parareal = {"substeps": substeps, "timesteps": timesteps, "workers": workers,
+                        "memory": serial["memory"] + slices * (sparseMatrices + min(timesteps, math.ceil(timesteps / slices) + 1) * factorization["memory"]),     # The trajectories go through temporary files
+                        "time": (COSTS["pararealIterations"] + 1) * serial["time"] / min(workers, os.cpu_count() or 1)}     # Bounded by the number of cores
+            paths["transient"][solver] = {"serial": serial, "parareal": parareal}
+    return paths
+
+"""Function that returns the memory (bytes) and time (s) of a run taking the given paths (assembly, solver, transient or None for no transient)."""
+def get_run_cost(paths, assembly, solver, transient=None):
+    steps = [paths["solver"][solver]] + ([paths["transient"][solver][transient]] if transient is not None else [])
+    return {"memory": max([paths["assembly"][assembly]["memory"]] + [step["memory"] for step in steps]), "time": paths["assembly"][assembly]["time"] + sum(step["time"] for step in steps)}
+
+"""Function that returns the memory (bytes) and time (s) of the transient of a prepared model taking the given paths (the assembly is done)."""
+def get_transient_cost(paths, assembly, solver, transient):
+    return {"memory": paths["transient"][solver][transient]["memory"], "time": paths["transient"][solver][transient]["time"]}
+
+"""Function that returns True if a run cost is within the memory limit (bytes) and the time limit (s), None being no limit."""
+def fits(cost, memoryLimit, timeLimit):
+    return (memoryLimit is None or cost["memory"] <= memoryLimit) and (timeLimit is None or cost["time"] <= timeLimit)
+
+"""Function that returns the preflight plan of a block model: its counts, the estimates of every path, the paths the run takes (assembly, solver, transient)
+and their memory and time. assembly: "stamps" (the path prepareModel takes); transient: "serial", "parareal" or None (no transient estimate
+without a step definition)."""
+def plan_run(blockModel, assembly, solver=None, transient=None, stepDefinition=None, workers=None):
+    counts = count_model(blockModel)
+    paths = estimate_paths(counts, stepDefinition, workers)
+    solver = solver or globalVar.solver
+    return {"counts": counts, "paths": paths, "assembly": assembly, "solver": solver, "transient": transient if stepDefinition is not None else None,
+            "cost": get_run_cost(paths, assembly, solver, transient if stepDefinition is not None else None)}
+
+"""Function that prints the estimate of a path (memory and time), marked with * if the run takes it."""
+def print_path(name, estimate, chosen):
+    print(("* " if chosen else "  ") + name.ljust(44) + format(estimate["memory"] / 2**20, ".1f").rjust(12) + " MB" + format(estimate["time"], ".3g").rjust(12) + " s")
+
+"""Function that prints the transient paths of a plan."""
+def print_transient_paths(plan):
+    for solver, transients in plan["paths"].get("transient", {}).items():
+        for name, estimate in transients.items():
+            print_path("transient " + name + " (" + solver + ")", estimate, solver == plan["solver"] and name == plan["transient"])
+
+"""Function that prints a preflight plan: the counts of the model, the estimates of every path (the chosen ones marked with *) and the cost of the run."""
+def print_plan(plan):
+    counts = plan["counts"]
+    print("Preflight: " + str(counts["subblocks"]) + " subblocks, " + str(counts["nodes"]) + " nodes (" + str(counts["groundNodes"]) + " ground), "
+          + str(counts["GNonzeros"]) + " nonzeros in G, " + str(counts["chiplets"]) + " chiplets (" + str(counts["designs"]) + " designs)")
+    for iLayer, layer in enumerate(counts["layers"]):
+        print("  layer " + str(iLayer) + ": " + str(layer["subblocks"]) + " subblocks, " + str(layer["nodes"]) + " nodes")
+    for name, estimate in plan["paths"]["assembly"].items():
+        print_path("assembly " + name, estimate, name == plan["assembly"])
+    for name, estimate in plan["paths"]["solver"].items():
+        print_path("steady state " + name, estimate, name == plan["solver"])
+    print_transient_paths(plan)
+    print("Preflight: run estimated at " + format(plan["cost"]["memory"] / 2**20, ".1f") + " MB and " + format(plan["cost"]["time"], ".3g") + " s")
+
+"""Function that returns a copy of the block model with the largest resolutions halved (the blocks with the most subblocks), or None if every block is at [1,1]."""
+def coarsen_model(blockModel):
+    largest = max(unit["resolution"][0] * unit["resolution"][1] for layer in blockModel for chiplet in layer for unit in chiplet)
+    if largest == 1:
+        return None
+    blockModel = deepcopy(blockModel)
+    for layer in blockModel:
+        for chiplet in layer:
+            for unit in chiplet:
+                if unit["resolution"][0] * unit["resolution"][1] == largest:
+                    unit["resolution"] = [max(1, unit["resolution"][0] // 2), max(1, unit["resolution"][1] // 2)]
+    return blockModel
+
+"""Function that returns the cheapest run (lowest time, then memory) among candidate paths ((assembly, solver, transient) tuples) that fits the limits, or None.
+getCost gives the cost of a candidate (get_run_cost or get_transient_cost)."""
+def choose_paths(paths, candidates, memoryLimit, timeLimit, getCost=get_run_cost):
+    costs = [getCost(paths, *candidate) for candidate in candidates]
+    fitting = [i for i in range(len(candidates)) if fits(costs[i], memoryLimit, timeLimit)]
+    if not fitting:
+        return None
+    best = min(fitting, key=lambda i: (costs[i]["time"], costs[i]["memory"]))
+    return {"assembly": candidates[best][0], "solver": candidates[best][1], "transient": candidates[best][2], "cost": costs[best]}
+
+"""Function that returns the text of the limits (memory in bytes, time in s) for messages."""
+def format_limits(memoryLimit, timeLimit):
+    return ", ".join(([format(memoryLimit / 2**20, ".1f") + " MB"] if memoryLimit is not None else []) + ([str(timeLimit) + " s"] if timeLimit is not None else []))
+
+"""Function that applies an action to a plan over the limits: prints a warning ("plan") or raises an exception ("refuse")."""
+def report_over_limits(plan, action, memoryLimit, timeLimit):
+    message = ("the run is estimated at " + format(plan["cost"]["memory"] / 2**20, ".1f") + " MB and " + format(plan["cost"]["time"], ".3g") + " s, over the limits ("
+               + format_limits(memoryLimit, timeLimit) + ")")
+    if action == "refuse":
+        raise Exception("Preflight: " + message + ". Lower the resolutions or use preflight=downgrade")
+    print("WARNING: " + message)
+
+"""Function that checks the preparation and steady state of a block model against the limits (memory in bytes, default is the available system memory; time in s,
+default is no limit) with an action ("plan", "refuse" or "downgrade", see the description of this module), for the assembly path prepareModel takes (stamps).
+Returns the plan of the run to do, with its block model ("model", coarsened by a downgrade)."""
+def check_run(blockModel, action, memoryLimit=None, timeLimit=None):
+    if action not in ACTIONS[1:]:
+        raise ValueError("Unknown preflight action: " + str(action) + ". Valid actions are: " + ", ".join(ACTIONS[1:]))
+    if memoryLimit is None:
+        memoryLimit = get_available_memory()
+    plan = dict(plan_run(blockModel, "stamps"), model=blockModel)
+    print_plan(plan)
+    if fits(plan["cost"], memoryLimit, timeLimit):
+        return plan
+    if action != "downgrade":
+        report_over_limits(plan, action, memoryLimit, timeLimit)
+        return plan
+    while blockModel is not None:   # Cheapest paths first, then lower resolutions
+        counts = count_model(blockModel)
+        paths = estimate_paths(counts)
+        chosen = choose_paths(paths, [("stamps", solver, None) for solver in paths["solver"]], memoryLimit, timeLimit)
+        if chosen is not None:
+            plan = dict(chosen, counts=counts, paths=paths, model=blockModel)
+            print("WARNING: preflight downgraded the run to " + plan["assembly"] + " assembly, " + plan["solver"] + " solver and " + str(counts["subblocks"]) + " subblocks ("
+                  + format(plan["cost"]["memory"] / 2**20, ".1f") + " MB, " + format(plan["cost"]["time"], ".3g") + " s)")
+            return plan
+        blockModel = coarsen_model(blockModel)
+    raise Exception("Preflight: the run does not fit the limits (" + format_limits(memoryLimit, timeLimit) + ") even with every block at [1,1]")
+
+"""Function that checks a transient run of a prepared model (plan of check_run) against the limits with an action (see check_run). transient: "serial" or "parareal".
+A downgrade switches the solver or from Parareal to serial integration (the model is already prepared: its resolution cannot change). Returns the plan of the transient run."""
+def check_transient(plan, stepDefinition, transient, action, memoryLimit=None, timeLimit=None):
+    if memoryLimit is None:
+        memoryLimit = get_available_memory()
+    paths = estimate_paths(plan["counts"], stepDefinition)
+    transientPlan = dict(plan, paths=paths, transient=transient, cost=get_transient_cost(paths, plan["assembly"], plan["solver"], transient))
+    print_transient_paths(transientPlan)
+    if fits(transientPlan["cost"], memoryLimit, timeLimit):
+        return transientPlan
+    if action != "downgrade":
+        report_over_limits(transientPlan, action, memoryLimit, timeLimit)
+        return transientPlan
+    chosen = choose_paths(paths, [(plan["assembly"], solver, name) for solver in paths["solver"] for name in dict.fromkeys([transient, "serial"])], memoryLimit, timeLimit, get_transient_cost)
+    if chosen is None:
+        raise Exception("Preflight: the transient run does not fit the limits (" + format_limits(memoryLimit, timeLimit) + "). Lower the resolutions or the number of timesteps")
+    print("WARNING: preflight downgraded the transient run to " + chosen["transient"] + " integration with the " + chosen["solver"] + " solver ("
+          + format(chosen["cost"]["memory"] / 2**20, ".1f") + " MB, " + format(chosen["cost"]["time"], ".3g") + " s)")
+    return dict(transientPlan, **chosen)
+
+
+if __name__ == "__main__":
+    import argparse
+    import importlib
+
+    from src import modelFile
+
+    parser = argparse.ArgumentParser(description="Preflight plan of an ARTSim model: counts, memory and time of every path, without building the model")
+    parser.add_argument("model", help="name of a model module of the models directory (e.g. example_model) or model file (.json, .toml or .npz)")
+    parser.add_argument("--memory", type=float, default=None, help="memory limit (MB), default is the available system memory")
+    parser.add_argument("--time", type=float, default=None, help="time limit (s)")
+    args = parser.parse_args()
+
+    if os.path.splitext(args.model)[1] in (".json", ".toml", ".npz"):
+        blockModel = modelFile.load_model(args.model)
+    else:
+        blockModel = importlib.import_module("models." + args.model).model
+    check_run(blockModel, "plan", args.memory * 2**20 if args.memory is not None else None, args.time)
@@ -0,0 +1,142 @@
+"""Resolution convergence study: speed/accuracy trade-off of the block resolutions of a model.
+
+The model is solved (steady state) at increasing resolutions (levels, e.g. 1, 2, 4, 8, 16: every block of a layer gets a [level, level] resolution):
+globally (mode "global": all layers at the same level) or per layer (mode "layer": one layer at each level, the other layers at the finest level).
+For each run, the number of nodes, the assembly and solve times (s), the memory of G and of its LU factorization (bytes) and the largest change (K) of the block temperatures
+(mean and max of every block) relative to the run with all layers at the finest level are reported.
+The recommended resolution of a layer is the cheapest level whose change is within the tolerance: in mode "layer", the change of the whole model when only that layer is coarsened,
+in mode "global", the change of the blocks of that layer. The recommended resolutions are then solved together, since the errors of coarse layers add up.
+Runs are reused when a configuration comes back (the finest run is the reference of every layer) and chiplet stamps are shared by all runs (see src/instancing.py),
+so that the chiplets of the layers that do not change are not assembled again."""
+
+import time
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from src import adaptiveMesh
+from src import blockStats
+from src import instrument
+
+MODES = ("global", "layer")
+
+"""Function that returns the resolutions ({(layer, chiplet, block): [X, Y]}, see set_block_resolutions) giving every block of layer i a [layerLevels[i], layerLevels[i]] resolution."""
+def get_layer_resolutions(blockModel, layerLevels):
+    return {(iLayer, iChiplet, iUnit): [layerLevels[iLayer], layerLevels[iLayer]] for iLayer, layer in enumerate(blockModel) for iChiplet, chiplet in enumerate(layer) for iUnit in range(len(chiplet))}
+
+"""Function that solves the steady state of a block model with the given level of every layer. stampCache is shared by the runs (see assemble_model).
+Returns the number of nodes, the assembly and solve times (s), the memory of G and of its LU factorization (bytes), and the mean and max temperature of every block (relative to the ambient)."""
+def run_level(blockModel, layerLevels, stampCache):
+    model = adaptiveMesh.set_block_resolutions(blockModel, get_layer_resolutions(blockModel, layerLevels))
+    with instrument.span("study_assembly") as assembly:
+        geometry = adaptiveMesh.assemble_geometry(model, stampCache)
+    with instrument.span("study_solve") as solve:
+        factor = scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(geometry["G"]))
+        tempVector = factor.solve(geometry["I"])
+    GMatrix = geometry["G"]
+    statistics = blockStats.compute_statistics(tempVector, ("mean", "max"), ("block",), geometry["centerMap"])["block"]
+    return {
+        "levels": list(layerLevels),
+        "nodes": GMatrix.shape[0],
+        "assemblyTime": assembly["duration"],
+        "solveTime": solve["duration"],
+        "memory": GMatrix.data.nbytes + GMatrix.indices.nbytes + GMatrix.indptr.nbytes + factor.nnz * (GMatrix.data.itemsize + GMatrix.indices.itemsize),
+        "blocks": [tuple(int(index) for index in key) for key in statistics["keys"]],
+        "mean": statistics["mean"],
+        "max": statistics["max"]
+    }
+
+"""Function that returns the largest change (K) of the block temperatures (mean and max) of a run relative to the reference run, over all blocks and over the blocks of every layer."""
+def get_changes(run, reference, layerCount):
+    change = np.maximum(np.abs(run["mean"] - reference["mean"]), np.abs(run["max"] - reference["max"]))
+    layerOfBlock = np.array([block[0] for block in reference["blocks"]])
+    layerChanges = [float(np.max(change[layerOfBlock == iLayer])) if np.any(layerOfBlock == iLayer) else 0.0 for iLayer in range(layerCount)]
+    return float(np.max(change)), layerChanges
+
+"""Function that runs the resolution study of a block model (see the description of this module).
+levels: increasing resolutions to try, the last one is the reference; mode: "global" or "layer"; tolerance: largest accepted change (K) of the block temperatures.
+Returns a dictionary with the runs (in the order they were solved), the recommended level of every layer and the run of the recommended levels ("check")."""
+def study_resolution(blockModel, levels=(1, 2, 4, 8, 16), mode="layer", tolerance=0.5):
+    if mode not in MODES:
+        raise ValueError("Unknown study mode: " + str(mode) + ". Valid modes are: " + ", ".join(MODES))
+    levels = sorted(set(int(level) for level in levels))
+    if not levels or levels[0] < 1:
+        raise ValueError("Study levels must be positive integers, got " + str(levels))
+    layerCount = len(blockModel)
+    stampCache = {}
+    finest = (levels[-1],) * layerCount
+    print("Resolution study: levels " + str(list(finest)) + " (reference)...")
+    reference = run_level(blockModel, finest, stampCache)
+    reference["change"], reference["layerChanges"] = 0.0, [0.0] * layerCount
+    runs = {finest: reference}
+
+    def get_run(layerLevels):
+        if layerLevels not in runs:
+            print("Resolution study: levels " + str(list(layerLevels)) + "...")
+            runs[layerLevels] = run_level(blockModel, layerLevels, stampCache)
+            runs[layerLevels]["change"], runs[layerLevels]["layerChanges"] = get_changes(runs[layerLevels], reference, layerCount)
+        return runs[layerLevels]
+
+    recommended = []
+    if mode == "global":
+        for level in levels:
+            get_run((level,) * layerCount)
+        for iLayer in range(layerCount):
+            recommended.append(next(level for level in levels if runs[(level,) * layerCount]["layerChanges"][iLayer] <= tolerance))
+    else:
+        for iLayer in range(layerCount):
+            for level in levels:
+                get_run(finest[:iLayer] + (level,) + finest[iLayer+1:])
+            recommended.append(next(level for level in levels if runs[finest[:iLayer] + (level,) + finest[iLayer+1:]]["change"] <= tolerance))
+    check = get_run(tuple(recommended))
+    if check["change"] > tolerance:
+        print("WARNING: the recommended resolutions change the block temperatures by " + format(check["change"], ".4g") + " K together (tolerance " + str(tolerance) + " K)")
+    instrument.set_counter("studyRuns", len(runs))
+    return {"mode": mode, "levels": levels, "tolerance": tolerance, "runs": list(runs.values()), "recommended": recommended, "check": check}
+
+"""Function that prints the runs and the recommended resolutions of a resolution study."""
+def print_study(study):
+    print("levels".ljust(24) + "nodes".rjust(9) + "assembly (s)".rjust(14) + "solve (s)".rjust(11) + "memory (MB)".rjust(13) + "change (K)".rjust(12))
+    for run in study["runs"]:
+        print(str(run["levels"]).ljust(24) + str(run["nodes"]).rjust(9) + format(run["assemblyTime"], ".4f").rjust(14) + format(run["solveTime"], ".4f").rjust(11)
+              + format(run["memory"]/2**20, ".2f").rjust(13) + format(run["change"], ".4f").rjust(12))
+    for iLayer, level in enumerate(study["recommended"]):
+        print("Layer " + str(iLayer) + ": recommended resolution [" + str(level) + "," + str(level) + "]")
+    check = study["check"]
+    print("Recommended resolutions: " + str(check["nodes"]) + " nodes, change " + format(check["change"], ".4f") + " K (finest: " + str(study["runs"][0]["nodes"]) + " nodes)")
+
+"""Function that converts a resolution study to a JSON-serializable dictionary (block temperatures are left out)."""
+def study_to_dict(study):
+    def run_to_dict(run):
+        return {key: value for key, value in run.items() if key not in ("blocks", "mean", "max")}
+    return dict(study, runs=[run_to_dict(run) for run in study["runs"]], check=run_to_dict(study["check"]))
+
+
+if __name__ == "__main__":
+    import argparse
+    import importlib
+    import json
+    import os
+
+    from src import modelFile
+
+    parser = argparse.ArgumentParser(description="Resolution convergence study of an ARTSim model")
+    parser.add_argument("model", help="name of a model module of the models directory (e.g. example_model) or model file (.json, .toml or .npz)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="resolutions to try, the largest is the reference")
+    parser.add_argument("--mode", choices=MODES, default="layer")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="largest accepted change of the block temperatures (K)")
+    parser.add_argument("--output", help="JSON file for the results")
+    args = parser.parse_args()
+
+    if os.path.splitext(args.model)[1] in (".json", ".toml", ".npz"):
+        blockModel = modelFile.load_model(args.model)
+    else:
+        blockModel = importlib.import_module("models." + args.model).model
+    studyStart = time.time()
+    study = study_resolution(blockModel, args.levels, args.mode, args.tolerance)
+    print_study(study)
+    print("Study ran in " + str(time.time() - studyStart) + " seconds")
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(study_to_dict(study), outfile, indent=1)
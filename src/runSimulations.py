@@ -1,35 +1,150 @@
-import time
+import os
+
+import numpy as np
+
+from src import adaptiveMesh
+from src import checkpoint
+from src import compactBoundary
+from src import fosterCauer
+from src import geometryCheck
 from src import globalVar
+from src import instancing
+from src import instrument
+from src import leakage as leakageSolver
 from src import nub_ctm as ctm
+from src import parareal
+from src import periodic as periodicSolver
+from src import preflight
+from src import schedule
+from src import transientOutput
+
+# Preflight check of a block model (see src/preflight.py) with the limits of globalVar: the plan is kept in globalVar.preflightPlan and its solver in globalVar.modelSolver.
+# Returns the block model to use (coarsened by a downgrade).
+def check_preflight(model):
+    globalVar.preflightPlan = preflight.check_run(model, globalVar.preflight, globalVar.preflightMemory * 2**20 if globalVar.preflightMemory is not None else None, globalVar.preflightTime)
+    globalVar.modelSolver = globalVar.preflightPlan["solver"]
+    return globalVar.preflightPlan["model"]
 
-def runSteadyState(logsFile):
+def prepareModel(model):
+
+    instrument.start_report()
+    if globalVar.validateGeometry != "off":     # Geometry checked before building anything: problems printed or raised (see src/geometryCheck.py)
+        with instrument.span("validate_geometry"):
+            geometryCheck.report_problems(geometryCheck.validate_model(model), globalVar.validateGeometry)
+    globalVar.preflightPlan = None
+    globalVar.modelSolver = None    # The configured globalVar.solver is kept: a downgraded solver only applies to the runs of this model
+    if globalVar.preflight != "off":    # Memory and time estimated before building anything, runs over the limits refused or downgraded (see src/preflight.py)
+        model = check_preflight(model)
+    checkedModel = model
+    globalVar.topBoundaryCoefficient = None
+    if globalVar.compactBoundary != "off":   # Passive layers at the top replaced by a compact model (see src/compactBoundary.py)
+        model, globalVar.topBoundaryCoefficient = compactBoundary.compact_top_layers(model, globalVar.compactBoundary, globalVar.heatTransferCoefficient, globalVar.compactLayers)
+    if globalVar.adaptiveResolution:    # Block resolutions chosen by adaptive refinement (see src/adaptiveMesh.py)
+        model = adaptiveMesh.adapt_resolution(model, globalVar.adaptiveTolerance)
+    if globalVar.preflight != "off" and model is not checkedModel:   # The model to assemble (compacted, refined up to [16,16]) checked again
+        print("Preflight: checking the final model")
+        model = check_preflight(model)
+    with instrument.span("flatten_model"):
+        model = ctm.flatten_model(model)
+    designs = instancing.find_chiplet_designs(model)
+    print("Making nodes and chiplet stamps (" + str(designs["instances"]) + " chiplets, " + str(len(designs["designs"])) + " designs)...")
+    with instrument.span("assemble_instanced") as span:     # Sparse assembly with chiplet stamps, computed once per design (see src/instancing.py)
+        globalVar.nodes, globalVar.GMatrix, globalVar.CMatrix = instancing.assemble_model(model, designs)
+    nodes = globalVar.nodes
+    with instrument.span("assemble_I") as spanI:
+        ctm.populate_I_vector(nodes, model)
+    print("Model prepared! Step time: " + str(span["duration"] + spanI["duration"]))
+    instrument.set_counter("nodes", len(nodes))
+    globalVar.model = model
+    with instrument.span("make_center_map"):
+        globalVar.centerMap = ctm.make_center_map(nodes, model)
+    instrument.set_counter("centerNodes", len(globalVar.centerMap["centerNodes"]))
+    globalVar.factorCache = {}   # Factorizations of the previous model must not be reused
+
+    globalVar.modelPrepared = True
+
+
+# stateFile: if given (default is globalVar.steadyStateFile), the steady state is saved there, to start transient simulations from it (see src/checkpoint.py)
+# leakage: optional function giving the leakage power (W) of every block from the block temperatures (K), solved with leakageMethod ("fixed-point" or "newton", see src/leakage.py).
+# The leakage diagnostics are printed, added to the run report and returned.
+def runSteadyState(logsFile, stateFile=None, leakage=None, leakageMethod="fixed-point"):
 
     if not globalVar.modelPrepared:
         raise Exception("Model not prepared. Please call prepareModel(model) before running the simulation")
 
+    if stateFile is None:
+        stateFile = globalVar.steadyStateFile
+
     nodes = globalVar.nodes
     model = globalVar.model
     
     print("Solving steady state...")
-    stepStart = time.time()
+    diagnostics = None
+    with instrument.span("steady_state") as span:
+        if leakage is None:
+            ssTempVector = ctm.solve_steady_state()
+        else:
+            ssTempVector, diagnostics = leakageSolver.solve_steady_state_with_leakage(leakage, leakageMethod)
+            print("Leakage: " + str(diagnostics["iterations"]) + " iterations, " + ("converged" if diagnostics["converged"] else "NOT converged") + ", leakage power " + str(diagnostics["leakagePower"]) + " W")
+            instrument.set_counter("leakage", diagnostics)
+        if stateFile is not None:
+            checkpoint.save_state(stateFile, ssTempVector, "steady", solver={"method": "steady state", "factorization": ctm.get_solver(), "precision": globalVar.precision})
 
-    ssTempVector = ctm.solve_steady_state()
+        ssTempVector = [x + globalVar.baseTemp for x in ssTempVector]
 
-    ssTempVector = [x + globalVar.baseTemp for x in ssTempVector]
-
-    stepEnd = time.time()
-    print("Step time: " + str(stepEnd-stepStart))
-    ctm.printInfo(ssTempVector, nodes, model, logsFile)
+    print("Step time: " + str(span["duration"]))
+    with instrument.span("write_steady_state"):
+        ctm.printInfo(ssTempVector, nodes, model, logsFile)
+    instrument.write_report()
+    return diagnostics
     
 
 
 
 # NOTE: make sure to call prepareModel before running the simulation
-def runTransient(stepDefinition, logsFile):
+# outputMode: "full" (every subblock of every step), "probes" (only the probe blocks) or "summary" (per-step chiplet and layer aggregates), default is globalVar.transientOutput
+# probes: probe blocks as (layer, chiplet, block) tuples, default is globalVar.transientProbes
+# consumers: optional extra functions called after every step with (phase, substep, time, temperature vector relative to the ambient)
+# Each step is written as soon as it is computed and only the current state is kept in memory (see iterBeuler and src/transientOutput.py).
+# checkpointFile: if given (default is globalVar.checkpointFile), the state is saved there every checkpointEvery substeps (default is globalVar.checkpointEvery) and at the end of the run
+# resume: if True (default is globalVar.resumeTransient), the run resumes from checkpointFile and appends to the log. The step definition can be extended after the checkpoint.
+# initialState: if given (default is globalVar.initialStateFile), the run starts from this saved steady or transient state (file, or temperature vector relative to the ambient) instead of the ambient temperature
+# periodic: if True (default is globalVar.periodicTransient), stepDefinition is one cycle of a repeating workload: the run starts from the periodic steady state and outputs the settled cycle (see src/periodic.py)
+# stepDefinition can be "auto" (or globalVar.autoStepDefinition can be True) to use a log-spaced schedule derived from the thermal time constants of the model (see src/schedule.py)
+# tolerance: if given (default is globalVar.transientTolerance), a phase stops early once the temperatures change slower than tolerance (K/s, see iterBeuler),
+# onConverged: "stop" keeps the current state, "steady" jumps to the steady state of the phase (default is globalVar.convergedPhase)
+# leakage: optional function giving the leakage power (W) of every block from the block temperatures (K), solved at every substep with leakageMethod (see runSteadyState)
+# parallelInTime: if True (default is globalVar.parallelInTime), the substeps are integrated with Parareal on globalVar.pararealWorkers processes (see src/parareal.py)
+# With globalVar.preflight, the transient is checked against the preflight limits first, and a downgrade can switch the solver or turn Parareal off (see src/preflight.py)
+def runTransient(stepDefinition, logsFile, outputMode=None, probes=None, consumers=(), checkpointFile=None, checkpointEvery=None, resume=None, initialState=None, periodic=None, tolerance=None, onConverged=None, leakage=None, leakageMethod="fixed-point", parallelInTime=None):
 
     if not globalVar.modelPrepared:
         raise Exception("Model not prepared. Please call prepareModel(model) before running the simulation")
 
+    if outputMode is None:
+        outputMode = globalVar.transientOutput
+    if probes is None:
+        probes = globalVar.transientProbes
+    if checkpointFile is None:
+        checkpointFile = globalVar.checkpointFile
+    if checkpointEvery is None:
+        checkpointEvery = globalVar.checkpointEvery
+    if resume is None:
+        resume = globalVar.resumeTransient
+    if initialState is None:
+        initialState = globalVar.initialStateFile
+    if periodic is None:
+        periodic = globalVar.periodicTransient
+    if tolerance is None:
+        tolerance = globalVar.transientTolerance
+    if onConverged is None:
+        onConverged = globalVar.convergedPhase
+    if parallelInTime is None:
+        parallelInTime = globalVar.parallelInTime
+    if parallelInTime and (leakage is not None or tolerance is not None):
+        raise ValueError("Parallel-in-time integration needs a power independent of the temperature (no leakage) and all the substeps (no tolerance)")
+    if outputMode not in transientOutput.OUTPUT_MODES:
+        raise ValueError("Unknown transient output mode: " + str(outputMode) + ". Valid modes are: " + ", ".join(transientOutput.OUTPUT_MODES))
 
     nodes = globalVar.nodes
     model = globalVar.model
@@ -37,24 +152,108 @@ def runTransient(stepDefinition, logsFile):
     CMatrix = globalVar.CMatrix
 
 
+    if (isinstance(stepDefinition, str) and stepDefinition == "auto") or globalVar.autoStepDefinition:
+        stepDefinition = schedule.auto_step_definition(GMatrix, CMatrix)
+        print("Automatic step definition: " + str(stepDefinition))
+
+    if globalVar.preflightPlan is not None and not resume:
+        transientPlan = preflight.check_transient(globalVar.preflightPlan, stepDefinition, "parareal" if parallelInTime else "serial", globalVar.preflight,
+                                                  globalVar.preflightMemory * 2**20 if globalVar.preflightMemory is not None else None, globalVar.preflightTime)
+        globalVar.modelSolver = transientPlan["solver"]
+        parallelInTime = transientPlan["transient"] == "parareal"
+
     steps = len(stepDefinition)
-    globalVar.IVectorVector = ctm.populate_I_vector_vector_transient(nodes, model, steps)
+    IVectorSource = ctm.make_I_vector_source(nodes, model, steps)  # I vectors are built one phase at a time
 
     # Make initTempVector
-    initTempVector = []
-    for i in range(len(nodes)):
-        initTempVector.append(0)
+    initTempVector = np.zeros(len(nodes))
     # NOTE: The above should NOT start at the ambient temperature. It should start at the initial temperature, where ambient is 0.
+    start = [0, 0]
+    logSize = None
+    fingerprint = checkpoint.model_fingerprint(GMatrix, CMatrix) if (checkpointFile is not None or resume or isinstance(initialState, (str, os.PathLike))) else None
+    if resume:
+        if checkpointFile is None:
+            raise ValueError("A checkpoint file is needed to resume a transient simulation")
+        initTempVector, metadata = checkpoint.load_state(checkpointFile, fingerprint)
+        checkpoint.check_resume(metadata, stepDefinition)
+        start = metadata["position"]
+        logSize = metadata["logSize"]
+        if start[0] >= steps:
+            print("The checkpoint is at the end of the step definition (t = " + str(metadata["time"]) + "s), extend stepDefinition to continue the simulation")
+        else:
+            print("Resuming transient simulation at step " + str(start[0]+1) + ", substep " + str(start[1]+1) + " (t = " + str(metadata["time"]) + "s)")
+    elif periodic:
+        if leakage is not None:
+            raise ValueError("The periodic steady state solver needs a power independent of the temperature (no leakage)")
+        print("Solving periodic steady state...")
+        initTempVector, info = periodicSolver.solve_periodic_steady_state(GMatrix, CMatrix, IVectorSource, stepDefinition)
+        print("Periodic steady state: " + str(info["iterations"]) + " iterations, " + str(info["periods"]) + " periods, cycle residual " + str(info["residual"]) + " K")
+    elif isinstance(initialState, (str, os.PathLike)):
+        initTempVector = checkpoint.load_initial_state(initialState)
+        print("Starting transient simulation from " + str(initialState))
+    elif initialState is not None:
+        initTempVector = np.asarray(initialState, dtype=float)
     
 
+    stepSolver = ctm.bEuler
+    diagnostics = None
+    if leakage is not None:
+        stepSolver, diagnostics = leakageSolver.make_leakage_step_solver(leakage, leakageMethod)
+
+    centerMap = ctm.get_center_map(nodes, model)
+    with open(logsFile, 'w' if logSize is None else 'r+') as outfile:
+        if logSize is not None:
+            outfile.seek(logSize)   # Discard the steps written after the checkpoint
+            outfile.truncate()
+        recorder = transientOutput.make_recorder(outputMode, outfile, centerMap, globalVar.baseTemp, probes, header=logSize is None)
+        substeps = 0
+        with instrument.span("transient"):
+            if parallelInTime:
+                stepIterator = parareal.iter_parareal(GMatrix, CMatrix, IVectorSource, initTempVector, stepDefinition, start)
+            else:
+                stepIterator = ctm.iterBeuler(GMatrix, CMatrix, IVectorSource, initTempVector, stepDefinition, start, tolerance, onConverged, stepSolver)
+            for step in stepIterator:
+                with instrument.span("write_transient"):
+                    recorder(*step)
+                for consumer in consumers:
+                    consumer(*step)
+                substeps += 1
+                if checkpointFile is not None and (substeps % checkpointEvery == 0 or checkpoint.next_position(stepDefinition, step[0], step[1]) == [steps, 0]):
+                    with instrument.span("checkpoint"):
+                        save_transient_checkpoint(checkpointFile, step, stepDefinition, outfile, fingerprint)
+    if diagnostics is not None:
+        print("Leakage: " + str(diagnostics["iterations"]) + " iterations over " + str(diagnostics["steps"]) + " substeps (at most " + str(diagnostics["maxIterations"]) + "), "
+              + str(diagnostics["failedSteps"]) + " substeps not converged")
+        instrument.set_counter("leakage", diagnostics)
+    instrument.write_report()
+    return diagnostics
 
-    ttemp = ctm.doBeuler(GMatrix, CMatrix, globalVar.IVectorVector, initTempVector, stepDefinition)
 
-    for i in range(len(ttemp)):
-        ttemp[i] = [x + globalVar.baseTemp for x in ttemp[i]]
+
+# NOTE: make sure to call prepareModel before running the extraction
+# Extracts the Foster/Cauer compact thermal model of every block of the prepared model (self-impedance and the mutual impedances with the `mutuals` most coupled blocks,
+# ladders of `terms` RC pairs, see src/fosterCauer.py) and writes them as JSON to outputFile. Returns the compact models.
+def runCompactModelExtraction(outputFile, terms=4, mutuals=3):
+
+    if not globalVar.modelPrepared:
+        raise Exception("Model not prepared. Please call prepareModel(model) before running the extraction")
+
+    print("Extracting compact thermal models...")
+    with instrument.span("compact_models") as span:
+        compactModels = fosterCauer.extract_compact_models(terms, mutuals)
+        fosterCauer.save_compact_models(compactModels, outputFile)
+    print("Step time: " + str(span["duration"]))
+    instrument.write_report()
+    return compactModels
 
 
-    ctm.saveTransientInfo(ttemp, stepDefinition, nodes, model, logsFile)
+"""Function that saves the state of a transient simulation after a substep (phase, substep, time, temperature vector), with the position of the next substep and the size of the log."""
+def save_transient_checkpoint(checkpointFile, step, stepDefinition, outfile, fingerprint):
+    phase, substep, time, tempVector = step
+    outfile.flush()
+    checkpoint.save_state(checkpointFile, tempVector, "transient", fingerprint,
+                          position=checkpoint.next_position(stepDefinition, phase, substep), time=time, stepDefinition=stepDefinition, logSize=outfile.tell(),
+                          solver={"method": "backward Euler", "factorization": ctm.get_solver(), "precision": globalVar.precision, "timeStep": stepDefinition[phase]["duration"]/stepDefinition[phase]["steps"]})
 
     
 
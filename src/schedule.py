@@ -0,0 +1,58 @@
+"""Step schedules derived from the thermal time constants of the model.
+
+The time constants of the RC network are the eigenvalues tau of C v = tau G v.
+The slowest one is computed with ARPACK (eigsh), using the cached LU factorization of G; the fastest one is estimated locally as the smallest C_ii / G_ii of the nodes with a capacity.
+An automatic step schedule covers the response of the model from the fastest to the slowest time constant with log-spaced phases (one per decade), like the hand-written
+stepDefinition of ARTSim.py: phases of t0, 9 t0, 90 t0, ... seconds, until settleFactor times the slowest time constant."""
+
+import math
+
+import numpy as np
+import scipy.linalg
+import scipy.sparse.linalg
+
+from src import globalVar
+from src import instrument
+from src import nub_ctm as ctm
+
+"""Function that returns the fastest and slowest thermal time constants (s) of a (G, C) pair, default is the prepared model. They are computed once and kept in the factorization cache."""
+def estimate_time_constants(GMatrix=None, CMatrix=None):
+    if GMatrix is None:
+        GMatrix = globalVar.GMatrix
+    if CMatrix is None:
+        CMatrix = globalVar.CMatrix
+    cache = ctm.get_factorization_cache(GMatrix, CMatrix)
+    if "timeConstants" not in cache:
+        with instrument.span("time_constants"):
+            capacities = cache["C"].diagonal()
+            conductances = cache["G"].diagonal()
+            withCapacity = capacities > 0
+            tauFast = float(np.min(capacities[withCapacity] / conductances[withCapacity]))
+            factorization = ctm.get_steady_state_factorization(GMatrix, CMatrix)
+            GInverse = scipy.sparse.linalg.LinearOperator(cache["G"].shape, matvec=factorization.solve, dtype=float)
+            nodeCount = cache["G"].shape[0]
+            if nodeCount > 2:
+                tauSlow = float(scipy.sparse.linalg.eigsh(cache["C"], k=1, M=cache["G"], Minv=GInverse, which="LA", v0=np.ones(nodeCount), return_eigenvectors=False)[0])
+            else:   # ARPACK needs more than k+1 unknowns
+                tauSlow = float(np.max(scipy.linalg.eigh(cache["C"].toarray(), cache["G"].toarray(), eigvals_only=True)))
+        cache["timeConstants"] = (tauFast, tauSlow)
+    return cache["timeConstants"]
+
+"""Function that returns an automatic step definition for the (G, C) pair, default is the prepared model.
+The first phase lasts the fastest time constant, then every phase covers one decade of time, with stepsPerDecade substeps each.
+The schedule ends at endTime, default is settleFactor times the slowest time constant (the slowest mode has then decayed to exp(-settleFactor)).
+All the phases have the same power, so the power of the model must be constant (single values, not traces)."""
+def auto_step_definition(GMatrix=None, CMatrix=None, endTime=None, stepsPerDecade=2, settleFactor=5):
+    tauFast, tauSlow = estimate_time_constants(GMatrix, CMatrix)
+    if endTime is None:
+        endTime = settleFactor * tauSlow
+    stepDefinition = [{"duration": tauFast, "steps": stepsPerDecade}]
+    decades = max(0, math.ceil(math.log10(endTime / tauFast)))
+    phaseEnd = tauFast
+    for decade in range(1, decades + 1):
+        nextEnd = min(tauFast * 10**decade, endTime)
+        if nextEnd <= phaseEnd:
+            break
+        stepDefinition.append({"duration": nextEnd - phaseEnd, "steps": stepsPerDecade})
+        phaseEnd = nextEnd
+    return stepDefinition
@@ -0,0 +1,267 @@
+"""Simulation server: prepared models kept in memory, queried over a Unix socket or a localhost TCP port.
+
+Models are prepared once (prepareModel) and kept with their sparse G and C matrices and their factorizations (steady state, and G + C/h per timestep h), so a query costs
+a few sparse solves. The protocol is one JSON object per line, answered by one JSON object per line (with an "error" field if the query failed, and the "id" field of the query if it has one):
+
+{"op": "load", "model": "example_model"}            model module of the models directory or model file (.json, .toml or .npz); answers the blocks of the model
+{"op": "steady", "model": "example_model", "power": {"1,0,4": 0.2}}
+{"op": "transient", "model": "example_model", "phases": [{"duration": 0.01, "steps": 10, "power": {...}}], "initial": "ambient"}
+{"op": "models"}, {"op": "unload", "model": "example_model"}
+
+Power is given per block ("layer,chiplet,block": W, or a list with one value per block); in a dictionary, the blocks that are not given keep the power of the model (steady power,
+first value of power traces), so a what-if query only lists the blocks that change. Steady state answers the mean and max temperature (K) of every block; transient answers them
+at the end of every phase, starting from the ambient temperature or from the steady state of the model power ("initial": "steady").
+The asyncio front end serves queries concurrently; preparation and solves run on a thread pool (factorizations cannot be shared between processes), preparations one at a time
+since prepareModel uses the global state of the simulator. When the models use more than memoryLimit bytes, or the available memory of the system drops below minAvailable bytes,
+the least recently used models are evicted (they are prepared again when queried)."""
+
+import asyncio
+import importlib
+import json
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from src import cosim
+from src import globalVar
+from src import instrument
+from src import modelFile
+from src import nub_ctm as ctm
+from src import preflight
+from src import runSimulations
+from src import transientOutput
+
+"""Function that returns the block model of a model module of the models directory (e.g. "example_model") or of a model file (.json, .toml or .npz)."""
+def load_block_model(name):
+    if os.path.splitext(name)[1] in (".json", ".toml", ".npz"):
+        return modelFile.load_model(name)
+    return importlib.import_module("models." + name).model
+
+"""Function that returns the memory (bytes) of a sparse matrix or of a sparse LU factorization (double or mixed precision)."""
+def get_matrix_memory(matrix):
+    if isinstance(matrix, scipy.sparse.linalg.SuperLU):
+        return matrix.nnz * 12 + matrix.shape[0] * 16
+    if hasattr(matrix, "itemsize"):
+        return matrix.nnz * (matrix.itemsize + 4) + matrix.shape[0] * 16
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+"""Function that prepares a model and returns its server entry: the block maps of a co-simulation stepper (see src/cosim.py), the sparse G and C matrices, the power of every block
+and the factorizations (computed on demand). Uses the global state of the simulator: calls must not run concurrently."""
+def prepare_entry(name):
+    runSimulations.prepareModel(load_block_model(name))
+    cache = ctm.get_factorization_cache(globalVar.GMatrix, globalVar.CMatrix)
+    stepper = cosim.make_stepper()
+    stepper["GMatrix"] = scipy.sparse.csc_matrix(cache["G"])    # The matrices of the prepared model are released below
+    stepper["CMatrix"] = cache["C"]
+    blockPower = np.add.reduceat(np.asarray(globalVar.IVector, dtype=float)[stepper["centerNodes"]], stepper["starts"])
+    globalVar.GMatrix = globalVar.CMatrix = None
+    globalVar.factorCache = {}
+    globalVar.modelPrepared = False     # The server entries hold the models
+    entry = {"name": name, "stepper": stepper, "power": blockPower, "steady": None, "steps": {}, "lock": threading.Lock()}
+    entry["memory"] = get_matrix_memory(stepper["GMatrix"]) + get_matrix_memory(stepper["CMatrix"])
+    return entry
+
+"""Function that returns the factorization of G (h is None) or of G + C/h of a server entry, computing it and adding its memory to the entry the first time."""
+def get_entry_factorization(entry, h=None):
+    factorization = entry["steady"] if h is None else entry["steps"].get(h)
+    if factorization is None:
+        with entry["lock"]:     # One factorization per matrix, even for concurrent queries
+            factorization = entry["steady"] if h is None else entry["steps"].get(h)
+            if factorization is None:
+                stepper = entry["stepper"]
+                A = stepper["GMatrix"] if h is None else scipy.sparse.csc_matrix(stepper["GMatrix"] + stepper["CMatrix"] / h)
+                if globalVar.precision == "mixed":    # Single precision factors with iterative refinement (see refine_factorization in src/nub_ctm.py)
+                    factorization = ctm.refine_factorization(A, scipy.sparse.linalg.splu(scipy.sparse.csc_matrix(A, dtype=np.float32)), lambda: scipy.sparse.linalg.splu(A))
+                else:
+                    factorization = scipy.sparse.linalg.splu(A)
+                if h is None:
+                    entry["steady"] = factorization
+                else:
+                    entry["steps"][h] = factorization
+                entry["memory"] += get_matrix_memory(factorization)
+    return factorization
+
+"""Function that returns the power vector of the blocks of a server entry for a query: the power of the model, changed for the blocks given in a dictionary
+({"layer,chiplet,block": W}), or a list with one value per block."""
+def get_query_power(entry, power):
+    if power is None:
+        return entry["power"]
+    if isinstance(power, dict):
+        powerVector = entry["power"].copy()
+        changed = cosim.block_power_vector(entry["stepper"], {transientOutput.parse_probe(block): value for block, value in power.items()})
+        given = cosim.block_power_vector(entry["stepper"], {transientOutput.parse_probe(block): 1 for block in power})
+        return np.where(given > 0, changed, powerVector)
+    return cosim.block_power_vector(entry["stepper"], power)
+
+"""Function that returns the mean and max temperature (K) of every block of a server entry for a temperature vector relative to the ambient."""
+def get_block_results(entry, tempVector):
+    return {"mean": cosim.block_temperatures(entry["stepper"], tempVector).tolist(), "max": cosim.block_temperatures(entry["stepper"], tempVector, "max").tolist()}
+
+"""Function that solves the steady state of a server entry for a power query (see get_query_power)."""
+def solve_steady(entry, power=None):
+    tempVector = get_entry_factorization(entry).solve(cosim.spread_block_power(entry["stepper"], get_query_power(entry, power)))
+    return get_block_results(entry, tempVector)
+
+"""Function that solves a transient of a server entry: phases of {"duration", "steps", "power"} (power as in get_query_power), from the ambient or from the steady state of the model power.
+Returns the block temperatures at the end of every phase."""
+def solve_transient(entry, phases, initial="ambient"):
+    stepper = entry["stepper"]
+    if initial == "steady":
+        tempVector = get_entry_factorization(entry).solve(cosim.spread_block_power(stepper, entry["power"]))
+    elif initial == "ambient":
+        tempVector = np.zeros(stepper["GMatrix"].shape[0])
+    else:
+        raise ValueError("Unknown initial state: " + str(initial) + ". Valid initial states are: ambient, steady")
+    results = []
+    for phase in phases:
+        h = phase["duration"] / phase["steps"]
+        factorization = get_entry_factorization(entry, h)
+        IVector = cosim.spread_block_power(stepper, get_query_power(entry, phase.get("power")))
+        capacitiesOverH = stepper["capacities"] / h
+        for _ in range(phase["steps"]):
+            tempVector = factorization.solve(IVector + capacitiesOverH * tempVector)
+        results.append(get_block_results(entry, tempVector))
+    return results
+
+"""Function that returns a new server: the prepared models (least recently used first), the thread pool and the memory limits (bytes, None for no limit)."""
+def make_server(workers=None, memoryLimit=None, minAvailable=None):
+    return {"models": OrderedDict(), "loading": {}, "pool": ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1), "prepareLock": threading.Lock(),
+            "memoryLimit": memoryLimit, "minAvailable": minAvailable, "evictions": 0}
+
+"""Function that evicts the least recently used models of a server, except keep, while the models use more than the memory limit or the system is short of available memory."""
+def evict_models(server, keep=None):
+    def short_of_memory():
+        if server["memoryLimit"] is not None and sum(entry["memory"] for entry in server["models"].values()) > server["memoryLimit"]:
+            return True
+        available = preflight.get_available_memory() if server["minAvailable"] is not None else None
+        return available is not None and available < server["minAvailable"]
+
+    while short_of_memory():
+        victim = next((name for name in server["models"] if name != keep), None)
+        if victim is None:
+            break
+        del server["models"][victim]
+        server["evictions"] += 1
+        print("Server: evicted model " + victim)
+
+"""Coroutine that returns the entry of a model, preparing it (on the thread pool, one preparation at a time) if it is not loaded. The model becomes the most recently used."""
+async def get_model(server, name):
+    if name not in server["models"]:
+        if name not in server["loading"]:   # Concurrent queries of a model that is not loaded wait for the same preparation
+            def prepare():
+                with server["prepareLock"]:
+                    return prepare_entry(name)
+            server["loading"][name] = asyncio.get_running_loop().run_in_executor(server["pool"], prepare)
+        try:
+            entry = await server["loading"][name]
+        finally:
+            server["loading"].pop(name, None)
+        server["models"][name] = entry
+    server["models"].move_to_end(name)
+    evict_models(server, keep=name)
+    return server["models"][name]
+
+"""Coroutine that answers a query (dictionary, see the description of this module)."""
+async def handle_query(server, query):
+    loop = asyncio.get_running_loop()
+    op = query.get("op")
+    if op == "models":
+        return {"models": [{"model": name, "memory": entry["memory"]} for name, entry in server["models"].items()], "evictions": server["evictions"]}
+    if op == "unload":
+        return {"unloaded": server["models"].pop(query["model"], None) is not None}
+    if op not in ("load", "steady", "transient"):
+        raise ValueError("Unknown operation: " + str(op) + ". Valid operations are: load, steady, transient, models, unload")
+    entry = await get_model(server, query["model"])
+    if op == "load":
+        return {"model": entry["name"], "blocks": [",".join(str(index) for index in block) for block in entry["stepper"]["blocks"]], "memory": entry["memory"]}
+    start = time.perf_counter()
+    if op == "steady":
+        result = await loop.run_in_executor(server["pool"], solve_steady, entry, query.get("power"))
+    else:
+        result = {"phases": await loop.run_in_executor(server["pool"], solve_transient, entry, query["phases"], query.get("initial", "ambient"))}
+    evict_models(server, keep=entry["name"])     # Factorizations of new timesteps add to the memory of the model
+    instrument.add_counter("serverQueries")
+    result["time"] = time.perf_counter() - start
+    return result
+
+"""Function that returns the connection handler of a server: reads queries (one JSON object per line) and writes their answers, each query in its own task."""
+def make_handler(server):
+    async def handle_connection(reader, writer):
+        writeLock = asyncio.Lock()
+
+        async def answer(line):
+            request = {}
+            try:
+                request = json.loads(line)
+                response = await handle_query(server, request)
+            except Exception as error:  # Errors are answered to the client, the server keeps running
+                response = {"error": type(error).__name__ + ": " + str(error)}
+            if isinstance(request, dict) and "id" in request:   # Lets clients match the answers, which come back in the order they are ready
+                response["id"] = request["id"]
+            async with writeLock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        tasks = []
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                tasks.append(asyncio.ensure_future(answer(line)))
+        await asyncio.gather(*tasks)
+        writer.close()
+    return handle_connection
+
+"""Coroutine that runs a server on a Unix socket (path) or on a localhost TCP port, until it is cancelled. preload: models prepared before accepting queries."""
+async def serve(socketPath=None, port=None, workers=None, memoryLimit=None, minAvailable=None, preload=()):
+    server = make_server(workers, memoryLimit, minAvailable)
+    for name in preload:
+        await get_model(server, name)
+    if socketPath is not None:
+        listener = await asyncio.start_unix_server(make_handler(server), path=socketPath)
+        print("Server: listening on " + socketPath)
+    else:
+        listener = await asyncio.start_server(make_handler(server), host="127.0.0.1", port=port)
+        print("Server: listening on 127.0.0.1:" + str(port))
+    async with listener:
+        await listener.serve_forever()
+
+"""Function that sends queries to a server and returns their answers, in the order of the queries (one connection for all the queries, answered concurrently).
+Queries are dictionaries (see the description of this module); their "id" fields are replaced by their indices."""
+def query(queries, socketPath=None, port=None):
+    if socketPath is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socketPath)
+    else:
+        connection = socket.create_connection(("127.0.0.1", port))
+    with connection, connection.makefile("rw") as stream:
+        for index, q in enumerate(queries):
+            stream.write(json.dumps(dict(q, id=index)) + "\n")
+        stream.flush()
+        answers = [None] * len(queries)
+        for _ in queries:
+            answer = json.loads(stream.readline())
+            answers[answer.pop("id")] = answer     # Answers come back in the order they are ready
+        return answers
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="ARTSim simulation server (one JSON query per line)")
+    parser.add_argument("--socket", default=None, help="Unix socket path")
+    parser.add_argument("--port", type=int, default=8765, help="localhost TCP port, if no Unix socket is given")
+    parser.add_argument("--workers", type=int, default=None, help="threads of the solver pool (default: number of CPUs)")
+    parser.add_argument("--memory-limit", type=float, default=None, help="memory of the prepared models (MB) above which the least recently used are evicted")
+    parser.add_argument("--min-available", type=float, default=None, help="available system memory (MB) under which the least recently used models are evicted")
+    parser.add_argument("--preload", nargs="*", default=[], help="models to prepare at startup")
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket, args.port, args.workers, args.memory_limit * 2**20 if args.memory_limit else None,
+                      args.min_available * 2**20 if args.min_available else None, args.preload))
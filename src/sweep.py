@@ -0,0 +1,216 @@
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from multiprocessing import shared_memory
+
+import numpy as np
+import scipy.sparse
+
+from src import globalVar
+from src import instancing
+from src import nub_ctm as ctm
+
+"""Parameters that can be swept. Only "resolution" changes the geometry of the model; the other parameters reuse the assembled G/C and its factorizations.
+baseTemp: baseline (ambient) temperature in K
+powerScale: factor applied to the power dissipation of every block
+resolution: [X,Y] resolution applied to every block of the model
+stepDefinition: transient step definition (see ARTSim.py). Jobs without a stepDefinition only run the steady state analysis."""
+SWEEP_PARAMETERS = ("baseTemp", "powerScale", "resolution", "stepDefinition")
+
+# Geometries attached by the current worker process, keyed by the name of their shared memory block. Each entry holds the matrices and their factorizations.
+_workerGeometries = {}
+
+"""Function that expands a sweep grid (dictionary of parameter name -> list of values) into the list of jobs (one dictionary of parameters per point of the grid).
+Parameters that are not in the grid take their default value (globalVar.baseTemp, a power scale of 1, the resolutions of the model, no transient)."""
+def expand_sweep_grid(grid):
+    for name in grid:
+        if name not in SWEEP_PARAMETERS:
+            raise ValueError("Unknown sweep parameter: " + str(name) + ". Valid parameters are: " + ", ".join(SWEEP_PARAMETERS))
+    defaults = {"baseTemp": [globalVar.baseTemp], "powerScale": [1], "resolution": [None], "stepDefinition": [None]}
+    values = [grid.get(name, defaults[name]) for name in SWEEP_PARAMETERS]
+    jobs = []
+    for point in itertools.product(*values):
+        job = dict(zip(SWEEP_PARAMETERS, point))
+        job["jobIndex"] = len(jobs)
+        jobs.append(job)
+    return jobs
+
+"""Function that returns a copy of the block model where every block uses the given [X,Y] resolution. If resolution is None, the model is returned unchanged."""
+def set_model_resolution(blockModel, resolution):
+    if resolution is None:
+        return blockModel
+    blockModel = deepcopy(blockModel)
+    for layer in blockModel:
+        for chiplet in layer:
+            for unit in chiplet:
+                unit["resolution"] = list(resolution)
+    return blockModel
+
+"""Function that flattens and assembles a block model once, for all the jobs that share its geometry.
+The global state (globalVar) is used for the assembly, as in prepareModel, and restored afterwards.
+Returns a dictionary with the sparse G and C matrices, the steady state I vector, the per-phase power of the center nodes (None if the power is constant) and the center node index map (see make_center_map)."""
+def prepare_geometry(blockModel):
+    savedState = (globalVar.GMatrix, globalVar.CMatrix, globalVar.IVector)
+    model = ctm.flatten_model(blockModel)
+    designs = instancing.find_chiplet_designs(model)
+    nodes, globalVar.GMatrix, globalVar.CMatrix = instancing.assemble_model(model, designs)    # Sparse assembly with chiplet stamps, as in prepareModel
+    ctm.populate_I_vector(nodes, model)
+
+    centerMap = ctm.make_center_map(nodes, model)
+    phases = 0  # Number of power values of the blocks with variable power dissipation (0 if all blocks have constant power)
+    for i in centerMap["centerNodes"]:
+        power = model[nodes[i]["layerIndex"]][nodes[i]["chipletIndex"]][nodes[i]["unitIndex"]]["powerDissipation"]
+        if ctm.is_power_trace(power):
+            phases = len(power)
+    powerTrace = None
+    if phases:
+        powerTrace = ctm.populate_I_vector_vector_transient(nodes, model, phases)
+
+    geometry = {
+        "G": scipy.sparse.csr_matrix(ctm.to_sparse(globalVar.GMatrix)),
+        "C": scipy.sparse.csr_matrix(ctm.to_sparse(globalVar.CMatrix)),
+        "I": np.asarray(globalVar.IVector, dtype=float),
+        "powerTrace": powerTrace,
+        "centerNodes": centerMap["centerNodes"],
+        "centerMap": centerMap,
+        "labels": np.array(ctm.get_node_labels(nodes), dtype=np.int64).reshape(-1, 2)    # (layer, chiplet) of every node, for the domain decomposition solver
+    }
+    globalVar.GMatrix, globalVar.CMatrix, globalVar.IVector = savedState
+    return geometry
+
+"""Function that copies the arrays of a prepared geometry into a single shared memory block, so that workers can map them instead of unpickling them.
+Returns the shared memory block (to be closed and unlinked by the caller) and a small picklable handle describing the layout of the arrays."""
+def share_geometry(geometry):
+    arrays = {
+        "G.data": geometry["G"].data, "G.indices": geometry["G"].indices, "G.indptr": geometry["G"].indptr,
+        "C.data": geometry["C"].data, "C.indices": geometry["C"].indices, "C.indptr": geometry["C"].indptr,
+        "I": geometry["I"], "centerNodes": geometry["centerNodes"], "labels": geometry["labels"]
+    }
+    if geometry["powerTrace"] is not None:
+        arrays["powerTrace"] = geometry["powerTrace"]
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // 8) * 8    # Align every array on 8 bytes
+        layout[name] = (offset, array.shape, array.dtype.str)
+        offset += array.nbytes
+    sharedBlock = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, array in arrays.items():
+        start, shape, dtype = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=sharedBlock.buf, offset=start)[...] = array
+    handle = {"name": sharedBlock.name, "layout": layout, "shape": geometry["G"].shape}
+    return sharedBlock, handle
+
+"""Function that maps a shared geometry in the worker process. The mapping, the matrices and their factorizations are kept for the following jobs of the same geometry."""
+def _attach_geometry(handle):
+    if handle["name"] not in _workerGeometries:
+        sharedBlock = shared_memory.SharedMemory(name=handle["name"])
+        arrays = {}
+        for name, (start, shape, dtype) in handle["layout"].items():
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=sharedBlock.buf, offset=start)
+        GMatrix = scipy.sparse.csr_matrix((arrays["G.data"], arrays["G.indices"], arrays["G.indptr"]), shape=handle["shape"])
+        CMatrix = scipy.sparse.csr_matrix((arrays["C.data"], arrays["C.indices"], arrays["C.indptr"]), shape=handle["shape"])
+        _workerGeometries[handle["name"]] = {"sharedBlock": sharedBlock, "arrays": arrays, "G": GMatrix, "C": CMatrix}
+        ctm.get_factorization_cache(GMatrix, CMatrix, [tuple(label) for label in arrays["labels"].tolist()])
+    return _workerGeometries[handle["name"]]
+
+"""Function that runs one job of the sweep in a worker process. Returns the center node temperatures (in K) of the steady state and of every transient substep."""
+def _run_sweep_job(handle, job):
+    geometry = _attach_geometry(handle)
+    GMatrix = geometry["G"]
+    CMatrix = geometry["C"]
+    arrays = geometry["arrays"]
+    centerNodes = arrays["centerNodes"]
+    result = {"jobIndex": job["jobIndex"]}
+
+    ssTempVector = ctm.get_steady_state_factorization(GMatrix, CMatrix).solve(job["powerScale"] * arrays["I"])
+    result["steadyState"] = ssTempVector[centerNodes] + job["baseTemp"]
+
+    stepDefinition = job["stepDefinition"]
+    if stepDefinition is not None:
+        if "powerTrace" in arrays:
+            if len(arrays["powerTrace"]) != len(stepDefinition):
+                result["error"] = "Power dissipation list length does not match number of steps"
+                return result
+            IVectorVector = job["powerScale"] * arrays["powerTrace"]
+        else:
+            IVectorVector = [job["powerScale"] * arrays["I"]] * len(stepDefinition)
+        initTempVector = np.zeros(GMatrix.shape[0])
+        ttemp = []
+        for i in range(len(stepDefinition)):
+            for j in range(stepDefinition[i]["steps"]):
+                initTempVector = ctm.bEuler(stepDefinition[i]["steps"], stepDefinition[i]["duration"], GMatrix, CMatrix, IVectorVector[i], initTempVector)
+                ttemp.append(initTempVector[centerNodes] + job["baseTemp"])
+        result["transient"] = np.array(ttemp)
+    return result
+
+"""Function that returns the substep times of a step definition, in the same order as the transient results."""
+def get_substep_times(stepDefinition):
+    times = []
+    startTimeAtStep = 0
+    for i in range(len(stepDefinition)):
+        for j in range(stepDefinition[i]["steps"]):
+            times.append(startTimeAtStep + (j+1)*(stepDefinition[i]["duration"]/stepDefinition[i]["steps"]))
+        startTimeAtStep += stepDefinition[i]["duration"]
+    return times
+
+"""Function that runs a parameter sweep of a block model on a process pool and writes all the results to one JSON file.
+grid is a dictionary of parameter name -> list of values (see SWEEP_PARAMETERS). All combinations of the values are run.
+Jobs are grouped by geometry (resolution): each geometry is flattened and assembled once in this process, and its matrices are passed to the workers through shared memory.
+Each worker factorizes G (and G + C/h for each timestep h) once per geometry and reuses the factorizations for all of its jobs.
+Returns the structured results, which are also written to outputFile if it is given."""
+def runSweep(blockModel, grid, outputFile=None, processes=None):
+    sweepStart = time.time()
+    jobs = expand_sweep_grid(grid)
+
+    groups = {}     # Jobs that share the same geometry, keyed by resolution
+    for job in jobs:
+        key = None if job["resolution"] is None else tuple(job["resolution"])
+        groups.setdefault(key, []).append(job)
+
+    print("Sweep: " + str(len(jobs)) + " jobs, " + str(len(groups)) + " geometries")
+    sharedBlocks = []
+    geometries = {}
+    results = [None] * len(jobs)
+    try:
+        futures = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for key, groupJobs in groups.items():
+                stepStart = time.time()
+                geometry = prepare_geometry(set_model_resolution(blockModel, key))
+                sharedBlock, handle = share_geometry(geometry)
+                sharedBlocks.append(sharedBlock)
+                geometries[key] = geometry
+                print("Geometry " + str(key) + " prepared: " + str(geometry["G"].shape[0]) + " nodes. Step time: " + str(time.time()-stepStart))
+                for job in groupJobs:   # Jobs of a geometry are submitted together, so that workers mostly reuse the geometry they already attached
+                    futures.append((key, executor.submit(_run_sweep_job, handle, job)))
+            for key, future in futures:
+                jobResult = future.result()
+                job = jobs[jobResult["jobIndex"]]
+                centerMap = geometries[key]["centerMap"]
+                entry = {
+                    "parameters": {name: job[name] for name in SWEEP_PARAMETERS},
+                    "nodes": geometries[key]["G"].shape[0],
+                    "steadyState": ctm.nest_center_temperatures(jobResult["steadyState"], centerMap)
+                }
+                if "error" in jobResult:
+                    entry["error"] = jobResult["error"]
+                elif "transient" in jobResult:
+                    entry["transient"] = {
+                        "times": get_substep_times(job["stepDefinition"]),
+                        "temperatures": [ctm.nest_center_temperatures(stepTemps, centerMap) for stepTemps in jobResult["transient"]]
+                    }
+                results[job["jobIndex"]] = entry
+    finally:
+        for sharedBlock in sharedBlocks:
+            sharedBlock.close()
+            sharedBlock.unlink()
+
+    sweepResults = {"grid": grid, "jobs": results}
+    if outputFile is not None:
+        with open(outputFile, 'w') as outfile:
+            json.dump(sweepResults, outfile)
+    print("Sweep done in " + str(time.time()-sweepStart) + " seconds")
+    return sweepResults
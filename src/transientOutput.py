@@ -0,0 +1,100 @@
+"""Reduced outputs of transient simulations, computed inside the time loop.
+
+full: every subblock of every step, in the format of saveTransientInfo (nub_ctm.py)
+probes: only the user-selected probe blocks, one CSV line per step with the mean and max temperature of each probe block
+summary: only per-step aggregates, one CSV line per step with the max and mean temperature of each chiplet and layer, and the hottest block
+
+Recorders are consumers of the transient loop (iterBeuler in nub_ctm.py): each step is reduced and written as soon as it is computed, and the trajectory is never kept in memory.
+In probes and summary modes, disk usage does not depend on the number of subblocks of the model either.
+Blocks are identified as L<layer>C<chiplet>B<block>, with the indices of the block model."""
+
+import numpy as np
+
+from src import blockStats
+from src import nub_ctm as ctm
+
+OUTPUT_MODES = ("full", "probes", "summary")
+
+"""Function that returns the name of a block, chiplet or layer from its key (layer, chiplet, block), (layer, chiplet) or (layer,)."""
+def key_name(key):
+    return "".join(prefix + str(int(index)) for prefix, index in zip(("L", "C", "B"), key))
+
+"""Function that parses a probe block definition: a (layer, chiplet, block) tuple, or a "layer,chiplet,block" string."""
+def parse_probe(probe):
+    if isinstance(probe, str):
+        probe = probe.split(",")
+    if len(probe) != 3:
+        raise ValueError("Invalid probe block: " + str(probe) + ". A probe is given as (layer, chiplet, block)")
+    return tuple(int(index) for index in probe)
+
+"""Function that returns the positions of the subblocks of the probe blocks in the temperature vector, their offsets per probe and their areas.
+Raises a ValueError listing the probe blocks that are not in the model."""
+def locate_probes(probes, centerMap):
+    segments = {tuple(int(index) for index in key): k for k, key in enumerate(centerMap["segmentKeys"])}
+    probes = [parse_probe(probe) for probe in probes]
+    missing = [key_name(probe) for probe in probes if probe not in segments]
+    if missing:
+        raise ValueError("Probe blocks not found in the model: " + ", ".join(missing))
+    offsets = centerMap["segmentOffsets"]
+    positions = [np.arange(offsets[segments[probe]], offsets[segments[probe]+1]) for probe in probes]
+    probeOffsets = np.concatenate(([0], np.cumsum([len(p) for p in positions])[:-1])).astype(np.int64)
+    positions = np.concatenate(positions)
+    return probes, centerMap["centerNodes"][positions], probeOffsets, centerMap["width"][positions] * centerMap["height"][positions]
+
+"""Function that writes the CSV header of the probes output and returns the step recorder: a function (phase, substep, time, temperature vector) that writes the line of the step.
+baseTemp is added to the temperatures, which are relative to the ambient."""
+def make_probe_recorder(outfile, probes, centerMap, baseTemp, header=True):
+    if not probes:
+        raise ValueError("The probes output mode needs at least one probe block")
+    probes, probeNodes, probeOffsets, areas = locate_probes(probes, centerMap)
+    probeAreas = np.add.reduceat(areas, probeOffsets)
+    if header:
+        outfile.write(",".join(["time"] + [key_name(probe) + "_" + statistic for probe in probes for statistic in ("mean", "max")]) + "\n")
+
+    def record(phase, substep, time, tempVector):
+        temps = np.asarray(tempVector)[probeNodes] + baseTemp    # Only the subblocks of the probe blocks are read
+        means = np.add.reduceat(temps*areas, probeOffsets) / probeAreas
+        maxes = np.maximum.reduceat(temps, probeOffsets)
+        outfile.write(",".join([str(time)] + [str(value) for pair in zip(means, maxes) for value in pair]) + "\n")
+    return record
+
+"""Function that returns the step recorder of the full output: a function (phase, substep, time, temperature vector) that writes the center temperatures of the step.
+baseTemp is added to the temperatures, which are relative to the ambient."""
+def make_full_recorder(outfile, centerMap, baseTemp):
+    def record(phase, substep, time, tempVector):
+        outfile.write(ctm.format_transient_step(phase, substep, time, ctm.extract_center_temperatures(tempVector, centerMap) + baseTemp, centerMap))
+    return record
+
+"""Function that writes the CSV header of the summary output and returns the step recorder: a function (phase, substep, time, temperature vector) that writes the line of the step.
+baseTemp is added to the temperatures, which are relative to the ambient."""
+def make_summary_recorder(outfile, centerMap, baseTemp, header=True):
+    chipletKeys = blockStats.get_level_segments(centerMap, "chiplet")[1]
+    layerKeys = blockStats.get_level_segments(centerMap, "layer")[1]
+    blockNames = [key_name(key) for key in centerMap["segmentKeys"]]
+    if header:
+        columns = ["time"]
+        for key in list(chipletKeys) + list(layerKeys):
+            columns += [key_name(key) + "_max", key_name(key) + "_mean"]
+        outfile.write(",".join(columns + ["hottest_block", "hottest_temperature"]) + "\n")
+
+    def record(phase, substep, time, tempVector):
+        stats = blockStats.compute_statistics(tempVector, ("max", "mean"), blockStats.LEVELS, centerMap)
+        line = [str(time)]
+        for level in ("chiplet", "layer"):
+            for maxTemp, meanTemp in zip(stats[level]["max"], stats[level]["mean"]):
+                line += [str(maxTemp + baseTemp), str(meanTemp + baseTemp)]
+        hottest = int(np.argmax(stats["block"]["max"]))
+        line += [blockNames[hottest], str(stats["block"]["max"][hottest] + baseTemp)]
+        outfile.write(",".join(line) + "\n")
+    return record
+
+"""Function that returns the step recorder of an output mode (see OUTPUT_MODES), writing to the open file outfile.
+If header is False, the CSV header is not written (e.g. when appending to the log of a resumed simulation)."""
+def make_recorder(outputMode, outfile, centerMap, baseTemp, probes=None, header=True):
+    if outputMode == "full":
+        return make_full_recorder(outfile, centerMap, baseTemp)
+    if outputMode == "probes":
+        return make_probe_recorder(outfile, probes, centerMap, baseTemp, header)
+    if outputMode == "summary":
+        return make_summary_recorder(outfile, centerMap, baseTemp, header)
+    raise ValueError("Unknown transient output mode: " + str(outputMode) + ". Valid modes are: " + ", ".join(OUTPUT_MODES))
@@ -0,0 +1,55 @@
+import sys
+from copy import deepcopy
+from pathlib import Path
+
+import numpy as np
+import pytest
+import scipy.sparse
+import scipy.sparse.linalg
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.example_model import model as exampleModel
+from src import globalVar
+from src import nub_ctm as ctm
+from src import runSimulations
+
+"""Fixture that restores the global state of the simulator (src/globalVar.py) after every test, so that tests can prepare models and change settings."""
+@pytest.fixture(autouse=True)
+def restore_global_state():
+    saved = {name: value for name, value in vars(globalVar).items() if not name.startswith("__")}
+    yield
+    for name in [name for name in vars(globalVar) if not name.startswith("__") and name not in saved]:
+        delattr(globalVar, name)
+    for name, value in saved.items():
+        setattr(globalVar, name, value)
+    globalVar.factorCache = {}
+
+"""Fixture that returns a copy of the block model of example_model."""
+@pytest.fixture
+def block_model():
+    return deepcopy(exampleModel)
+
+"""Fixture that prepares example_model (prepareModel) and returns its sparse G, C and steady state I vector, the reference of the tests."""
+@pytest.fixture
+def prepared(block_model):
+    runSimulations.prepareModel(block_model)
+    return {"G": ctm.to_sparse(globalVar.GMatrix), "C": ctm.to_sparse(globalVar.CMatrix), "I": np.asarray(globalVar.IVector, dtype=float)}
+
+"""Function that solves G x = I with a direct sparse solve, without the factorization cache: the reference of the tests."""
+def direct_steady_state(G, I):
+    return scipy.sparse.linalg.spsolve(scipy.sparse.csc_matrix(G), np.asarray(I, dtype=float))
+
+"""Function that runs backward Euler over a step definition with direct sparse solves, without the factorization cache. IVectorVector gives the I vector of each phase.
+Returns the temperature vector (relative to the ambient) after every substep."""
+def direct_transient(G, C, IVectorVector, initTempVector, stepDefinition):
+    G, C = scipy.sparse.csc_matrix(G), scipy.sparse.csc_matrix(C)
+    tempVector = np.asarray(initTempVector, dtype=float)
+    tempVectors = []
+    for i, phase in enumerate(stepDefinition):
+        h = phase["duration"] / phase["steps"]
+        A = scipy.sparse.csc_matrix(G + C / h)
+        for _ in range(phase["steps"]):
+            tempVector = scipy.sparse.linalg.spsolve(A, np.asarray(IVectorVector[i], dtype=float) + C.dot(tempVector) / h)
+            tempVectors.append(tempVector)
+    return tempVectors
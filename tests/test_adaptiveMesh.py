@@ -0,0 +1,32 @@
+import numpy as np
+import scipy.sparse.linalg
+
+from src import adaptiveMesh
+from src import blockStats
+
+
+def solve_blocks(blockModel):
+    geometry = adaptiveMesh.assemble_geometry(blockModel)
+    tempVector = scipy.sparse.linalg.spsolve(scipy.sparse.csc_matrix(geometry["G"]), geometry["I"])
+    statistics = blockStats.compute_statistics(tempVector, ("mean", "max"), ("block",), geometry["centerMap"])["block"]
+    return geometry["G"].shape[0], {tuple(key): (mean, largest) for key, mean, largest in zip(statistics["keys"].tolist(), statistics["mean"], statistics["max"])}
+
+
+def set_uniform_resolution(blockModel, resolution):
+    return adaptiveMesh.set_block_resolutions(blockModel, {(iLayer, iChiplet, iUnit): list(resolution) for iLayer, layer in enumerate(blockModel)
+                                                           for iChiplet, chiplet in enumerate(layer) for iUnit in range(len(chiplet))})
+
+
+def test_adaptive_resolution_is_close_to_the_uniform_fine_model(block_model):
+    refined = adaptiveMesh.adapt_resolution(block_model, tolerance=0.1)
+    refinedNodes, refinedTemps = solve_blocks(refined)
+    fineNodes, fineTemps = solve_blocks(set_uniform_resolution(block_model, (16, 16)))
+    assert refinedNodes < fineNodes / 2
+    assert max(max(abs(refinedTemps[key][0] - fineTemps[key][0]), abs(refinedTemps[key][1] - fineTemps[key][1])) for key in fineTemps) < 2
+
+
+def test_set_block_resolutions_keeps_the_model(block_model):
+    changed = adaptiveMesh.set_block_resolutions(block_model, {(1, 0, 0): [8, 8]})
+    assert changed[1][0][0]["resolution"] == [8, 8]
+    assert block_model[1][0][0]["resolution"] == [2, 2]
+    assert changed[1][0][1]["resolution"] == block_model[1][0][1]["resolution"]
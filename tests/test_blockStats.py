@@ -0,0 +1,45 @@
+import numpy as np
+
+from conftest import direct_steady_state
+from src import blockStats
+from src import globalVar
+from src import nub_ctm as ctm
+
+"""Function that returns the area-weighted mean, max and min temperature of every block, with a loop over the subblocks of each block of the center map."""
+def reduce_blocks(tempVector, centerMap):
+    centerTemps = np.asarray(tempVector)[centerMap["centerNodes"]]
+    areas = centerMap["width"] * centerMap["height"]
+    offsets = centerMap["segmentOffsets"]
+    blocks = [slice(offsets[k], offsets[k+1]) for k in range(len(offsets) - 1)]
+    return (np.array([np.average(centerTemps[block], weights=areas[block]) for block in blocks]), np.array([np.max(centerTemps[block]) for block in blocks]),
+            np.array([np.min(centerTemps[block]) for block in blocks]), np.array([np.sum(areas[block]) for block in blocks]))
+
+
+def test_statistics_match_the_block_temperatures(prepared):
+    tempVector = direct_steady_state(prepared["G"], prepared["I"])
+    centerMap = globalVar.centerMap
+    means, maxes, mins, blockAreas = reduce_blocks(tempVector, centerMap)
+    stats = blockStats.compute_statistics(tempVector, ("mean", "max", "min"), blockStats.LEVELS)
+    np.testing.assert_allclose(stats["block"]["mean"], means, rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(stats["block"]["max"], maxes)
+    np.testing.assert_array_equal(stats["block"]["min"], mins)
+    centerTemps = ctm.extract_center_temperatures(tempVector, centerMap)
+    hottest, coldest = blockStats.get_extreme_temperatures(tempVector)
+    assert (stats["layer"]["max"].max(), stats["layer"]["min"].min()) == (hottest, coldest) == (centerTemps.max(), centerTemps.min())
+    blockKeys = [tuple(key) for key in stats["block"]["keys"]]
+    for level in ("chiplet", "layer"):   # Means of the coarser levels are area-weighted over their blocks
+        for levelKey, mean in zip(stats[level]["keys"], stats[level]["mean"]):
+            inside = [k for k, key in enumerate(blockKeys) if key[:len(levelKey)] == tuple(levelKey)]
+            np.testing.assert_allclose(mean, np.average(means[inside], weights=blockAreas[inside]), rtol=0, atol=1e-9)
+
+
+def test_statistics_of_a_stack_of_steps(prepared):
+    tempVectors = np.array([direct_steady_state(prepared["G"], scale * prepared["I"]) for scale in (1, 2)])
+    stats = blockStats.compute_statistics(tempVectors, ("mean", "center"))
+    np.testing.assert_allclose(stats["block"]["mean"][1], 2 * stats["block"]["mean"][0], rtol=1e-12)
+    assert stats["block"]["center"].shape == stats["block"]["mean"].shape
+
+
+def test_unknown_statistic_is_rejected(prepared):
+    np.testing.assert_raises(ValueError, blockStats.compute_statistics, np.zeros(len(prepared["I"])), ("median",))
+    np.testing.assert_raises(ValueError, blockStats.compute_statistics, np.zeros(len(prepared["I"])), ("mean",), ("package",))
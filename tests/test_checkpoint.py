@@ -0,0 +1,51 @@
+import numpy as np
+
+from src import checkpoint
+from src import globalVar
+from src import runSimulations
+
+STEP_DEFINITION = [{"duration": 0.001, "steps": 2}, {"duration": 0.009, "steps": 2}, {"duration": 0.09, "steps": 2}, {"duration": 0.9, "steps": 2}, {"duration": 1, "steps": 2}]
+
+
+def test_state_round_trip(prepared, tmp_path):
+    tempVector = np.linspace(0, 1, len(prepared["I"]))
+    checkpoint.save_state(tmp_path / "state.npz", tempVector, "transient", position=[1, 0], time=0.001)
+    loaded, metadata = checkpoint.load_state(tmp_path / "state.npz", checkpoint.model_fingerprint())
+    np.testing.assert_array_equal(loaded, tempVector)
+    assert (metadata["kind"], metadata["position"], metadata["baseTemp"]) == ("transient", [1, 0], globalVar.baseTemp)
+
+
+def test_fingerprint_mismatch_is_rejected(prepared, tmp_path):
+    checkpoint.save_state(tmp_path / "state.npz", np.zeros(len(prepared["I"])), "steady", fingerprint="another model")
+    np.testing.assert_raises(ValueError, checkpoint.load_state, tmp_path / "state.npz", checkpoint.model_fingerprint())
+    np.testing.assert_raises(ValueError, checkpoint.load_initial_state, tmp_path / "state.npz")
+
+
+def test_resumed_run_matches_an_uninterrupted_run(prepared, tmp_path):
+    runSimulations.runTransient(STEP_DEFINITION, tmp_path / "full.log")
+    runSimulations.runTransient(STEP_DEFINITION[:3], tmp_path / "resumed.log", checkpointFile=tmp_path / "state.npz", checkpointEvery=4)
+    runSimulations.runTransient(STEP_DEFINITION, tmp_path / "resumed.log", checkpointFile=tmp_path / "state.npz", resume=True)   # Extends the run after the checkpoint
+    assert (tmp_path / "resumed.log").read_text() == (tmp_path / "full.log").read_text()
+
+
+def test_resume_needs_the_same_phases(prepared, tmp_path):
+    runSimulations.runTransient(STEP_DEFINITION[:3], tmp_path / "run.log", checkpointFile=tmp_path / "state.npz")
+    changed = [{"duration": 0.002, "steps": 2}] + STEP_DEFINITION[1:]
+    np.testing.assert_raises(ValueError, runSimulations.runTransient, changed, tmp_path / "run.log", checkpointFile=tmp_path / "state.npz", resume=True)
+
+
+def test_transient_from_the_steady_state_stays_there(prepared, tmp_path):
+    runSimulations.runSteadyState(tmp_path / "steady.log", stateFile=tmp_path / "steady.npz")
+    steps = []
+    runSimulations.runTransient(STEP_DEFINITION[:2], tmp_path / "transient.log", initialState=tmp_path / "steady.npz", consumers=[lambda *step: steps.append(np.array(step[3]))])
+    assert len(steps) == 4
+    steady, _ = checkpoint.load_state(tmp_path / "steady.npz")
+    np.testing.assert_allclose(steps, [steady] * len(steps), rtol=0, atol=1e-9)
+
+
+def test_state_records_the_solver_and_precision(prepared, tmp_path):
+    globalVar.solver = "domain-decomposition"
+    globalVar.precision = "mixed"
+    runSimulations.runSteadyState(tmp_path / "steady.log", stateFile=tmp_path / "steady.npz")
+    _, metadata = checkpoint.load_state(tmp_path / "steady.npz", checkpoint.model_fingerprint())
+    assert (metadata["solver"]["factorization"], metadata["solver"]["precision"]) == ("domain-decomposition", "mixed")
@@ -0,0 +1,46 @@
+import pytest
+
+from src import compactBoundary
+from src import globalVar
+from src.generator import count_subblocks
+
+
+def get_active_changes(blockModel, compacted, coefficient):
+    full = compactBoundary.solve_block_temperatures(blockModel, globalVar.heatTransferCoefficient, {})
+    reduced = compactBoundary.solve_block_temperatures(compacted, coefficient, {})
+    fullIndex = {tuple(key): i for i, key in enumerate(full["keys"].tolist())}
+    changes = [max(abs(reduced["mean"][i] - full["mean"][fullIndex[tuple(key)]]), abs(reduced["max"][i] - full["max"][fullIndex[tuple(key)]]))
+               for i, key in enumerate(reduced["keys"].tolist()) if key[0] in (1, 2)]    # Device layers of example_model
+    return max(changes)
+
+
+@pytest.mark.parametrize("mode", ("boundary", "network"))
+def test_compact_model_meets_its_tolerance(block_model, mode):
+    compacted, coefficient = compactBoundary.compact_top_layers(block_model, mode, globalVar.heatTransferCoefficient, tolerance=0.5, calibrate=True)
+    assert count_subblocks(compacted) < count_subblocks(block_model)
+    assert get_active_changes(block_model, compacted, coefficient) <= 0.5
+
+
+def test_tolerance_that_cannot_be_met_keeps_the_full_model(block_model):
+    compacted, coefficient = compactBoundary.compact_top_layers(block_model, "boundary", globalVar.heatTransferCoefficient, tolerance=1e-6, calibrate=True)
+    assert compacted is block_model and coefficient == globalVar.heatTransferCoefficient
+
+
+def test_analytical_compact_model_solves_nothing(block_model, monkeypatch):
+    monkeypatch.setattr(compactBoundary, "solve_block_temperatures", None)
+    compacted, coefficient = compactBoundary.compact_top_layers(block_model, "network", globalVar.heatTransferCoefficient)
+    assert (compacted, coefficient) == compactBoundary.make_compact_model(block_model, compactBoundary.find_compactable_layers(block_model), "network", globalVar.heatTransferCoefficient)
+
+
+def test_calibration_is_cached_per_geometry(block_model, monkeypatch):
+    globalVar.compactCalibrations = {}
+    calibrated = compactBoundary.compact_top_layers(block_model, "network", globalVar.heatTransferCoefficient, tolerance=0.5, calibrate=True)
+    monkeypatch.setattr(compactBoundary, "solve_block_temperatures", None)
+    block_model[1][0][0]["powerDissipation"] = 2 * block_model[1][0][0]["powerDissipation"]     # Same geometry, other power map
+    compacted, coefficient = compactBoundary.compact_top_layers(block_model, "network", globalVar.heatTransferCoefficient, tolerance=0.5, calibrate=True)
+    assert coefficient == calibrated[1] and compacted[1][0][0]["powerDissipation"] == block_model[1][0][0]["powerDissipation"]
+
+
+def test_unknown_mode(block_model):
+    with pytest.raises(ValueError):
+        compactBoundary.compact_top_layers(block_model, "sphere", globalVar.heatTransferCoefficient)
@@ -0,0 +1,34 @@
+import numpy as np
+
+from conftest import direct_transient
+from src import blockStats
+from src import cosim
+
+
+def test_step_matches_backward_euler(prepared):
+    stepper = cosim.make_stepper()
+    blockPower = np.add.reduceat(prepared["I"][stepper["centerNodes"]], stepper["starts"])     # Power of the model, per block
+    for _ in range(3):
+        temperatures = cosim.step(stepper, blockPower, 0.01, substeps=2)
+    reference = direct_transient(prepared["G"], prepared["C"], [prepared["I"]], np.zeros(len(prepared["I"])), [{"duration": 0.03, "steps": 6}])[-1]
+    np.testing.assert_allclose(stepper["temperatures"], reference, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(temperatures, blockStats.compute_statistics(reference, ("mean",))["block"]["mean"] + stepper["baseTemp"], rtol=0, atol=1e-9)
+    np.testing.assert_allclose(stepper["time"], 0.03)
+
+
+def test_block_temperatures_are_area_weighted(prepared):
+    stepper = cosim.make_stepper()
+    tempVector = np.arange(len(prepared["I"]), dtype=float)
+    stepper["temperatures"] = tempVector
+    block = 5
+    centers = stepper["centerNodes"][stepper["blockOfCenter"] == block]
+    areas = stepper["areas"][stepper["blockOfCenter"] == block]
+    np.testing.assert_allclose(cosim.get_block_temperatures(stepper)[block], np.dot(areas, tempVector[centers]) / np.sum(areas) + stepper["baseTemp"])
+    np.testing.assert_allclose(cosim.get_block_temperatures(stepper, "max")[block], np.max(tempVector[centers]) + stepper["baseTemp"])
+
+
+def test_block_power_dictionary(prepared):
+    stepper = cosim.make_stepper()
+    powerVector = cosim.block_power_vector(stepper, {stepper["blocks"][3]: 0.25})
+    assert powerVector[3] == 0.25 and np.count_nonzero(powerVector) == 1
+    np.testing.assert_raises(ValueError, cosim.block_power_vector, stepper, [1.0])
@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+import scipy.sparse.linalg
+
+from conftest import direct_steady_state, direct_transient
+from src import domainDecomposition
+from src import globalVar
+from src import nub_ctm as ctm
+from src import runSimulations
+from src.generator import generate_model
+
+STEP_DEFINITION = [{"duration": 0.01, "steps": 2}, {"duration": 0.1, "steps": 2}]
+
+
+def test_domain_decomposition_matches_direct_solver(prepared):
+    globalVar.solver = "domain-decomposition"
+    np.testing.assert_allclose(ctm.solve_steady_state(), direct_steady_state(prepared["G"], prepared["I"]), rtol=0, atol=1e-9)
+    tempVectors = ctm.doBeuler(globalVar.GMatrix, globalVar.CMatrix, [prepared["I"]] * 2, np.zeros(len(prepared["I"])), STEP_DEFINITION)
+    np.testing.assert_allclose(tempVectors, direct_transient(prepared["G"], prepared["C"], [prepared["I"]] * 2, np.zeros(len(prepared["I"])), STEP_DEFINITION), rtol=0, atol=1e-9)
+
+
+def test_domain_decomposition_in_mixed_precision(prepared):
+    globalVar.solver = "domain-decomposition"
+    globalVar.precision = "mixed"
+    np.testing.assert_allclose(ctm.solve_steady_state(), direct_steady_state(prepared["G"], prepared["I"]), rtol=0, atol=1e-6)
+
+
+def test_domain_decomposition_needs_matching_labels(prepared):
+    globalVar.solver = "domain-decomposition"
+    cache = ctm.get_factorization_cache(prepared["G"], prepared["C"], labels=[(0, 0)] * 3)
+    np.testing.assert_raises(ValueError, ctm.factorize, cache, cache["G"])
+
+
+"""Function that returns the shortest of three timings of f (s)."""
+def best_time(f):
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        f()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def test_domain_decomposition_is_not_slower_than_direct_on_many_chiplets():
+    runSimulations.prepareModel(generate_model(layers=3, chipletsPerLayer=16, blocksPerChiplet=16, resolution=[4, 4]))
+    G, I = ctm.to_sparse(globalVar.GMatrix), np.asarray(globalVar.IVector, dtype=float)
+    interface, interiors = domainDecomposition.partition(G, ctm.get_node_labels(globalVar.nodes))
+    assert len(interiors) == 16 and len(interface) < G.shape[0] / 100     # One subdomain per stack of chiplets, the TIM and spreader as interface
+    np.testing.assert_allclose(domainDecomposition.factorize(G, interface, interiors).solve(I), direct_steady_state(G, I), rtol=0, atol=1e-8)
+    direct = best_time(lambda: scipy.sparse.linalg.splu(G).solve(I))
+    assert best_time(lambda: domainDecomposition.factorize(G, interface, interiors).solve(I)) < 1.2 * direct
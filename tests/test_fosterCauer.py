@@ -0,0 +1,31 @@
+import numpy as np
+
+from conftest import direct_steady_state
+from src import cosim
+from src import fosterCauer
+
+
+def test_compact_models_match_direct_steady_state(prepared):
+    stepper = cosim.make_stepper()
+    compactModels = fosterCauer.extract_compact_models()
+    for i in (0, 5, 12):
+        powerVector = np.zeros(len(stepper["blocks"]))
+        powerVector[i] = 1
+        rise = cosim.block_temperatures(stepper, direct_steady_state(prepared["G"], cosim.spread_block_power(stepper, powerVector))) - stepper["baseTemp"]    # K/W
+        blockModel = compactModels["models"][i]
+        np.testing.assert_allclose(blockModel["self"]["steadyState"], rise[i], rtol=1e-8)
+        for mutual in blockModel["mutual"]:
+            np.testing.assert_allclose(mutual["steadyState"], rise[stepper["blocks"].index(mutual["block"])], rtol=1e-8)
+        np.testing.assert_allclose(fosterCauer.evaluate_foster(blockModel["self"]["foster"], [1e6]), rise[i], rtol=0.02)
+
+
+def test_foster_fits_are_accurate(prepared):
+    compactModels = fosterCauer.extract_compact_models()
+    assert max(model["self"]["relativeError"] for model in compactModels["models"]) < 0.02
+
+
+def test_cauer_ladder_has_the_foster_impedance():
+    foster = [[0.5, 1e-3], [2.0, 5e-2], [4.0, 1.0]]
+    cauer = fosterCauer.foster_to_cauer(foster)
+    s = 1j * np.geomspace(1e-2, 1e4, 7)
+    np.testing.assert_allclose(fosterCauer.cauer_impedance(cauer, s), fosterCauer.foster_impedance(foster, s), rtol=1e-6)
@@ -0,0 +1,20 @@
+import numpy as np
+
+from conftest import direct_steady_state
+from src import globalVar
+from src import nub_ctm as ctm
+from src import runSimulations
+from src.generator import count_subblocks, generate_model
+
+
+def test_generated_model_matches_direct_solve():
+    blockModel = generate_model(layers=2, chipletsPerLayer=3, blocksPerChiplet=5, resolution=[2, 2])
+    assert count_subblocks(blockModel) == (2 * 3 * 6 + 2) * 4     # 5 blocks are rounded up to a 3x2 grid, plus the TIM and heat spreader
+    runSimulations.prepareModel(blockModel)
+    assert len(ctm.find_center_nodes(globalVar.nodes)) == count_subblocks(blockModel)
+    np.testing.assert_allclose(ctm.solve_steady_state(), direct_steady_state(ctm.to_sparse(globalVar.GMatrix), globalVar.IVector), rtol=0, atol=1e-9)
+
+
+def test_same_seed_same_model():
+    assert generate_model(phases=3, seed=4) == generate_model(phases=3, seed=4)
+    assert generate_model(seed=4) != generate_model(seed=5)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from src import geometryCheck
+from src.nub_ctm import make_unit_dict
+
+
+def make_chiplet(secondLeftX):
+    return [make_unit_dict(1.6e6, 150, 2e-5, [1, 1], 0, 0, 1e-3, 1e-3, 0.5), make_unit_dict(1.6e6, 150, 2e-5, [1, 1], secondLeftX, 0, 1e-3, 1e-3, 0.5)]
+
+
+def test_example_model_has_no_errors(block_model):
+    assert [problem for problem in geometryCheck.validate_model(block_model) if problem["severity"] == "error"] == []
+
+
+def test_overlap_is_detected():
+    problems = geometryCheck.validate_model([[make_chiplet(0.5e-3)]])
+    assert [(problem["severity"], problem["kind"], problem["blocks"]) for problem in problems if problem["severity"] == "error"] == [("error", "overlap", [(0, 0, 0), (0, 0, 1)])]
+    with pytest.raises(ValueError, match="Invalid model geometry"):
+        geometryCheck.report_problems(problems, "error")
+    geometryCheck.report_problems(problems, "warn")
+
+
+def test_abutting_blocks_are_valid():
+    assert geometryCheck.validate_model([[make_chiplet(1e-3)]]) == []
+
+
+def test_open_outline_is_reported_as_a_warning(capsys):
+    problems = geometryCheck.validate_model([[make_chiplet(2e-3)]])
+    assert [(problem["severity"], problem["kind"]) for problem in problems] == [("warning", "outline")]
+    geometryCheck.report_problems(problems, "error")    # Warnings do not stop the run
+    assert "WARNING: geometry warning" in capsys.readouterr().out
+
+
+def test_unknown_mode_is_rejected():
+    np.testing.assert_raises(ValueError, geometryCheck.report_problems, [], "strict")
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from conftest import direct_steady_state
+from src import globalVar
+from src import hotspot
+from src import nub_ctm as ctm
+from src import runSimulations
+
+FLP = "# Two blocks side by side\nleft 1e-3 2e-3 0 0\nright 1e-3 2e-3 1e-3 0 1.75e6 0.01\n"
+PTRACE = "left right\n0.5 0.1\n\n0.2 0.3\n# comment\n0.4 0.0\n"
+
+"""Function that writes a two-layer HotSpot input: a die with power dissipation under a spreader without (lateral heat flow and power dissipation flags given)."""
+def write_hotspot_files(directory, lateral="Y"):
+    (directory / "die.flp").write_text(FLP)
+    (directory / "spreader.flp").write_text("spreader 2e-3 2e-3 0 0\n")
+    (directory / "stack.lcf").write_text("0\nY\nY\n1.75e6\n0.01\n1.5e-4\ndie.flp\n"
+                                         "1\n" + lateral + "\nN\n3.55e6\n0.0025\n1e-3\nspreader.flp\n")
+    (directory / "power.ptrace").write_text(PTRACE)
+
+
+def test_import_builds_the_stack(tmp_path):
+    write_hotspot_files(tmp_path)
+    blockModel, stepDefinition = hotspot.import_hotspot(tmp_path / "stack.lcf", tmp_path / "power.ptrace", samplingInterval=0.01)
+    assert stepDefinition == [{"duration": 0.01, "steps": 1}] * 3
+    die, spreader = blockModel[0][0], blockModel[1][0]
+    assert (die[1]["leftX"], die[1]["width"], die[1]["conductivity"]) == (1e-3, 1e-3, 100)
+    np.testing.assert_array_equal(die[0]["powerDissipation"], [0.5, 0.2, 0.4])
+    np.testing.assert_array_equal(spreader[0]["powerDissipation"], [0, 0, 0])     # Layer without power dissipation
+
+
+def test_imported_model_matches_direct_solve(tmp_path):
+    write_hotspot_files(tmp_path)
+    blockModel, _ = hotspot.import_hotspot(tmp_path / "stack.lcf", resolution=(2, 2), power={"left": 0.5, "right": 0.1})
+    runSimulations.prepareModel(blockModel)
+    np.testing.assert_allclose(ctm.solve_steady_state(), direct_steady_state(ctm.to_sparse(globalVar.GMatrix), globalVar.IVector), rtol=0, atol=1e-9)
+
+
+def test_chunked_trace_reading(tmp_path):
+    write_hotspot_files(tmp_path)
+    names, power = hotspot.read_ptrace(tmp_path / "power.ptrace", chunkSize=1)
+    assert names == ["left", "right"]
+    np.testing.assert_array_equal(power, [[0.5, 0.1], [0.2, 0.3], [0.4, 0.0]])
+    names, power = hotspot.read_ptrace(tmp_path / "power.ptrace", names=["right"], chunkSize=2)
+    np.testing.assert_array_equal(power, [[0.1], [0.3], [0.0]])
+    with pytest.raises(ValueError, match="no column"):
+        hotspot.read_ptrace(tmp_path / "power.ptrace", names=["cache"])
+
+
+def test_layer_without_lateral_heat_flow_is_rejected(tmp_path):
+    write_hotspot_files(tmp_path, lateral="N")
+    with pytest.raises(ValueError, match="lateral heat flow"):
+        hotspot.read_lcf(tmp_path / "stack.lcf")
@@ -0,0 +1,49 @@
+import numpy as np
+
+from conftest import direct_steady_state
+from src import globalVar
+from src import instancing
+from src import nub_ctm as ctm
+from src.generator import generate_model
+
+"""Function that solves the steady state of a flattened model assembled node by node (nub_ctm) and with stamps.
+Returns the temperatures of the center nodes of both, in the order of the center map. The node by node assembly also makes ground nodes for the rounding residues
+of covered units (see src/instancing.py), so the networks are compared on their center nodes."""
+def solve_both_assemblies(model):
+    nodes = ctm.make_nodes(model)
+    globalVar.GMatrix = ctm.initialize_GC_matrix(nodes)
+    ctm.populate_G_matrix(nodes, model)
+    ctm.populate_I_vector(nodes, model)
+    reference = direct_steady_state(ctm.to_sparse(globalVar.GMatrix), globalVar.IVector)[ctm.make_center_map(nodes, model)["centerNodes"]]
+    stampNodes, stampG, _ = instancing.assemble_model(model)
+    ctm.populate_I_vector(stampNodes, model)
+    stamped = direct_steady_state(stampG, globalVar.IVector)[ctm.make_center_map(stampNodes, model)["centerNodes"]]
+    return reference, stamped
+
+
+def check_same_temperatures(model):
+    reference, stamped = solve_both_assemblies(model)
+    assert len(stamped) == len(reference)
+    np.testing.assert_allclose(stamped, reference, rtol=0, atol=1e-9)
+
+
+def test_stamps_match_node_by_node_assembly(block_model):
+    model = ctm.flatten_model(block_model)
+    designs = instancing.find_chiplet_designs(model)
+    assert len(designs["designs"]) == designs["instances"]     # No repeated chiplet in example_model
+    check_same_temperatures(model)
+
+
+def test_repeated_designs_match_node_by_node_assembly():
+    model = ctm.flatten_model(generate_model(layers=2, chipletsPerLayer=4, blocksPerChiplet=4, resolution=[2, 2]))
+    designs = instancing.find_chiplet_designs(model)
+    assert len(designs["designs"]) < designs["instances"]
+    check_same_temperatures(model)
+
+
+def test_chiplet_instance_moves_the_design():
+    design = [ctm.make_unit_dict(1.6e6, 150, 2e-5, [1, 1], 0, 0, 1e-3, 1e-3, 0.5)]
+    instance = instancing.make_chiplet_instance(design, 2e-3, 1e-3, powerDissipation=[0.8])
+    assert (instance[0]["leftX"], instance[0]["bottomY"], instance[0]["powerDissipation"]) == (2e-3, 1e-3, 0.8)
+    assert design[0]["leftX"] == 0 and design[0]["powerDissipation"] == 0.5
+    np.testing.assert_raises(ValueError, instancing.make_chiplet_instance, design, 0, 0, [0.1, 0.2])
@@ -0,0 +1,58 @@
+import json
+import threading
+import tracemalloc
+
+from src import globalVar
+from src import instrument
+
+
+def test_spans_and_counters_are_aggregated(tmp_path):
+    instrument.start_report()
+    for _ in range(3):
+        with instrument.span("solve") as record:
+            pass
+    instrument.add_counter("solves", 2)
+    instrument.add_counter("solves")
+    instrument.set_counter("nodes", 198)
+    globalVar.reportFile = tmp_path / "report.json"
+    instrument.write_report()
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["spans"]["solve"]["count"] == 3
+    assert report["spans"]["solve"]["max"] >= record["duration"] >= report["spans"]["solve"]["min"]
+    assert report["counters"] == {"solves": 3, "nodes": 198}
+
+
+def test_threads_record_their_own_reports():
+    instrument.start_report()
+    instrument.set_counter("owner", "main")
+    reports = {}
+
+    def run(name):
+        instrument.start_report()
+        for _ in range(100):
+            instrument.add_counter("queries")
+        reports[name] = instrument.get_report()
+
+    threads = [threading.Thread(target=run, args=(str(i),)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [report["counters"] for report in reports.values()] == [{"queries": 100}] * 4
+    assert instrument.get_report()["counters"] == {"owner": "main"}
+
+
+def test_nested_spans_keep_the_peak_of_the_outer_span():
+    globalVar.traceMemory = True
+    tracemalloc.start()
+    try:
+        instrument.start_report()
+        with instrument.span("outer"):
+            buffer = bytearray(10**7)
+            del buffer
+            with instrument.span("inner"):
+                pass
+        spans = instrument.get_report()["spans"]
+    finally:
+        tracemalloc.stop()
+    assert spans["outer"]["peakTracedMemory"] >= 10**7 > spans["inner"]["peakTracedMemory"]
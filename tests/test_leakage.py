@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from conftest import direct_steady_state, direct_transient
+from src import cosim
+from src import globalVar
+from src import leakage
+from src import nub_ctm as ctm
+
+
+def make_leakage():
+    stepper = cosim.make_stepper()
+    referencePower = np.array([0.02 if block[0] in (1, 2) else 0 for block in stepper["blocks"]])     # Leakage of the blocks of the device layers
+    return stepper, leakage.exponential_leakage(referencePower, beta=0.02)
+
+
+@pytest.mark.parametrize("method", leakage.METHODS)
+def test_steady_state_with_leakage_solves_the_coupled_problem(prepared, method):
+    stepper, leakageFunction = make_leakage()
+    x, info = leakage.solve_steady_state_with_leakage(leakageFunction, method, tolerance=1e-9)
+    assert info["converged"]
+    residual = prepared["G"].dot(x) - prepared["I"] - cosim.spread_block_power(stepper, leakageFunction(cosim.block_temperatures(stepper, x)))
+    assert np.max(np.abs(residual)) < 1e-9
+    assert np.max(x) > np.max(direct_steady_state(prepared["G"], prepared["I"]))    # Leakage heats the die
+
+
+def test_methods_agree(prepared):
+    _, leakageFunction = make_leakage()
+    fixedPoint, fixedPointInfo = leakage.solve_steady_state_with_leakage(leakageFunction, "fixed-point", tolerance=1e-9)
+    newton, newtonInfo = leakage.solve_steady_state_with_leakage(leakageFunction, "newton", tolerance=1e-9)
+    assert newtonInfo["iterations"] < fixedPointInfo["iterations"]
+    np.testing.assert_allclose(newton, fixedPoint, rtol=0, atol=1e-8)
+
+
+def test_transient_without_leakage_matches_backward_euler(prepared):
+    stepper = cosim.make_stepper()
+    stepSolver, diagnostics = leakage.make_leakage_step_solver(leakage.exponential_leakage(np.zeros(len(stepper["blocks"]))))
+    stepDefinition = [{"duration": 0.01, "steps": 3}, {"duration": 0.1, "steps": 3}]
+    steps = [np.array(tempVector) for _, _, _, tempVector in ctm.iterBeuler(globalVar.GMatrix, globalVar.CMatrix, [prepared["I"]] * 2, np.zeros(len(prepared["I"])), stepDefinition,
+                                                                           stepSolver=stepSolver)]
+    np.testing.assert_allclose(steps, direct_transient(prepared["G"], prepared["C"], [prepared["I"]] * 2, np.zeros(len(prepared["I"])), stepDefinition), rtol=0, atol=1e-9)
+    assert diagnostics["steps"] == 6 and diagnostics["failedSteps"] == 0
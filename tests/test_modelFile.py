@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from conftest import direct_steady_state
+from src import globalVar
+from src import modelFile
+from src import nub_ctm as ctm
+from src import runSimulations
+
+BLOCK = {"name": "a", "leftX": 0, "bottomY": 0, "width": 1e-3, "height": 1e-3, "thickness": 2e-5, "material": "Si"}
+
+"""Function that prepares a block model and returns its steady state, checked against the direct solve."""
+def solve_model(blockModel):
+    runSimulations.prepareModel(blockModel)
+    tempVector = ctm.solve_steady_state()
+    np.testing.assert_allclose(tempVector, direct_steady_state(ctm.to_sparse(globalVar.GMatrix), globalVar.IVector), rtol=0, atol=1e-9)
+    return tempVector
+
+
+@pytest.mark.parametrize("suffix", [".json", ".npz"])
+def test_round_trip_keeps_the_temperatures(block_model, tmp_path, suffix):
+    reference = solve_model(block_model)
+    modelFile.save_model_file(modelFile.block_model_to_arrays(block_model), tmp_path / ("model" + suffix))
+    np.testing.assert_allclose(solve_model(modelFile.load_model(tmp_path / ("model" + suffix))), reference, rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("power", [["a"], [True], float("nan")])
+def test_invalid_power_is_rejected(power):
+    document = {"layers": [{"chiplets": [{"blocks": [dict(BLOCK, power=power)]}]}]}
+    with pytest.raises(ValueError, match="Invalid model file"):
+        modelFile.document_to_arrays(document)
+
+
+def test_malformed_arrays_are_rejected(block_model, tmp_path):
+    arrays = modelFile.block_model_to_arrays(block_model)
+    arrays["width"] = arrays["width"][:-1]
+    with pytest.raises(ValueError, match="one value per block"):
+        modelFile.check_arrays(arrays)
+    arrays = modelFile.block_model_to_arrays(block_model)
+    arrays["unitIndex"] = arrays["unitIndex"][::-1].copy()
+    modelFile.save_model_file(arrays, tmp_path / "model.npz")
+    with pytest.raises(ValueError, match="out of order"):
+        modelFile.load_model(tmp_path / "model.npz")
+
+
+@pytest.mark.parametrize("document", [{"materials": {"paste": {"conductivity": 3}}, "layers": [{"chiplets": [{"blocks": [dict(BLOCK, material="paste")]}]}]},
+                                      {"version": "2", "layers": [{"chiplets": [{"blocks": [BLOCK]}]}]}])
+def test_invalid_document_is_reported(document):
+    with pytest.raises(ValueError, match="Invalid model file"):
+        modelFile.document_to_arrays(document)
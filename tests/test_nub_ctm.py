@@ -0,0 +1,45 @@
+import numpy as np
+
+from conftest import direct_steady_state, direct_transient
+from src import globalVar
+from src import instrument
+from src import nub_ctm as ctm
+
+STEP_DEFINITION = [{"duration": 0.001, "steps": 2}, {"duration": 0.009, "steps": 2}, {"duration": 0.09, "steps": 2}, {"duration": 0.9, "steps": 2}]
+
+
+def test_steady_state_matches_direct_solve(prepared):
+    np.testing.assert_allclose(ctm.solve_steady_state(), direct_steady_state(prepared["G"], prepared["I"]), rtol=0, atol=1e-9)
+
+
+def test_backward_euler_matches_direct_solves(prepared):
+    IVectorVector = [prepared["I"]] * len(STEP_DEFINITION)
+    tempVectors = [np.array(tempVector) for _, _, _, tempVector in ctm.iterBeuler(globalVar.GMatrix, globalVar.CMatrix, IVectorVector, np.zeros(len(prepared["I"])), STEP_DEFINITION)]
+    reference = direct_transient(prepared["G"], prepared["C"], IVectorVector, np.zeros(len(prepared["I"])), STEP_DEFINITION)
+    assert len(tempVectors) == len(reference)
+    np.testing.assert_allclose(tempVectors, reference, rtol=0, atol=1e-9)
+
+
+def test_mixed_precision_matches_double_precision(prepared):
+    globalVar.precision = "mixed"
+    np.testing.assert_allclose(ctm.solve_steady_state(), direct_steady_state(prepared["G"], prepared["I"]), rtol=0, atol=1e-6)
+    tempVectors = ctm.doBeuler(globalVar.GMatrix, globalVar.CMatrix, [prepared["I"]] * len(STEP_DEFINITION), np.zeros(len(prepared["I"])), STEP_DEFINITION)
+    reference = direct_transient(prepared["G"], prepared["C"], [prepared["I"]] * len(STEP_DEFINITION), np.zeros(len(prepared["I"])), STEP_DEFINITION)
+    np.testing.assert_allclose(np.array(tempVectors, dtype=float), reference, rtol=0, atol=1e-4)   # History kept in single precision
+    assert instrument.get_report()["counters"]["refinementSolves"] == 1 + sum(phase["steps"] for phase in STEP_DEFINITION)  # One correction per solve
+
+
+def test_early_stop_does_not_stop_a_heating_phase(prepared):
+    stepDefinition = [{"duration": 0.1, "steps": 2000}]     # Fine substeps: small changes per substep while the die still heats up
+    full = list(ctm.iterBeuler(globalVar.GMatrix, globalVar.CMatrix, [prepared["I"]], np.zeros(len(prepared["I"])), stepDefinition))
+    stopped = list(ctm.iterBeuler(globalVar.GMatrix, globalVar.CMatrix, [prepared["I"]], np.zeros(len(prepared["I"])), stepDefinition, tolerance=1.0))
+    assert len(stopped) == len(full)
+    np.testing.assert_allclose(stopped[-1][3], full[-1][3], rtol=0, atol=1e-9)
+
+
+def test_early_stop_jumps_to_the_steady_state(prepared):
+    stepDefinition = [{"duration": 1000, "steps": 100}]     # Settles long before the end of the phase
+    steps = list(ctm.iterBeuler(globalVar.GMatrix, globalVar.CMatrix, [prepared["I"]], np.zeros(len(prepared["I"])), stepDefinition, tolerance=1e-3, onConverged="steady"))
+    assert len(steps) < 100
+    assert steps[-1][:3] == (0, 99, 1000)
+    np.testing.assert_allclose(steps[-1][3], direct_steady_state(prepared["G"], prepared["I"]), rtol=0, atol=1e-9)
@@ -0,0 +1,28 @@
+import numpy as np
+
+from conftest import direct_transient
+from src import globalVar
+from src import instrument
+from src import parareal
+
+STEP_DEFINITION = [{"duration": 0.01, "steps": 12}, {"duration": 0.1, "steps": 12}]
+
+
+def test_parareal_matches_serial_backward_euler(prepared):
+    IVectorVector = [prepared["I"], 0.5 * prepared["I"]]
+    steps = [(i, j, time, np.array(tempVector)) for i, j, time, tempVector in parareal.iter_parareal(globalVar.GMatrix, globalVar.CMatrix, IVectorVector,
+                                                                                                    np.zeros(len(prepared["I"])), STEP_DEFINITION, workers=3)]
+    reference = direct_transient(prepared["G"], prepared["C"], IVectorVector, np.zeros(len(prepared["I"])), STEP_DEFINITION)
+    assert [(i, j) for i, j, _, _ in steps] == [(i, j) for i in range(2) for j in range(12)]
+    np.testing.assert_allclose(steps[-1][2], 0.11)
+    np.testing.assert_allclose([tempVector for _, _, _, tempVector in steps], reference, rtol=0, atol=1e-6)
+    report = instrument.get_report()
+    assert report["spans"]["parareal_fine"]["count"] == report["counters"]["pararealIterations"]    # No fine sweep after the last iteration
+
+
+def test_parareal_resumes_from_a_substep(prepared):
+    IVectorVector = [prepared["I"], prepared["I"]]
+    reference = direct_transient(prepared["G"], prepared["C"], IVectorVector, np.zeros(len(prepared["I"])), STEP_DEFINITION)
+    steps = list(parareal.iter_parareal(globalVar.GMatrix, globalVar.CMatrix, IVectorVector, reference[5], STEP_DEFINITION, start=(0, 6), workers=2))
+    assert (steps[0][0], steps[0][1]) == (0, 6)
+    np.testing.assert_allclose(steps[-1][3], reference[-1], rtol=0, atol=1e-6)
@@ -0,0 +1,21 @@
+import numpy as np
+
+from conftest import direct_steady_state, direct_transient
+from src import globalVar
+from src import periodic
+
+STEP_DEFINITION = [{"duration": 0.05, "steps": 5}, {"duration": 0.05, "steps": 5}]
+
+
+def test_periodic_steady_state_reproduces_its_cycle(prepared):
+    IVectorVector = [prepared["I"], 0.2 * prepared["I"]]
+    x0, info = periodic.solve_periodic_steady_state(globalVar.GMatrix, globalVar.CMatrix, IVectorVector, STEP_DEFINITION)
+    assert info["converged"]
+    cycle = direct_transient(prepared["G"], prepared["C"], IVectorVector, x0, STEP_DEFINITION)
+    np.testing.assert_allclose(cycle[-1], x0, rtol=0, atol=1e-6)
+    assert np.max(x0) > 1     # Not the ambient
+
+
+def test_constant_power_settles_to_the_steady_state(prepared):
+    x0, info = periodic.solve_periodic_steady_state(globalVar.GMatrix, globalVar.CMatrix, [prepared["I"]] * 2, STEP_DEFINITION)
+    np.testing.assert_allclose(x0, direct_steady_state(prepared["G"], prepared["I"]), rtol=0, atol=1e-6)
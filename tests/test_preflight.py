@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src import globalVar
+from src import preflight
+from src import runSimulations
+from src.generator import generate_model
+
+
+def test_counts_match_the_prepared_model(block_model, prepared):
+    counts = preflight.count_model(block_model)
+    assert counts["subblocks"] == counts["CNonzeros"] == prepared["C"].nnz
+    assert abs(counts["nodes"] - len(prepared["I"])) <= 0.1 * len(prepared["I"])     # Estimates: rounding residues are not counted exactly
+    assert abs(counts["GNonzeros"] - prepared["G"].nnz) <= 0.1 * prepared["G"].nnz
+
+
+def test_designs_are_counted():
+    counts = preflight.count_model(generate_model(layers=2, chipletsPerLayer=4, blocksPerChiplet=4, resolution=[2, 2]))
+    assert counts["designs"] < counts["chiplets"]
+
+
+def test_refuse_raises_over_the_limits(block_model):
+    with pytest.raises(Exception, match="Preflight"):
+        preflight.check_run(block_model, "refuse", memoryLimit=1)
+
+
+def test_downgrade_coarsens_the_model(block_model):
+    coarse = preflight.coarsen_model(block_model)
+    memoryLimit = min(preflight.plan_run(coarse, "stamps", solver)["cost"]["memory"] for solver in ("direct", "domain-decomposition"))
+    plan = preflight.check_run(block_model, "downgrade", memoryLimit=memoryLimit)
+    assert plan["cost"]["memory"] <= memoryLimit
+    assert plan["counts"]["subblocks"] < preflight.count_model(block_model)["subblocks"]
+
+
+def test_final_model_is_checked_after_adaptive_refinement(block_model):
+    globalVar.preflight = "plan"
+    globalVar.adaptiveResolution = True
+    runSimulations.prepareModel(block_model)
+    assert globalVar.preflightPlan["counts"]["subblocks"] == len(globalVar.centerMap["centerNodes"])   # The refined model, not the one given
+    assert globalVar.preflightPlan["counts"]["subblocks"] != preflight.count_model(block_model)["subblocks"]
+
+
+def test_unknown_action_is_rejected(block_model):
+    np.testing.assert_raises(ValueError, preflight.check_run, block_model, "off")
@@ -0,0 +1,33 @@
+import numpy as np
+
+from conftest import direct_steady_state
+from src import adaptiveMesh
+from src import cosim
+from src import globalVar
+from src import resolutionStudy
+from src import runSimulations
+
+
+def test_reference_run_matches_the_prepared_model(block_model):
+    study = resolutionStudy.study_resolution(block_model, levels=(1, 2), mode="layer", tolerance=0.5)
+    reference = study["runs"][0]
+    assert reference["levels"] == [2] * len(block_model) and reference["change"] == 0
+    runSimulations.prepareModel(block_model)     # example_model is at [2,2]
+    stepper = cosim.make_stepper()
+    tempVector = direct_steady_state(stepper["GMatrix"], globalVar.IVector)
+    assert reference["blocks"] == stepper["blocks"]
+    np.testing.assert_allclose(reference["mean"], cosim.block_temperatures(stepper, tempVector) - globalVar.baseTemp, rtol=0, atol=1e-9)
+    np.testing.assert_allclose(reference["max"], cosim.block_temperatures(stepper, tempVector, "max") - globalVar.baseTemp, rtol=0, atol=1e-9)
+
+
+def test_recommended_levels_meet_the_tolerance_per_layer(block_model):
+    study = resolutionStudy.study_resolution(block_model, levels=(1, 2, 4), mode="global", tolerance=0.5)
+    for iLayer, level in enumerate(study["recommended"]):
+        run = next(run for run in study["runs"] if run["levels"] == [level] * len(block_model))
+        assert run["layerChanges"][iLayer] <= 0.5
+    assert study["check"]["levels"] == study["recommended"]
+
+
+def test_invalid_levels(block_model):
+    np.testing.assert_raises(ValueError, resolutionStudy.study_resolution, block_model, levels=(0, 2))
+    np.testing.assert_raises(ValueError, resolutionStudy.study_resolution, block_model, mode="random")
@@ -0,0 +1,47 @@
+import re
+from pathlib import Path
+
+import numpy as np
+
+from src import globalVar
+from src import runSimulations
+
+LOGS = Path(__file__).resolve().parent.parent / "logs"
+STEP_DEFINITION = [{"duration": 0.001, "steps": 2}, {"duration": 0.009, "steps": 2}, {"duration": 0.09, "steps": 2}, {"duration": 0.9, "steps": 2}, {"duration": 1, "steps": 2}]   # As in ARTSim.py
+NUMBER = re.compile(r"np\.float64\(([^)]*)\)")
+
+"""Function that splits a log into its text, with the temperatures replaced by a placeholder, and the array of its temperatures."""
+def read_log(path):
+    text = Path(path).read_text()
+    return NUMBER.sub("T", text), np.array([float(value) for value in NUMBER.findall(text)])
+
+"""Function that checks that a log has the same text as a reference log in logs/, and the same temperatures within atol."""
+def check_log(path, reference, atol=1e-9):
+    text, temps = read_log(path)
+    referenceText, referenceTemps = read_log(LOGS / reference)
+    assert text == referenceText
+    np.testing.assert_allclose(temps, referenceTemps, rtol=0, atol=atol)
+
+
+def test_steady_state_log_matches_the_stored_log(block_model, tmp_path):
+    runSimulations.prepareModel(block_model)
+    runSimulations.runSteadyState(tmp_path / "steady.log")
+    check_log(tmp_path / "steady.log", "example_model_steadystate.log")
+
+
+def test_transient_log_matches_the_stored_log(block_model, tmp_path):
+    runSimulations.prepareModel(block_model)
+    runSimulations.runTransient(STEP_DEFINITION, tmp_path / "transient.log")
+    check_log(tmp_path / "transient.log", "example_model_transientResult.log")
+
+
+def test_parallel_in_time_log_matches_the_stored_log(block_model, tmp_path):
+    globalVar.pararealWorkers = 2
+    runSimulations.prepareModel(block_model)
+    runSimulations.runTransient(STEP_DEFINITION, tmp_path / "transient.log", parallelInTime=True)
+    check_log(tmp_path / "transient.log", "example_model_transientResult.log", atol=1e-6)
+
+
+def test_transient_needs_a_prepared_model(tmp_path):
+    globalVar.modelPrepared = False
+    np.testing.assert_raises(Exception, runSimulations.runTransient, STEP_DEFINITION, tmp_path / "transient.log")
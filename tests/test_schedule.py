@@ -0,0 +1,22 @@
+import numpy as np
+import scipy.linalg
+
+from src import schedule
+
+
+def test_time_constants_match_the_dense_eigenproblem(prepared):
+    tauFast, tauSlow = schedule.estimate_time_constants()
+    taus = scipy.linalg.eigh(prepared["C"].toarray(), prepared["G"].toarray(), eigvals_only=True)     # C v = tau G v
+    np.testing.assert_allclose(tauSlow, np.max(taus), rtol=1e-6)
+    withCapacity = prepared["C"].diagonal() > 0
+    np.testing.assert_allclose(tauFast, np.min(prepared["C"].diagonal()[withCapacity] / prepared["G"].diagonal()[withCapacity]))
+
+
+def test_auto_step_definition_covers_the_settling_time(prepared):
+    tauFast, tauSlow = schedule.estimate_time_constants()
+    stepDefinition = schedule.auto_step_definition(stepsPerDecade=3)
+    np.testing.assert_allclose(stepDefinition[0]["duration"], tauFast)
+    np.testing.assert_allclose(sum(phase["duration"] for phase in stepDefinition), 5 * tauSlow)
+    assert all(phase["steps"] == 3 for phase in stepDefinition)
+    durations = [phase["duration"] for phase in stepDefinition[1:-1]]
+    np.testing.assert_allclose(durations[1:], 10 * np.array(durations[:-1]))     # One decade per phase
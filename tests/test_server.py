@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from conftest import direct_steady_state, direct_transient
+from src import cosim
+from src import server
+
+
+def test_steady_matches_direct_solve(prepared):
+    entry = server.prepare_entry("example_model")
+    stepper = entry["stepper"]
+    reference = direct_steady_state(prepared["G"], prepared["I"])
+    result = server.solve_steady(entry)
+    np.testing.assert_allclose(result["mean"], cosim.block_temperatures(stepper, reference), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(result["max"], cosim.block_temperatures(stepper, reference, "max"), rtol=0, atol=1e-9)
+
+
+def test_power_override_only_changes_the_given_blocks(prepared):
+    entry = server.prepare_entry("example_model")
+    stepper = entry["stepper"]
+    block = stepper["blocks"][-1]
+    power = entry["power"].copy()
+    power[-1] = 0.2
+    reference = direct_steady_state(prepared["G"], cosim.spread_block_power(stepper, power))
+    result = server.solve_steady(entry, {",".join(str(index) for index in block): 0.2})
+    np.testing.assert_allclose(result["mean"], cosim.block_temperatures(stepper, reference), rtol=0, atol=1e-9)
+
+
+def test_transient_matches_direct_solves(prepared):
+    entry = server.prepare_entry("example_model")
+    stepper = entry["stepper"]
+    phases = [{"duration": 0.01, "steps": 4}, {"duration": 0.1, "steps": 2, "power": [0.0] * len(stepper["blocks"])}]
+    IVectorVector = [prepared["I"], np.zeros(len(prepared["I"]))]
+    reference = direct_transient(prepared["G"], prepared["C"], IVectorVector, np.zeros(len(prepared["I"])), phases)
+    results = server.solve_transient(entry, phases)
+    np.testing.assert_allclose([result["mean"] for result in results], [cosim.block_temperatures(stepper, reference[i]) for i in (3, 5)], rtol=0, atol=1e-9)
+    np.testing.assert_raises(ValueError, server.solve_transient, entry, phases, "hot")
+
+
+"""Coroutine that closes a listener and waits for its connection handlers, so that the event loop can be stopped without pending tasks."""
+async def close_listener(listener):
+    listener.close()
+    await listener.wait_closed()
+    await asyncio.gather(*(task for task in asyncio.all_tasks() if task is not asyncio.current_task()))
+
+
+def test_socket_queries(prepared, tmp_path):
+    reference = server.solve_steady(server.prepare_entry("example_model"))
+    socketPath = str(tmp_path / "server.sock")
+    simulationServer = server.make_server(workers=2)
+    loop = asyncio.new_event_loop()
+    listener = loop.run_until_complete(asyncio.start_unix_server(server.make_handler(simulationServer), path=socketPath))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        answers = server.query([{"op": "load", "model": "example_model"}, {"op": "steady", "model": "example_model"}, {"op": "solve"}], socketPath=socketPath)
+    finally:
+        asyncio.run_coroutine_threadsafe(close_listener(listener), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        simulationServer["pool"].shutdown()
+    assert len(answers[0]["blocks"]) == len(reference["mean"])
+    np.testing.assert_allclose(answers[1]["mean"], reference["mean"], rtol=0, atol=1e-9)
+    assert answers[2]["error"].startswith("ValueError")
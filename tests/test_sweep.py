@@ -0,0 +1,42 @@
+import numpy as np
+
+from conftest import direct_steady_state, direct_transient
+from src import globalVar
+from src import nub_ctm as ctm
+from src import sweep
+
+STEP_DEFINITION = [{"duration": 0.001, "steps": 2}, {"duration": 0.009, "steps": 2}]
+
+"""Function that flattens the nested center temperatures of a sweep result (see nest_center_temperatures) in the order of the center map."""
+def flatten(nested):
+    if isinstance(nested, (list, tuple)):
+        return [value for item in nested for value in flatten(item)]
+    return [nested]
+
+
+def test_sweep_matches_direct_solves(block_model, prepared):
+    grid = {"baseTemp": [300, 320], "powerScale": [1, 2], "stepDefinition": [None, STEP_DEFINITION]}
+    results = sweep.runSweep(block_model, grid, processes=1)
+    centerNodes = ctm.find_center_nodes(globalVar.nodes)
+    steady = direct_steady_state(prepared["G"], prepared["I"])[centerNodes]
+    transient = np.array(direct_transient(prepared["G"], prepared["C"], [prepared["I"]] * 2, np.zeros(len(prepared["I"])), STEP_DEFINITION))[:, centerNodes]
+    assert len(results["jobs"]) == 8
+    for job in results["jobs"]:
+        parameters = job["parameters"]
+        assert job["nodes"] == len(prepared["I"])
+        np.testing.assert_allclose(flatten(job["steadyState"]), parameters["powerScale"] * steady + parameters["baseTemp"], rtol=0, atol=1e-9)
+        if parameters["stepDefinition"] is None:
+            assert "transient" not in job
+        else:
+            assert job["transient"]["times"] == sweep.get_substep_times(STEP_DEFINITION)
+            temps = np.array([flatten(step) for step in job["transient"]["temperatures"]])
+            np.testing.assert_allclose(temps, parameters["powerScale"] * transient + parameters["baseTemp"], rtol=0, atol=1e-9)
+
+
+def test_resolution_changes_the_geometry(block_model):
+    results = sweep.runSweep(block_model, {"resolution": [[1, 1], [2, 2]]}, processes=1)
+    assert results["jobs"][0]["nodes"] < results["jobs"][1]["nodes"]
+
+
+def test_unknown_parameter_is_rejected():
+    np.testing.assert_raises(ValueError, sweep.expand_sweep_grid, {"conductivity": [1, 2]})
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from conftest import direct_transient
+from src import blockStats
+from src import globalVar
+from src import runSimulations
+
+STEP_DEFINITION = [{"duration": 0.001, "steps": 2}, {"duration": 0.009, "steps": 2}]
+
+"""Function that runs the transient of the prepared model with an output mode and returns the CSV lines of the log, and the temperature vectors of the steps solved directly."""
+def run_mode(prepared, tmp_path, outputMode, probes=None):
+    runSimulations.runTransient(STEP_DEFINITION, tmp_path / (outputMode + ".log"), outputMode, probes)
+    steps = direct_transient(prepared["G"], prepared["C"], [prepared["I"]] * len(STEP_DEFINITION), np.zeros(len(prepared["I"])), STEP_DEFINITION)
+    return [line.split(",") for line in (tmp_path / (outputMode + ".log")).read_text().splitlines()], steps
+
+
+def test_probes_match_the_block_statistics(prepared, tmp_path):
+    probe = tuple(int(index) for index in globalVar.centerMap["segmentKeys"][-1])
+    lines, steps = run_mode(prepared, tmp_path, "probes", [probe, "0,0,0"])
+    assert lines[0] == ["time", "L" + str(probe[0]) + "C" + str(probe[1]) + "B" + str(probe[2]) + "_mean", "L" + str(probe[0]) + "C" + str(probe[1]) + "B" + str(probe[2]) + "_max", "L0C0B0_mean", "L0C0B0_max"]
+    assert len(lines) == 1 + len(steps) == 5
+    for line, tempVector in zip(lines[1:], steps):
+        stats = blockStats.compute_statistics(tempVector, ("mean", "max"))["block"]
+        expected = [stats["mean"][-1], stats["max"][-1], stats["mean"][0], stats["max"][0]]
+        np.testing.assert_allclose([float(value) for value in line[1:]], np.array(expected) + globalVar.baseTemp, rtol=0, atol=1e-9)
+
+
+def test_summary_matches_the_block_statistics(prepared, tmp_path):
+    lines, steps = run_mode(prepared, tmp_path, "summary")
+    assert lines[0][-2:] == ["hottest_block", "hottest_temperature"]
+    hottest = blockStats.compute_statistics(steps[-1], ("max",))["block"]["max"]
+    assert float(lines[-1][-1]) == pytest.approx(hottest.max() + globalVar.baseTemp, abs=1e-9)
+    assert [float(line[0]) for line in lines[1:]] == pytest.approx([0.0005, 0.001, 0.0055, 0.01])
+
+
+def test_missing_probe_is_rejected(prepared, tmp_path):
+    with pytest.raises(ValueError, match="L9C0B0"):
+        run_mode(prepared, tmp_path, "probes", [(9, 0, 0)])